@@ -0,0 +1,115 @@
+"""
+Runtime settings for the API, overridable through environment variables.
+"""
+
+import os
+
+# Where uploaded PDFs and their derived files are stored
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+
+# State shared by all API workers: "sqlite:///path.db" (WAL) or "memory://" for a single process
+STATE_URL = os.getenv("STATE_URL", "sqlite:///./data/state.db")
+
+# Number of API worker processes; set by `python backend.py --workers N`
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Processes for CPU-bound work (extraction, chunking, indexing) per API worker (0 = share the
+# CPUs between workers; EXTRACTION_WORKERS is the older name), threads for blocking I/O per API
+# worker, and how much lower the worker processes' scheduling priority is (0-19)
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", os.getenv("EXTRACTION_WORKERS", "0")))
+IO_WORKERS = int(os.getenv("IO_WORKERS", "32"))
+WORKER_NICENESS = int(os.getenv("WORKER_NICENESS", "10"))
+
+# Requests handled at once and seconds allowed per request, by endpoint group; requests
+# over the limit wait up to LIMIT_QUEUE_TIMEOUT seconds for a slot, then get 503
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "8"))
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "300"))
+CHAT_CONCURRENCY = int(os.getenv("CHAT_CONCURRENCY", "16"))
+CHAT_TIMEOUT = float(os.getenv("CHAT_TIMEOUT", "30"))
+QUERY_CONCURRENCY = int(os.getenv("QUERY_CONCURRENCY", "32"))
+QUERY_TIMEOUT = float(os.getenv("QUERY_TIMEOUT", "10"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "2"))
+BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", "300"))
+# Audio streams run as long as the listener keeps listening; their timeout bounds the wait for each piece of audio
+SPEECH_CONCURRENCY = int(os.getenv("SPEECH_CONCURRENCY", "32"))
+SPEECH_TIMEOUT = float(os.getenv("SPEECH_TIMEOUT", "60"))
+LIMIT_QUEUE_TIMEOUT = float(os.getenv("LIMIT_QUEUE_TIMEOUT", "10"))
+
+# OCR of scanned (image-only) pages through Tesseract: language(s) such as "eng" or "eng+deu",
+# worker processes (0 = share the CPUs between API workers), seconds of OCR allowed per
+# document, and the render resolution range in DPI
+OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0"))
+OCR_TIME_BUDGET = float(os.getenv("OCR_TIME_BUDGET", "300"))
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "150"))
+OCR_MAX_DPI = int(os.getenv("OCR_MAX_DPI", "400"))
+
+# Start worker pools, speech engines and the embedding model in the background after startup
+# ("0" leaves each to start on first use; /api/ready turns 200 once warm-up has finished)
+WARM_UP = os.getenv("WARM_UP", "1") != "0"
+
+# Request tracing: fraction of requests traced without asking (X-Trace: 1 always traces), and
+# how many finished traces are kept for /api/traces
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "200"))
+
+# Allow switching the sampling profiler on at runtime through /api/debug/profile
+PROFILING = os.getenv("PROFILING", "0") != "0"
+
+# Background ingestion: concurrent jobs and how many may wait in the queue
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+
+# Upload size caps in bytes, enforced on the bytes actually received
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", str(10 * 1024 * 1024)))
+MAX_RESUMABLE_FILE_SIZE = int(os.getenv("MAX_RESUMABLE_FILE_SIZE", str(1024 * 1024 * 1024)))
+
+# Document lifecycle: days a document is kept after it was last read (0 keeps documents until
+# deleted), bytes the blob store may take before the least recently read blobs are evicted
+# (0 for no limit), and seconds between background compaction passes (0 disables them)
+DOCUMENT_RETENTION_DAYS = float(os.getenv("DOCUMENT_RETENTION_DAYS", "0"))
+STORAGE_QUOTA = int(os.getenv("STORAGE_QUOTA", "0"))
+COMPACT_INTERVAL = float(os.getenv("COMPACT_INTERVAL", "300"))
+
+# Parsed per-document search indexes kept in memory
+INDEX_CACHE_SIZE = int(os.getenv("INDEX_CACHE_SIZE", "16"))
+
+# Cross-document full-text index: where its shard databases live and how many there are
+LIBRARY_INDEX_DIR = os.getenv("LIBRARY_INDEX_DIR", "./data/library")
+LIBRARY_SHARDS = int(os.getenv("LIBRARY_SHARDS", "4"))
+
+# Speech synthesis for streamed audio: "pyttsx3", "espeak" or "stub" (tests), the voice
+# (backend-specific id, empty for the default), words per minute, volume 0-1, and worker processes
+TTS_BACKEND = os.getenv("TTS_BACKEND", "pyttsx3")
+TTS_VOICE = os.getenv("TTS_VOICE", "")
+TTS_RATE = int(os.getenv("TTS_RATE", "150"))
+TTS_VOLUME = float(os.getenv("TTS_VOLUME", "0.8"))
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "2"))
+
+# Synthesized audio cache: directory, size budget in bytes, and minutes of each new
+# document synthesized ahead at upload (0 disables pre-warming)
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "./data/audio")
+AUDIO_CACHE_MAX_SIZE = int(os.getenv("AUDIO_CACHE_MAX_SIZE", str(1024 * 1024 * 1024)))
+AUDIO_PREWARM_MINUTES = float(os.getenv("AUDIO_PREWARM_MINUTES", "2"))
+
+# Answer generator for streaming chat: "extractive" (no model), "stub" (tests) or "openai"
+# (any OpenAI-compatible API; LLM_BASE_URL points it at a local server)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "extractive")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "")
+
+# Local sentence-transformers model for vector retrieval, and how many vector indexes stay open
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+VECTOR_CACHE_SIZE = int(os.getenv("VECTOR_CACHE_SIZE", "8"))
+
+# Storage type of vector index matrices: float32, float16 or int8
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float16")
+
+
+# Chat answer cache: in-process entries, TTL in seconds, optional shared tier
+# ("sqlite:///./data/answers.db", empty to disable) and near-duplicate
+# question similarity (0 disables; matching ignores word order, so it is off by default)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_URL = os.getenv("ANSWER_CACHE_URL", "")
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
\ No newline at end of file
@@ -1,14 +1,35 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # SQLite local database (can be replaced with PostgreSQL in prod)
-DATABASE_URL = "sqlite:///./data/app.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/app.db")
+
+if DATABASE_URL.startswith("sqlite:///"):
+    os.makedirs(os.path.dirname(DATABASE_URL[len("sqlite:///"):]) or ".", exist_ok=True)
+
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
+
+if DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _enable_wal(dbapi_connection, connection_record):
+        # WAL lets several worker processes read while one writes
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 def init_db():
-    from app.core import models
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    from app.api.core import models
+    try:
+        Base.metadata.create_all(bind=engine)
+    except OperationalError:
+        # Another worker created the tables between our check and CREATE; the retry sees them
+        Base.metadata.create_all(bind=engine)
@@ -1,5 +1,7 @@
-from sqlalchemy import Column, String, Integer, Text
-from app.core.db import Base
+import time
+
+from sqlalchemy import Column, String, Integer, Text, Float, LargeBinary, UniqueConstraint
+from app.api.core.db import Base
 
 class PdfDocument(Base):
     __tablename__ = "pdf_documents"
@@ -7,4 +9,42 @@ class PdfDocument(Base):
     id = Column(Integer, primary_key=True, index=True)
     file_id = Column(String, unique=True, index=True, nullable=False)
     filename = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
\ No newline at end of file
+    # Content hash of the stored blob; duplicate uploads share it
+    content_hash = Column(String, index=True, nullable=False)
+    status = Column(String, nullable=False, default="processing")
+    error = Column(Text, nullable=True)
+    job_id = Column(String, nullable=True)
+    page_count = Column(Integer, nullable=True)
+    created_at = Column(Float, nullable=False, default=time.time)
+    last_accessed_at = Column(Float, nullable=False, default=time.time)
+
+class PdfPage(Base):
+    __tablename__ = "pdf_pages"
+    __table_args__ = (UniqueConstraint("content_hash", "page_number"),)
+
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String, index=True, nullable=False)
+    page_number = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+
+class ChunkEmbedding(Base):
+    __tablename__ = "chunk_embeddings"
+    __table_args__ = (UniqueConstraint("model", "text_hash"),)
+
+    id = Column(Integer, primary_key=True)
+    model = Column(String, nullable=False)
+    # BLAKE2b of the chunk text, so identical chunks in any document share a row
+    text_hash = Column(String, nullable=False)
+    # float16 vector bytes
+    vector = Column(LargeBinary, nullable=False)
+
+class PageOcr(Base):
+    __tablename__ = "page_ocr"
+    __table_args__ = (UniqueConstraint("language", "page_hash"),)
+
+    id = Column(Integer, primary_key=True)
+    language = Column(String, nullable=False)
+    # Fingerprint of the page's scanned images, so re-uploads and other editions share rows
+    page_hash = Column(String, nullable=False)
+    # Recognised layout blocks as JSON [[text, size, bold], ...]
+    blocks = Column(Text, nullable=False)
\ No newline at end of file
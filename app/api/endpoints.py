@@ -1,12 +1,92 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, HTTPException, UploadFile, File, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import os
+import json
+import asyncio
+import time
 import uuid
 import logging
-import fitz  # PyMuPDF
-import pyttsx3
-import threading
-from typing import Dict, Optional
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.api.core.config import (
+    ANSWER_CACHE_SIMILARITY,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_URL,
+    AUDIO_CACHE_DIR,
+    AUDIO_CACHE_MAX_SIZE,
+    AUDIO_PREWARM_MINUTES,
+    BATCH_CONCURRENCY,
+    BATCH_TIMEOUT,
+    CHAT_CONCURRENCY,
+    CHAT_TIMEOUT,
+    COMPACT_INTERVAL,
+    DOCUMENT_RETENTION_DAYS,
+    EMBEDDING_DTYPE,
+    EMBEDDING_MODEL,
+    INDEX_CACHE_SIZE,
+    INGEST_QUEUE_SIZE,
+    INGEST_WORKERS,
+    LIBRARY_INDEX_DIR,
+    LIBRARY_SHARDS,
+    LIMIT_QUEUE_TIMEOUT,
+    LLM_BACKEND,
+    LLM_BASE_URL,
+    LLM_MODEL,
+    MAX_FILE_SIZE,
+    MAX_RESUMABLE_FILE_SIZE,
+    PROFILING,
+    QUERY_CONCURRENCY,
+    QUERY_TIMEOUT,
+    SPEECH_CONCURRENCY,
+    SPEECH_TIMEOUT,
+    STATE_URL,
+    STORAGE_QUOTA,
+    TRACE_BUFFER,
+    TTS_BACKEND,
+    TTS_RATE,
+    TTS_VOICE,
+    TTS_VOLUME,
+    TTS_WORKERS,
+    UPLOAD_CONCURRENCY,
+    UPLOAD_DIR,
+    UPLOAD_TIMEOUT,
+    VECTOR_CACHE_SIZE,
+)
+from app.services.answer_cache import AnswerCache
+from app.services.answering import keyword_answer, keyword_answers, vector_answer
+from app.services.audio_cache import AudioCache
+from app.services.blob_store import CHUNK_SIZE, BlobStore, hash_file, new_hasher
+from app.services.chunking import join_blocks
+from app.services.document_store import DocumentStatus, DocumentStore
+from app.services.embeddings import Embedder, EmbeddingService, embeddings_available
+from app.services.execution import EndpointLimit, EndpointTimeoutError, OverloadedError, executors
+from app.services.extraction import extraction_engine
+from app.services.ingestion import IngestionJob, IngestionQueue, QueueFullError
+from app.services.library_index import LibraryIndex
+from app.services.llm import create_llm_backend
+from app.services.lru_cache import LRUCache
+from app.services.metrics import Counter, Gauge, Histogram, Metric, registry
+from app.services.ocr import ocr_available, ocr_engine
+from app.services.page_file import PageReader
+from app.services.profiling import profiler
+from app.services.search_index import InvertedIndex, build_page_index
+from app.services.shared_state import create_state_backend
+from app.services.reading_sessions import FairSynthesisScheduler, ReadingSessionManager, SessionNotFoundError
+from app.services.speech import SpeechPipeline, VoiceSettings
+from app.services.storage import StorageCompactor
+from app.services.tracing import Span, span, trace_store
+from app.services.upload_sessions import (
+    OffsetMismatchError,
+    UploadSessionStore,
+    UploadTooLargeError,
+    write_stream,
+)
+from app.services.vector_index import VectorIndexStore
+from app.services.warmup import WarmUp
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -14,10 +94,9 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter()
 
-# Global TTS engine and control
-tts_engine = None
-tts_thread = None
-stop_reading = False
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: Optional[int] = None
 
 class ChatRequest(BaseModel):
     file_id: str
@@ -26,138 +105,668 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     answer: str
     file_id: str
+    cached: bool = False
 
-# Store uploaded files info
-uploaded_files: Dict[str, Dict] = {}
+class BatchQuestion(BaseModel):
+    message: str
+    file_id: Optional[str] = None
 
-def initialize_tts():
-    """Initialize TTS engine"""
-    global tts_engine
-    try:
-        tts_engine = pyttsx3.init()
-        tts_engine.setProperty('rate', 150)  # Speed
-        tts_engine.setProperty('volume', 0.8)  # Volume
-        logger.info("TTS engine initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize TTS: {e}")
+class BatchChatRequest(BaseModel):
+    questions: List[BatchQuestion]
+    # Document of questions that name none
+    file_id: Optional[str] = None
+    # Send results as NDJSON lines as they are answered
+    stream: bool = False
 
-def extract_pdf_text(file_path: str) -> str:
-    """Extract text from PDF file"""
-    try:
-        doc = fitz.open(file_path)
-        text = ""
-        for page_num in range(doc.page_count):
-            page = doc.load_page(page_num)
-            text += page.get_text()
-        doc.close()
-        return text
-    except Exception as e:
-        logger.error(f"Error extracting text from PDF: {e}")
-        raise HTTPException(500, f"Failed to process PDF: {str(e)}")
+# Job progress, reading sessions and startup coordination shared by all workers
+shared_state = create_state_backend(STATE_URL)
+
+# Document metadata and page text live in the database, shared by all workers
+document_store = DocumentStore()
+
+# Parsed search indexes of recently used documents, by content hash
+index_cache = LRUCache(INDEX_CACHE_SIZE)
+
+# Content-addressed storage for PDFs and their derived files
+blob_store = BlobStore(UPLOAD_DIR)
+
+# Page windows memory-mapped from per-blob page files
+page_reader = PageReader(blob_store, document_store)
+
+# Full-text index over the pages of every document, for library-wide search
+library_index = LibraryIndex(LIBRARY_INDEX_DIR, LIBRARY_SHARDS)
+
+# Per-document embedding indexes, memory-mapped from the blob store
+vector_store = VectorIndexStore(
+    blob_store,
+    EmbeddingService(Embedder(EMBEDDING_MODEL)),
+    VECTOR_CACHE_SIZE,
+    EMBEDDING_DTYPE
+)
+
+# Answers by document, engine and normalized question; optionally shared between workers
+answer_cache = AnswerCache(
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL,
+    create_state_backend(ANSWER_CACHE_URL) if ANSWER_CACHE_URL else None,
+    ANSWER_CACHE_SIMILARITY
+)
+
+# Generates streamed chat answers from retrieved passages
+llm_backend = create_llm_backend(LLM_BACKEND, LLM_MODEL, LLM_BASE_URL or None)
+
+# Synthesized sentences by text and voice, on disk and shared by all workers
+audio_cache = AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_SIZE)
+
+# Synthesizes sentences to WAV on worker processes for streamed playback in the client
+speech_pipeline = SpeechPipeline(
+    VoiceSettings(TTS_BACKEND, TTS_VOICE, TTS_RATE, TTS_VOLUME),
+    TTS_WORKERS,
+    cache=audio_cache
+)
+
+# One session per reader; this worker's readers take turns on the speech workers,
+# cached sentences are served without them
+reading_sessions = ReadingSessionManager(
+    shared_state,
+    FairSynthesisScheduler(speech_pipeline.render, TTS_WORKERS),
+    page_reader.page_sentences,
+    lookup=speech_pipeline.cached
+)
+
+# Audio pre-warming of new documents running in the background
+prewarm_tasks = set()
+
+# Resumable uploads in progress
+upload_sessions = UploadSessionStore(os.path.join(UPLOAD_DIR, "incoming"), MAX_RESUMABLE_FILE_SIZE)
+
+# Frees blobs once their last document is deleted, and applies retention and the storage
+# quota in the background; freeing a blob also drops what these services keep about it
+storage = StorageCompactor(
+    blob_store, document_store, upload_sessions, executors, shared_state,
+    retention_days=DOCUMENT_RETENTION_DAYS, quota=STORAGE_QUOTA, interval=COMPACT_INTERVAL,
+)
+storage.on_release("library_index", library_index.remove)
+storage.on_release("answer_cache", answer_cache.invalidate)
+storage.on_release("index_cache", index_cache.pop)
+storage.on_release("vector_index", vector_store.cache.pop)
+storage.on_release("page_store", page_reader.forget)
+
+# Requests handled at once and time allowed, by endpoint group
+upload_limit = EndpointLimit("upload", UPLOAD_CONCURRENCY, UPLOAD_TIMEOUT, LIMIT_QUEUE_TIMEOUT)
+chat_limit = EndpointLimit("chat", CHAT_CONCURRENCY, CHAT_TIMEOUT, LIMIT_QUEUE_TIMEOUT)
+query_limit = EndpointLimit("query", QUERY_CONCURRENCY, QUERY_TIMEOUT, LIMIT_QUEUE_TIMEOUT)
+batch_limit = EndpointLimit("batch", BATCH_CONCURRENCY, BATCH_TIMEOUT, LIMIT_QUEUE_TIMEOUT)
+speech_limit = EndpointLimit("speech", SPEECH_CONCURRENCY, SPEECH_TIMEOUT, LIMIT_QUEUE_TIMEOUT)
+
+# Subsystems started in the background once the server is up, so first requests don't
+# wait for them; each still starts on first use if warm-up is off or has not reached it
+warm_up = WarmUp()
+warm_up.add("cpu_pool", lambda: executors.warm_up(["app.services.extraction", "app.services.search_index"]))
+warm_up.add("speech", speech_pipeline.warm_up)
+warm_up.add("llm", lambda: executors.run_io(llm_backend.warm_up))
+if embeddings_available():
+    warm_up.add("embeddings", lambda: executors.run_io(vector_store.embeddings.embedder.load))
+
+# Sentences (keyword index) or chunks (vector index) returned per chat answer
+CHAT_TOP_K = 3
+
+# Bump when retrieval or answer formatting changes, so cached answers are not reused
+ANSWER_ENGINE_VERSION = 2
+
+# Upper bound on questions per batch request, and questions answered per step of a batch
+MAX_BATCH_QUESTIONS = 10000
+BATCH_STEP = 500
+
+# Upper bound on hits returned by library search
+MAX_SEARCH_RESULTS = 50
+
+# Upper bound on pages returned per page-window request
+MAX_PAGE_WINDOW = 50
 
-def read_text_aloud(text: str):
-    """Read text using TTS in background"""
-    global tts_engine, stop_reading
+# Longest the sampling profiler may stay switched on for a route, in seconds
+MAX_PROFILE_SECONDS = 600
+
+# Reads of a document closer together than this record its last access once, in seconds
+ACCESS_RESOLUTION = 60
+
+# Upper bound on documents returned per listing request
+MAX_DOCUMENT_LIST = 200
+
+# Where ingestion and chat time goes, by stage
+INGEST_STAGE_SECONDS = registry.histogram("ingest_stage_seconds", "Ingestion time by stage", ["stage"])
+CHAT_STAGE_SECONDS = registry.histogram(
+    "chat_stage_seconds",
+    "Chat time by endpoint and stage: answer cache lookup, retrieval, answer generation",
+    ["endpoint", "stage"],
+)
+CHAT_FIRST_TOKEN_SECONDS = registry.histogram("chat_first_token_seconds", "Time from the start of generation to the first streamed token")
+
+@contextmanager
+def timed_stage(histogram: Histogram, *labels: str) -> Iterator[Span]:
+    """Time a stage into a histogram, as a span of the current trace too"""
+    with span(".".join(labels)) as timing:
+        yield timing
+    histogram.labels(*labels).observe(timing.duration)
+
+def make_preview(text: str) -> str:
+    """First 500 characters of a document"""
+    return text[:500] + "..." if len(text) > 500 else text
+
+def is_content_ready(digest: str) -> bool:
+    """True when a blob's pages and index are stored, so it needs no extraction"""
+    return blob_store.has_index(digest) and page_reader.has_pages(digest)
+
+async def get_preview(digest: str) -> str:
+    """Preview built from the first pages of a document"""
+    pages = await executors.run_io(page_reader.read, digest, 0, 5)
+    return make_preview("".join(pages))
+
+async def get_index(digest: str) -> InvertedIndex:
+    """Search index of a blob, loaded from disk on first use"""
+    index = index_cache.get(digest)
+    if index is None:
+        index = await executors.run_io(InvertedIndex.load, blob_store.index_path(digest))
+        index_cache.put(digest, index)
+    return index
+
+async def ingest_document(job: IngestionJob, queue: IngestionQueue) -> Dict:
+    """Extract, chunk and index an uploaded PDF, reporting per-page progress; traced when sampled"""
+    if not trace_store.should_trace(False):
+        return await run_ingestion(job, queue)
+    with trace_store.trace(f"ingest {job.filename}") as trace:
+        trace.attributes.update({"job_id": job.id, "file_id": job.file_id})
+        return await run_ingestion(job, queue)
+
+async def run_ingestion(job: IngestionJob, queue: IngestionQueue) -> Dict:
+    """Extract, chunk and index an uploaded PDF, reporting per-page progress"""
     try:
-        if tts_engine is None:
-            initialize_tts()
+        digest = job.content_hash
+        deduplicated = await executors.run_io(is_content_ready, digest)
         
-        if tts_engine:
-            # Split text into chunks to allow stopping
-            words = text.split()
-            chunk_size = 50  # Read 50 words at a time
-            
-            for i in range(0, len(words), chunk_size):
-                if stop_reading:
-                    break
-                
-                chunk = " ".join(words[i:i + chunk_size])
-                tts_engine.say(chunk)
-                tts_engine.runAndWait()
+        if deduplicated:
+            # An identical upload finished while this job was queued
+            total_pages = await executors.run_io(page_reader.page_count, digest)
+            pages = None
+            structure = None
+            ocr_result = None
+        else:
+            queue.update(job, stage="extracting")
+            ocr_result = None
+            pages: List[str] = []
+            blocks: List[tuple] = []
+            scanned = {}
+            with timed_stage(INGEST_STAGE_SECONDS, "extracting") as extracting:
+                total_pages = await extraction_engine.page_count(job.file_path)
+                queue.update(job, total_pages=total_pages)
+                extracting.attributes["pages"] = total_pages
                 
-        logger.info("TTS reading completed")
+                async for page in extraction_engine.stream_pages(job.file_path, total_pages):
+                    pages.append(page.text)
+                    blocks.append(page.blocks)
+                    if page.scan is not None:
+                        scanned[page.number] = page.scan
+                    queue.update(job, pages_done=len(pages))
+            
+            # Scanned pages have no text layer; only they go through OCR
+            if scanned:
+                with timed_stage(INGEST_STAGE_SECONDS, "ocr"):
+                    ocr_result = await recognize_scanned_pages(job, queue, scanned, pages, blocks)
+            
+            # Sentence chunking and indexing are CPU-bound, they run on the process pool
+            queue.update(job, stage="indexing")
+            with timed_stage(INGEST_STAGE_SECONDS, "indexing"):
+                structure = await executors.run_cpu(build_page_index, blocks, blob_store.index_path(digest))
+                # Page texts live only in the compressed page store, which also maps the index's sentence ids
+                await executors.run_io(page_reader.write, digest, pages, structure)
+                await executors.run_io(page_reader.write_structure, digest, structure)
+            # The index is loaded from disk on the first question
+            index_cache.pop(digest)
+        
+        # Derived indexes a deduplicated blob may still lack, built from its stored pages
+        if pages is None and not await executors.run_io(library_index.contains, digest):
+            pages = await executors.run_io(page_reader.read_all, digest)
+        if pages is not None:
+            with timed_stage(INGEST_STAGE_SECONDS, "library_index"):
+                await executors.run_io(library_index.add, digest, pages)
+        
+        if embeddings_available() and not vector_store.has_index(digest):
+            queue.update(job, stage="embedding")
+            with timed_stage(INGEST_STAGE_SECONDS, "embedding"):
+                if pages is None:
+                    pages = await executors.run_io(page_reader.read_all, digest)
+                if structure is None:
+                    structure = await executors.run_io(page_reader.structure, digest)
+                await executors.run_io(vector_store.build, digest, pages, structure)
+            await executors.run_io(answer_cache.invalidate, digest)
+        
+        if not deduplicated:
+            # Re-ingested content may answer differently
+            await executors.run_io(answer_cache.invalidate, digest)
+        
+        await executors.run_io(document_store.set_status, job.file_id, DocumentStatus.READY, None, total_pages)
+        if AUDIO_PREWARM_MINUTES > 0:
+            start_audio_prewarm(digest)
+        preview = await get_preview(digest)
+        result = {"preview": preview, "page_count": total_pages, "deduplicated": deduplicated}
+        if ocr_result is not None:
+            result["ocr"] = ocr_result
+        return result
     except Exception as e:
-        logger.error(f"TTS error: {e}")
+        await executors.run_io(document_store.set_status, job.file_id, DocumentStatus.FAILED, str(e))
+        raise
+
+async def recognize_scanned_pages(job: IngestionJob, queue: IngestionQueue, scanned: Dict, pages: List[str], blocks: List[tuple]) -> Dict:
+    """OCR the scanned pages of a document in place, within its time budget"""
+    if not ocr_available():
+        logger.warning(f"{len(scanned)} scanned pages of {job.filename} left without text: Tesseract is not installed")
+        return {"scanned_pages": len(scanned), "recognized": 0, "skipped": len(scanned)}
+    
+    queue.update(job, stage="ocr", total_pages=len(scanned), pages_done=0)
+    recognized = 0
+    async for number, page_blocks in ocr_engine.recognize(job.file_path, scanned):
+        blocks[number] = tuple(page_blocks)
+        pages[number] = join_blocks(page_blocks)
+        recognized += 1
+        queue.update(job, pages_done=recognized)
+    queue.update(job, total_pages=len(pages), pages_done=len(pages))
+    return {"scanned_pages": len(scanned), "recognized": recognized, "skipped": len(scanned) - recognized}
+
+def start_audio_prewarm(digest: str) -> None:
+    """Synthesize the first AUDIO_PREWARM_MINUTES of a document into the audio cache in the background"""
+    async def prewarm():
+        try:
+            synthesized = await reading_sessions.prewarm(digest, int(AUDIO_PREWARM_MINUTES * TTS_RATE))
+            logger.info(f"Pre-warmed {synthesized} audio segments for {digest[:12]}")
+        except Exception as e:
+            logger.warning(f"Audio pre-warming failed for {digest[:12]}: {e}")
+    
+    task = asyncio.create_task(prewarm())
+    prewarm_tasks.add(task)
+    task.add_done_callback(prewarm_tasks.discard)
+
+# Background ingestion workers, bounded so bursts get 429 instead of piling up
+ingestion_queue = IngestionQueue(ingest_document, workers=INGEST_WORKERS, max_pending=INGEST_QUEUE_SIZE, state=shared_state)
+
+async def get_ready_document(file_id: str) -> Dict:
+    """Look up a processed document, raising 404 if unknown and 409 until it is ready"""
+    document = await executors.run_io(document_store.get_document, file_id)
+    if document is None:
+        raise HTTPException(404, "File not found")
+    if document["status"] == DocumentStatus.FAILED:
+        raise HTTPException(409, f"Processing failed: {document['error']}")
+    if document["status"] != DocumentStatus.READY:
+        raise HTTPException(409, "File is still being processed")
+    if time.time() - document["last_accessed_at"] > ACCESS_RESOLUTION:
+        # Feeds retention and quota eviction
+        await executors.run_io(document_store.touch, file_id)
+    return document
+
+async def queue_existing_document(file_id: str, filename: str, digest: str) -> None:
+    """Mark a stored document ready, or queue its ingestion again"""
+    if await executors.run_io(is_content_ready, digest):
+        page_count = await executors.run_io(page_reader.page_count, digest)
+        await executors.run_io(document_store.set_status, file_id, DocumentStatus.READY, None, page_count)
+        return
+    
+    job = IngestionJob(file_id=file_id, filename=filename, file_path=str(blob_store.blob_path(digest)), content_hash=digest)
+    await executors.run_io(document_store.set_status, file_id, DocumentStatus.PROCESSING, None, None, job.id)
+    try:
+        ingestion_queue.submit(job)
+    except QueueFullError:
+        await executors.run_io(document_store.set_status, file_id, DocumentStatus.FAILED, "Ingestion queue was full at startup")
+
+async def recover_documents() -> None:
+    """Register PDFs stored before content addressing and resume ingestion interrupted by a restart"""
+    # With several workers only the first one to start does this
+    claimed = await executors.run_io(shared_state.claim, "startup:recovery", {"pid": os.getpid()}, 60)
+    if not claimed:
+        return
+    
+    def is_known(file_id: str) -> bool:
+        return document_store.get_document(file_id) is not None
+    
+    adopted = await executors.run_io(blob_store.adopt_legacy_uploads, is_known)
+    for file_id, digest in adopted:
+        await executors.run_io(document_store.add_document, file_id, f"{file_id}.pdf", digest, DocumentStatus.PROCESSING)
+    if adopted:
+        logger.info(f"Adopted {len(adopted)} legacy uploads into the blob store")
+    
+    pending = await executors.run_io(document_store.list_by_status, DocumentStatus.PROCESSING)
+    for document in pending:
+        await queue_existing_document(document["file_id"], document["filename"], document["content_hash"])
+    if pending:
+        logger.info(f"Resumed ingestion for {len(pending)} documents")
+    
+    await backfill_library_index()
+
+async def backfill_library_index() -> None:
+    """Add ready documents processed before library search existed to its index"""
+    ready = await executors.run_io(document_store.list_by_status, DocumentStatus.READY)
+    added = set()
+    for document in ready:
+        digest = document["content_hash"]
+        if digest in added or await executors.run_io(library_index.contains, digest):
+            continue
+        pages = await executors.run_io(page_reader.read_all, digest)
+        await executors.run_io(library_index.add, digest, pages)
+        added.add(digest)
+    if added:
+        logger.info(f"Added {len(added)} documents to the library index")
 
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "PDF Reader API is running"}
 
+@router.get("/ready")
+async def readiness_check():
+    """Readiness check: 503 until startup and background warm-up have finished"""
+    report = warm_up.report()
+    if not report["ready"]:
+        return JSONResponse(report, status_code=503)
+    return report
+
+async def register_upload(filename: str, temp_path: Path, digest: str) -> Dict:
+    """Move a received upload to its blob, then queue ingestion unless it is already processed"""
+    file_id = str(uuid.uuid4())
+    job = IngestionJob(file_id=file_id, filename=filename, file_path=str(blob_store.blob_path(digest)), content_hash=digest)
+    
+    # Reference the blob before committing it, so storage compaction never frees a blob an upload is reusing
+    await executors.run_io(document_store.add_document, file_id, filename, digest, DocumentStatus.PROCESSING, job.id)
+    
+    # Identical content maps onto the existing blob
+    blob_path, existed = await executors.run_io(blob_store.commit_blob, temp_path, digest)
+    file_path = str(blob_path)
+    
+    if await executors.run_io(is_content_ready, digest):
+        # Already extracted and indexed, nothing left to do
+        page_count = await executors.run_io(page_reader.page_count, digest)
+        await executors.run_io(document_store.set_status, file_id, DocumentStatus.READY, None, page_count)
+        ingestion_queue.record_finished(job, {
+            "preview": await get_preview(digest),
+            "page_count": page_count,
+            "deduplicated": True
+        })
+    else:
+        # Queue extraction and indexing; the client follows progress via /jobs
+        try:
+            ingestion_queue.submit(job)
+        except QueueFullError as e:
+            await executors.run_io(document_store.delete_document, file_id)
+            if not existed:
+                # Hand the bytes back so a resumable upload can retry completion
+                await executors.run_io(os.replace, file_path, temp_path)
+            raise HTTPException(429, f"Too many uploads in progress, retry later ({e})")
+    
+    logger.info(f"PDF uploaded: {filename} -> {file_id} (blob {digest[:12]}, job {job.id}, {job.status.value})")
+    
+    return {
+        "file_id": file_id,
+        "job_id": job.id,
+        "status": job.status.value,
+        "message": "PDF already processed" if job.finished else "PDF uploaded, processing started"
+    }
+
+def validate_pdf_name(filename: Optional[str]) -> None:
+    """Reject anything that is not named like a PDF"""
+    if not filename or not filename.lower().endswith('.pdf'):
+        raise HTTPException(400, "Only PDF files are allowed")
+
 @router.post("/upload")
+@upload_limit
 async def upload_pdf(file: UploadFile = File(...)):
-    """Upload and process PDF file"""
+    """Upload PDF file and queue it for background processing"""
+    temp_path = None
     try:
         # Validate file
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(400, "Only PDF files are allowed")
-        
-        if file.size and file.size > 10 * 1024 * 1024:  # 10MB limit
-            raise HTTPException(400, "File too large (max 10MB)")
+        validate_pdf_name(file.filename)
         
-        # Generate unique file ID
-        file_id = str(uuid.uuid4())
+        if file.size and file.size > MAX_FILE_SIZE:
+            raise HTTPException(413, f"File too large (max {MAX_FILE_SIZE / (1024 * 1024):.0f}MB)")
         
-        # Create uploads directory if it doesn't exist
-        os.makedirs("uploads", exist_ok=True)
+        async def body_chunks():
+            while chunk := await file.read(CHUNK_SIZE):
+                yield chunk
         
-        # Save file
-        file_path = f"uploads/{file_id}.pdf"
-        content = await file.read()
+        # Save file in fixed-size chunks off the event loop, hashing it as it streams in
+        temp_path = blob_store.temp_path()
+        hasher = new_hasher()
+        try:
+            await write_stream(body_chunks(), temp_path, MAX_FILE_SIZE, hasher=hasher)
+        except UploadTooLargeError:
+            raise HTTPException(413, f"File too large (max {MAX_FILE_SIZE / (1024 * 1024):.0f}MB)")
         
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
-        # Extract text
-        text = extract_pdf_text(file_path)
-        
-        # Store file info
-        uploaded_files[file_id] = {
-            "original_name": file.filename,
-            "file_path": file_path,
-            "text": text,
-            "preview": text[:500] + "..." if len(text) > 500 else text
-        }
-        
-        logger.info(f"PDF uploaded successfully: {file.filename} -> {file_id}")
-        
-        return {
-            "file_id": file_id,
-            "message": "PDF uploaded and processed successfully",
-            "preview": uploaded_files[file_id]["preview"]
-        }
+        result = await register_upload(file.filename, temp_path, hasher.hexdigest())
+        temp_path = None
+        return result
         
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Upload error: {e}")
         raise HTTPException(500, f"Upload failed: {str(e)}")
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
 
-@router.post("/read/start/{file_id}")
-async def start_reading(file_id: str, background_tasks: BackgroundTasks):
-    """Start reading PDF aloud"""
-    global tts_thread, stop_reading
+@router.post("/uploads")
+async def create_upload_session(request: UploadSessionRequest):
+    """Start a resumable upload; send the file in pieces with PUT /uploads/{id}"""
+    validate_pdf_name(request.filename)
+    try:
+        session = await executors.run_io(upload_sessions.create, request.filename, request.size)
+    except UploadTooLargeError as e:
+        raise HTTPException(413, str(e))
+    session["max_size"] = upload_sessions.max_size
+    return session
+
+@router.get("/uploads/{upload_id}")
+async def get_upload_session(upload_id: str):
+    """Current offset of a resumable upload, to continue after an interruption"""
+    session = await executors.run_io(upload_sessions.get, upload_id)
+    if session is None:
+        raise HTTPException(404, "Upload not found")
+    return session
+
+@router.put("/uploads/{upload_id}")
+@upload_limit
+async def append_upload_chunk(upload_id: str, offset: int, request: Request):
+    """Append the raw request body at the given offset"""
+    try:
+        new_offset = await upload_sessions.append(upload_id, offset, request.stream())
+    except KeyError:
+        raise HTTPException(404, "Upload not found")
+    except OffsetMismatchError as e:
+        raise HTTPException(409, {"message": str(e), "offset": e.expected})
+    except UploadTooLargeError as e:
+        raise HTTPException(413, str(e))
+    return {"upload_id": upload_id, "offset": new_offset}
+
+@router.post("/uploads/{upload_id}/complete")
+@upload_limit
+async def complete_upload_session(upload_id: str):
+    """Finish a resumable upload and queue it for processing like /upload"""
+    session = await executors.run_io(upload_sessions.get, upload_id)
+    if session is None:
+        raise HTTPException(404, "Upload not found")
+    if session["size"] is not None and session["offset"] != session["size"]:
+        raise HTTPException(409, {"message": "Upload is incomplete", "offset": session["offset"]})
+    if session["offset"] == 0:
+        raise HTTPException(400, "Upload is empty")
+    
+    part_path = upload_sessions.part_path(upload_id)
+    digest = await executors.run_io(hash_file, part_path)
+    result = await register_upload(session["filename"], part_path, digest)
+    await executors.run_io(upload_sessions.discard, upload_id)
+    return result
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Ingestion job status and per-page progress"""
+    snapshot = await executors.run_io(ingestion_queue.snapshot, job_id)
+    if snapshot is None:
+        raise HTTPException(404, "Job not found")
+    return snapshot
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Stream ingestion progress as server-sent events until the job finishes"""
+    if await executors.run_io(ingestion_queue.snapshot, job_id) is None:
+        raise HTTPException(404, "Job not found")
+    
+    async def event_stream():
+        async for snapshot in ingestion_queue.watch(job_id):
+            yield f"data: {json.dumps(snapshot)}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+def session_response(session: Dict) -> Dict:
+    """Public view of a reading session, with 1-based page numbers"""
+    return {
+        "session_id": session["session_id"],
+        "file_id": session["file_id"],
+        "state": session["state"],
+        "page": session["page"] + 1,
+        "sentence": session["sentence"],
+        "page_count": session["page_count"],
+        "audio_url": f"/api/sessions/{session['session_id']}/audio"
+    }
+
+async def get_reading_session(session_id: str) -> Dict:
+    """Look up a reading session, raising 404 if unknown or expired"""
+    session = await executors.run_io(reading_sessions.get, session_id)
+    if session is None:
+        raise HTTPException(404, "Reading session not found")
+    return session
+
+async def start_document_session(file_id: str, page: int) -> Dict:
+    """Create a reading session for a ready document from a 1-based page"""
+    document = await get_ready_document(file_id)
+    if page < 1 or (document["page_count"] and page > document["page_count"]):
+        raise HTTPException(400, f"Page must be between 1 and {document['page_count']}")
+    return await executors.run_io(
+        reading_sessions.create, file_id, document["content_hash"], document["page_count"], None, page - 1
+    )
+
+async def start_text_session(text: str) -> Dict:
+    """Create a reading session for a piece of text"""
+    if not text.strip():
+        raise HTTPException(400, "Text must not be empty")
+    return await executors.run_io(reading_sessions.create, None, None, None, text)
+
+async def stream_session(start: Callable[[], Awaitable[str]]) -> StreamingResponse:
+    """WAV response following the reading session that ``start`` returns the id of, under the speech limit"""
+    
+    async def prepare():
+        return reading_sessions.stream(await start())
     
+    return StreamingResponse(await speech_limit.stream(prepare, idle=True), media_type="audio/wav")
+
+@router.get("/documents")
+async def list_documents(limit: int = 50, offset: int = 0, status: Optional[str] = None):
+    """Uploaded documents, newest first"""
+    if limit < 1 or limit > MAX_DOCUMENT_LIST:
+        raise HTTPException(400, f"Limit must be between 1 and {MAX_DOCUMENT_LIST}")
+    if offset < 0:
+        raise HTTPException(400, "Offset must not be negative")
+    documents = await executors.run_io(document_store.list_documents, limit, offset, status)
+    total = await executors.run_io(document_store.count_documents, status)
+    return {"total": total, "limit": limit, "offset": offset, "documents": documents}
+
+@router.get("/documents/{file_id}")
+async def get_document_stats(file_id: str):
+    """A document with the storage taken by its blob and how many documents share it"""
+    document = await executors.run_io(document_store.get_document, file_id)
+    if document is None:
+        raise HTTPException(404, "File not found")
+    digest = document["content_hash"]
+    return {
+        **document,
+        "storage": {
+            "bytes": await executors.run_io(storage.blob_size, digest),
+            "references": await executors.run_io(document_store.reference_count, digest),
+        },
+    }
+
+@router.delete("/documents/{file_id}")
+async def delete_document(file_id: str):
+    """Delete a document; its blob and derived files go with the last document stored as it"""
     try:
-        if file_id not in uploaded_files:
+        document = await executors.run_io(document_store.get_document, file_id)
+        if document is None:
             raise HTTPException(404, "File not found")
+        if document["status"] == DocumentStatus.PROCESSING:
+            raise HTTPException(409, "File is still being processed")
         
-        # Stop any current reading
-        stop_reading = True
-        if tts_thread and tts_thread.is_alive():
-            tts_thread.join(timeout=1)
+        result = await executors.run_io(storage.delete_document, file_id)
+        if result is None:
+            raise HTTPException(404, "File not found")
+        logger.info(f"Deleted document {file_id} ({result['references']} references left, {result['bytes_freed']} bytes freed)")
+        return {"file_id": file_id, "deleted": True, **result}
         
-        # Reset stop flag and start new reading
-        stop_reading = False
-        text = uploaded_files[file_id]["text"]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Delete error: {e}")
+        raise HTTPException(500, f"Failed to delete document: {str(e)}")
+
+@router.get("/storage")
+async def storage_usage():
+    """Blob store usage against the quota, and the latest compaction pass"""
+    usage = await executors.run_io(storage.usage)
+    return {
+        **usage,
+        "quota": storage.quota or None,
+        "retention_days": storage.retention_days or None,
+        "documents": await executors.run_io(document_store.count_documents),
+        "compacting": storage.running,
+        "last_compaction": await executors.run_io(storage.last_report),
+    }
+
+@router.post("/storage/compact")
+async def compact_storage():
+    """Run a compaction pass now instead of waiting for the next one"""
+    report = await storage.compact_now()
+    if report is None:
+        raise HTTPException(409, "Compaction is running or has just run on a worker; see /api/storage for the last pass")
+    return report
+
+@router.get("/documents/{file_id}/pages")
+@query_limit
+async def get_document_pages(file_id: str, start: int = 1, count: int = 10):
+    """A window of page texts, with 1-based page numbers"""
+    try:
+        document = await get_ready_document(file_id)
+        page_count = document["page_count"] or await executors.run_io(page_reader.page_count, document["content_hash"])
+        if start < 1 or start > max(page_count, 1):
+            raise HTTPException(400, f"Start must be between 1 and {page_count}")
+        if count < 1 or count > MAX_PAGE_WINDOW:
+            raise HTTPException(400, f"Count must be between 1 and {MAX_PAGE_WINDOW}")
         
-        # Start TTS in background thread
-        tts_thread = threading.Thread(target=read_text_aloud, args=(text,))
-        tts_thread.daemon = True
-        tts_thread.start()
+        pages = await executors.run_io(page_reader.read, document["content_hash"], start - 1, count)
+        return {
+            "file_id": file_id,
+            "page_count": page_count,
+            "start": start,
+            "count": len(pages),
+            "pages": [{"page": start + offset, "text": text} for offset, text in enumerate(pages)]
+        }
         
-        logger.info(f"Started reading PDF: {file_id}")
-        return {"message": "Started reading PDF", "file_id": file_id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Page window error: {e}")
+        raise HTTPException(500, f"Failed to read pages: {str(e)}")
+
+@router.post("/read/start/{file_id}")
+@query_limit
+async def start_reading(file_id: str, page: int = 1):
+    """Start a reading session for a PDF; play it from the returned audio URL"""
+    try:
+        session = await start_document_session(file_id, page)
+        logger.info(f"Started reading session {session['session_id']} for PDF: {file_id} from page {page}")
+        return {"message": "Started reading PDF", **session_response(session)}
         
     except HTTPException:
         raise
@@ -165,74 +774,179 @@ async def start_reading(file_id: str, background_tasks: BackgroundTasks):
         logger.error(f"Reading start error: {e}")
         raise HTTPException(500, f"Failed to start reading: {str(e)}")
 
-@router.post("/read/stop")
-async def stop_reading_endpoint():
-    """Stop current TTS reading"""
-    global stop_reading, tts_engine
+@router.get("/read/stream/{file_id}")
+async def stream_reading(file_id: str, page: int = 1):
+    """Stream the PDF as WAV audio from a page on, in a new reading session"""
+    
+    async def start() -> str:
+        try:
+            session = await start_document_session(file_id, page)
+            logger.info(f"Streaming audio for PDF: {file_id} from page {page} in session {session['session_id']}")
+            return session["session_id"]
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Audio stream error: {e}")
+            raise HTTPException(500, f"Failed to stream audio: {str(e)}")
     
+    return await stream_session(start)
+
+@router.get("/speak/stream")
+async def stream_speech(text: str):
+    """Stream custom text as WAV audio"""
+    
+    async def start() -> str:
+        return (await start_text_session(text))["session_id"]
+    
+    return await stream_session(start)
+
+@router.post("/read/stop")
+async def stop_reading_endpoint(session_id: str):
+    """Stop a reading session"""
     try:
-        stop_reading = True
-        
-        # Stop TTS engine
-        if tts_engine:
-            try:
-                tts_engine.stop()
-            except:
-                pass
-        
-        logger.info("Stopped TTS reading")
-        return {"message": "Reading stopped"}
+        await get_reading_session(session_id)
+        await executors.run_io(reading_sessions.stop, session_id)
+        logger.info(f"Stopped reading session {session_id}")
+        return {"message": "Reading stopped", "session_id": session_id}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Stop reading error: {e}")
         raise HTTPException(500, f"Failed to stop reading: {str(e)}")
 
 @router.post("/speak")
+@query_limit
 async def speak_text(text: str):
-    """Speak given text"""
-    global tts_engine, stop_reading
-    
+    """Start a reading session for custom text"""
     try:
-        # Stop current reading first
-        stop_reading = True
+        session = await start_text_session(text)
+        return {"message": "Speaking text", **session_response(session)}
         
-        if tts_engine is None:
-            initialize_tts()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Speak error: {e}")
+        raise HTTPException(500, f"Failed to speak text: {str(e)}")
+
+@router.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """State and position of a reading session"""
+    return session_response(await get_reading_session(session_id))
+
+@router.get("/sessions/{session_id}/audio")
+async def session_audio(session_id: str):
+    """Stream a reading session as WAV from its current position; a newer stream replaces this one"""
+    
+    async def start() -> str:
+        await get_reading_session(session_id)
+        return session_id
+    
+    return await stream_session(start)
+
+@router.post("/sessions/{session_id}/pause")
+async def pause_session(session_id: str):
+    """Pause a reading session after the current sentence"""
+    try:
+        return session_response(await executors.run_io(reading_sessions.pause, session_id))
+    except SessionNotFoundError:
+        raise HTTPException(404, "Reading session not found")
+
+@router.post("/sessions/{session_id}/resume")
+async def resume_session(session_id: str):
+    """Resume a paused reading session"""
+    try:
+        return session_response(await executors.run_io(reading_sessions.resume, session_id))
+    except SessionNotFoundError:
+        raise HTTPException(404, "Reading session not found")
+
+@router.post("/sessions/{session_id}/seek")
+async def seek_session(session_id: str, page: int, sentence: int = 0):
+    """Move a reading session to a 1-based page and a sentence offset within it"""
+    try:
+        return session_response(await executors.run_io(reading_sessions.seek, session_id, page - 1, sentence))
+    except SessionNotFoundError:
+        raise HTTPException(404, "Reading session not found")
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@router.post("/sessions/{session_id}/stop")
+async def stop_session(session_id: str):
+    """Stop a reading session"""
+    try:
+        return session_response(await executors.run_io(reading_sessions.stop, session_id))
+    except SessionNotFoundError:
+        raise HTTPException(404, "Reading session not found")
+
+@router.get("/audio/cache")
+async def audio_cache_metrics():
+    """Audio cache hit/miss metrics and size"""
+    return await executors.run_io(audio_cache.metrics)
+
+@router.get("/search")
+@query_limit
+async def search_library(q: str, limit: int = 10):
+    """Search the pages of every ready document"""
+    try:
+        if not q.strip():
+            raise HTTPException(400, "Query must not be empty")
+        limit = max(1, min(limit, MAX_SEARCH_RESULTS))
         
-        if tts_engine:
-            # Start new speech in background
-            def speak():
-                tts_engine.say(text)
-                tts_engine.runAndWait()
-            
-            thread = threading.Thread(target=speak)
-            thread.daemon = True
-            thread.start()
+        hits = await executors.run_io(library_index.search, q, limit)
+        documents = await executors.run_io(document_store.list_by_hashes, [hit.content_hash for hit in hits])
         
-        return {"message": "Speaking text"}
+        # A blob uploaded under several file_ids yields one result per document
+        results = [
+            {
+                "file_id": document["file_id"],
+                "filename": document["filename"],
+                "page": hit.page + 1,
+                "snippet": hit.snippet,
+                "score": round(hit.score, 4)
+            }
+            for hit in hits
+            for document in documents.get(hit.content_hash, [])
+        ]
+        return {"query": q, "results": results[:limit]}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Speak error: {e}")
-        raise HTTPException(500, f"Failed to speak text: {str(e)}")
+        logger.error(f"Search error: {e}")
+        raise HTTPException(500, f"Search failed: {str(e)}")
 
 @router.post("/chat", response_model=ChatResponse)
+@chat_limit
 async def chat_with_pdf(request: ChatRequest):
     """Ask questions about uploaded PDF"""
     try:
-        if request.file_id not in uploaded_files:
-            raise HTTPException(404, "File not found")
+        document = await get_ready_document(request.file_id)
+        digest = document["content_hash"]
+        engine = answer_engine(digest)
         
-        text = uploaded_files[request.file_id]["text"]
-        question = request.message.lower()
+        with timed_stage(CHAT_STAGE_SECONDS, "chat", "cache"):
+            answer = await executors.run_io(answer_cache.get, digest, engine, request.message)
+        cached = answer is not None
         
-        # Simple keyword-based Q&A (you can enhance this with AI)
-        answer = simple_qa(text, question)
+        if not cached:
+            # Answers are assembled from the retrieved text, so retrieval is all of the work
+            with timed_stage(CHAT_STAGE_SECONDS, "chat", "retrieval"):
+                # Semantic retrieval when the document has embeddings, keyword Q&A otherwise
+                if engine.startswith("vector"):
+                    answer = await executors.run_io(vector_qa, digest, request.message)
+                if answer is None:
+                    index = await get_index(digest)
+                    # Scoring is pure Python; on a thread it shares the GIL instead of stalling the event loop
+                    answer = await executors.run_io(indexed_qa, digest, index, request.message)
+            await executors.run_io(answer_cache.put, digest, engine, request.message, answer)
         
-        logger.info(f"Chat query processed for file: {request.file_id}")
+        logger.info(f"Chat query processed for file: {request.file_id}{' (cached)' if cached else ''}")
         
         return ChatResponse(
             answer=answer,
-            file_id=request.file_id
+            file_id=request.file_id,
+            cached=cached
         )
         
     except HTTPException:
@@ -241,32 +955,308 @@ async def chat_with_pdf(request: ChatRequest):
         logger.error(f"Chat error: {e}")
         raise HTTPException(500, f"Chat failed: {str(e)}")
 
-def simple_qa(text: str, question: str) -> str:
-    """Simple keyword-based question answering"""
-    text_lower = text.lower()
-    question_lower = question.lower()
-    
-    # Extract relevant sentences based on keywords
-    sentences = text.split('.')
-    relevant_sentences = []
-    
-    # Extract keywords from question
-    question_words = question_lower.split()
-    important_words = [word for word in question_words if len(word) > 3]
-    
-    # Find sentences containing question keywords
-    for sentence in sentences:
-        sentence_lower = sentence.lower()
-        if any(word in sentence_lower for word in important_words):
-            relevant_sentences.append(sentence.strip())
-            if len(relevant_sentences) >= 3:  # Limit to 3 relevant sentences
-                break
-    
-    if relevant_sentences:
-        answer = ". ".join(relevant_sentences)
-        return f"Based on the document: {answer}"
-    else:
-        return "I couldn't find specific information about that question in the document. Please try rephrasing your question or ask about different topics covered in the PDF."
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """Stream retrieved passages, then answer tokens, as server-sent events"""
+    
+    async def prepare():
+        try:
+            document = await get_ready_document(request.file_id)
+            digest = document["content_hash"]
+            engine = f"{answer_engine(digest)}-{llm_backend.name}"
+            
+            with timed_stage(CHAT_STAGE_SECONDS, "chat_stream", "retrieval"):
+                passages = await retrieve_passages(digest, request.message)
+            with timed_stage(CHAT_STAGE_SECONDS, "chat_stream", "cache"):
+                cached = await executors.run_io(answer_cache.get, digest, engine, request.message)
+            return event_stream(digest, engine, passages, cached)
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            raise HTTPException(500, f"Chat failed: {str(e)}")
+    
+    async def event_stream(digest: str, engine: str, passages: List[Dict], cached: Optional[str]):
+        yield sse_event("passages", {"passages": passages})
+        if cached is not None:
+            yield sse_event("token", {"text": cached})
+            yield sse_event("done", {"answer": cached, "cached": True})
+            return
+        
+        pieces = []
+        tokens = llm_backend.stream(request.message, passages)
+        try:
+            with timed_stage(CHAT_STAGE_SECONDS, "chat_stream", "generation") as generation:
+                async for piece in tokens:
+                    # Stop generating as soon as the client goes away
+                    if await http_request.is_disconnected():
+                        logger.info(f"Chat stream cancelled by client for file: {request.file_id}")
+                        return
+                    if not pieces:
+                        CHAT_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - generation.start)
+                    pieces.append(piece)
+                    yield sse_event("token", {"text": piece})
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield sse_event("error", {"detail": f"Chat failed: {str(e)}"})
+            return
+        finally:
+            await tokens.aclose()
+        
+        answer = "".join(pieces)
+        await executors.run_io(answer_cache.put, digest, engine, request.message, answer)
+        yield sse_event("done", {"answer": answer, "cached": False})
+    
+    # The chat slot and time limit cover retrieval and generation until the last event
+    body = await chat_limit.stream(prepare, on_timeout=lambda e: sse_event("error", {"detail": str(e)}))
+    return StreamingResponse(body, media_type="text/event-stream")
+
+async def answer_questions(digest: str, questions: List[str]) -> List[Tuple[str, bool]]:
+    """Answers and whether each was cached, for questions about one document; the uncached ones are retrieved together"""
+    engine = answer_engine(digest)
+    unique = list(dict.fromkeys(questions))
+    
+    def cached_answers() -> Dict[str, Optional[str]]:
+        return {question: answer_cache.get(digest, engine, question) for question in unique}
+    
+    with timed_stage(CHAT_STAGE_SECONDS, "chat_batch", "cache"):
+        cached = await executors.run_io(cached_answers)
+    missing = [question for question in unique if cached[question] is None]
+    
+    answers: Dict[str, Optional[str]] = {}
+    if missing:
+        with timed_stage(CHAT_STAGE_SECONDS, "chat_batch", "retrieval"):
+            if engine.startswith("vector"):
+                answers.update(zip(missing, await executors.run_io(vector_qa_many, digest, missing)))
+            unanswered = [question for question in missing if answers.get(question) is None]
+            if unanswered:
+                index = await get_index(digest)
+                answers.update(zip(unanswered, await executors.run_io(indexed_qa_many, digest, index, unanswered)))
+        
+        def store_answers() -> None:
+            for question in missing:
+                answer_cache.put(digest, engine, question, answers[question])
+        
+        await executors.run_io(store_answers)
+    
+    return [(cached[question], True) if cached[question] is not None else (answers[question], False) for question in questions]
+
+@router.post("/chat/batch")
+@batch_limit
+async def chat_batch(request: BatchChatRequest):
+    """Answer many questions about one or more documents, in order; as NDJSON lines with stream=true"""
+    if not request.questions:
+        raise HTTPException(400, "Questions must not be empty")
+    if len(request.questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(413, f"At most {MAX_BATCH_QUESTIONS} questions per batch")
+    file_ids = [question.file_id or request.file_id for question in request.questions]
+    if None in file_ids:
+        raise HTTPException(400, "Every question needs a file_id, or the batch a default one")
+    
+    try:
+        # Each document is looked up once; one that is unknown or not ready fails only its own questions
+        documents: Dict[str, Dict] = {}
+        errors: Dict[str, HTTPException] = {}
+        for file_id in dict.fromkeys(file_ids):
+            try:
+                documents[file_id] = await get_ready_document(file_id)
+            except HTTPException as e:
+                errors[file_id] = e
+        
+    except Exception as e:
+        logger.error(f"Batch chat error: {e}")
+        raise HTTPException(500, f"Chat failed: {str(e)}")
+    
+    async def answer_step(start: int) -> List[Dict]:
+        positions = range(start, min(start + BATCH_STEP, len(file_ids)))
+        results: Dict[int, Dict] = {}
+        by_digest: Dict[str, List[int]] = {}
+        for position in positions:
+            file_id = file_ids[position]
+            if file_id in errors:
+                results[position] = {
+                    "index": position,
+                    "file_id": file_id,
+                    "error": errors[file_id].detail,
+                    "status_code": errors[file_id].status_code
+                }
+            else:
+                by_digest.setdefault(documents[file_id]["content_hash"], []).append(position)
+        
+        for digest, group in by_digest.items():
+            answered = await answer_questions(digest, [request.questions[position].message for position in group])
+            for position, (answer, cached) in zip(group, answered):
+                results[position] = {"index": position, "file_id": file_ids[position], "answer": answer, "cached": cached}
+        return [results[position] for position in positions]
+    
+    if request.stream:
+        async def result_lines():
+            # The decorator's slot is released once the response starts; answering holds a slot of
+            # its own, and the whole stream has the batch time limit
+            try:
+                async with batch_limit.slot():
+                    deadline = asyncio.get_running_loop().time() + batch_limit.timeout
+                    for start in range(0, len(file_ids), BATCH_STEP):
+                        results = await batch_limit.within(answer_step(start), deadline)
+                        for result in results:
+                            yield json.dumps(result) + "\n"
+            except (OverloadedError, EndpointTimeoutError) as e:
+                yield json.dumps({"error": str(e)}) + "\n"
+            except Exception as e:
+                logger.error(f"Batch chat error: {e}")
+                yield json.dumps({"error": f"Chat failed: {str(e)}"}) + "\n"
+        
+        return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+    
+    try:
+        results = []
+        for start in range(0, len(file_ids), BATCH_STEP):
+            results.extend(await answer_step(start))
+        
+        logger.info(f"Batch chat processed {len(results)} questions about {len(documents)} documents")
+        return {"count": len(results), "results": results}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch chat error: {e}")
+        raise HTTPException(500, f"Chat failed: {str(e)}")
+
+@router.get("/chat/cache")
+async def chat_cache_metrics():
+    """Answer cache hit/miss counters"""
+    return answer_cache.metrics()
+
+def collect_service_metrics() -> List[Metric]:
+    """Cache, limiter and queue statistics kept by the services, read at scrape time"""
+    hits = Counter("cache_hits_total", "Cache hits", ["cache"])
+    misses = Counter("cache_misses_total", "Cache misses", ["cache"])
+    hit_ratio = Gauge("cache_hit_ratio", "Cache hits over lookups since start", ["cache"])
+    answers = answer_cache.metrics()
+    audio = audio_cache.metrics()
+    counts = {
+        "answer": (answers["lookups"] - answers["misses"], answers["misses"]),
+        "audio": (audio["hits"], audio["misses"]),
+        "index": (index_cache.hits, index_cache.misses),
+        "vector_index": (vector_store.cache.hits, vector_store.cache.misses),
+        "embedding": (vector_store.embeddings.hits, vector_store.embeddings.misses),
+    }
+    for cache, (hit_count, miss_count) in counts.items():
+        hits.labels(cache).inc(hit_count)
+        misses.labels(cache).inc(miss_count)
+        lookups = hit_count + miss_count
+        hit_ratio.labels(cache).set(hit_count / lookups if lookups else 0.0)
+    
+    limit_active = Gauge("endpoint_limit_active", "Requests running under an endpoint limit", ["group"])
+    limit_waiting = Gauge("endpoint_limit_waiting", "Requests waiting for an endpoint limit slot", ["group"])
+    limit_rejected = Counter("endpoint_limit_rejected_total", "Requests rejected because the limit queue was full", ["group"])
+    limit_timed_out = Counter("endpoint_limit_timed_out_total", "Requests stopped by the endpoint timeout", ["group"])
+    for limit in (upload_limit, chat_limit, query_limit, batch_limit, speech_limit):
+        stats = limit.metrics()
+        limit_active.labels(limit.name).set(stats["active"])
+        limit_waiting.labels(limit.name).set(stats["waiting"])
+        limit_rejected.labels(limit.name).inc(stats["rejected"])
+        limit_timed_out.labels(limit.name).inc(stats["timed_out"])
+    
+    tts_queue = Gauge("tts_queue_depth", "Segments waiting for a synthesis slot")
+    tts_queue.set(reading_sessions.scheduler.pending())
+    tts_active = Gauge("tts_active_syntheses", "Segments being synthesized")
+    tts_active.set(reading_sessions.scheduler.active)
+    ingest_queue = Gauge("ingestion_queue_depth", "Uploads waiting for an ingestion worker")
+    ingest_queue.set(ingestion_queue.pending())
+    ready = Gauge("warm_up_ready", "1 once background warm-up has finished")
+    ready.set(1 if warm_up.ready else 0)
+    return [hits, misses, hit_ratio, limit_active, limit_waiting, limit_rejected, limit_timed_out, tts_queue, tts_active, ingest_queue, ready]
+
+registry.add_collector(collect_service_metrics)
+
+@router.get("/traces")
+async def list_traces(limit: int = 20):
+    """Most recent request traces, newest first"""
+    return {"traces": trace_store.recent(max(1, min(limit, TRACE_BUFFER)))}
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Spans of one trace"""
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        raise HTTPException(404, "Trace not found")
+    return trace
+
+@router.post("/debug/profile")
+async def start_profile(route: str, seconds: float = 60):
+    """Sample stacks of requests to one route for a while; needs PROFILING=1"""
+    if not PROFILING:
+        raise HTTPException(403, "Profiling is disabled, set PROFILING=1 to enable it")
+    if seconds <= 0:
+        raise HTTPException(400, "seconds must be positive")
+    seconds = min(seconds, MAX_PROFILE_SECONDS)
+    profiler.start(route, seconds)
+    logger.info(f"Profiling {route} for {seconds:.0f}s")
+    return profiler.report()
+
+@router.get("/debug/profile")
+async def get_profile(format: str = "json"):
+    """Samples collected so far; format=collapsed returns flame graph input"""
+    report = profiler.report()
+    if format == "collapsed":
+        return PlainTextResponse(report["stacks"] + "\n" if report["stacks"] else "")
+    return report
+
+@router.delete("/debug/profile")
+async def stop_profile():
+    """Stop profiling, keeping the samples for GET"""
+    profiler.stop()
+    return profiler.report()
+
+def answer_engine(digest: str) -> str:
+    """Name and version of the engine that answers questions about a blob, part of the answer cache key"""
+    if embeddings_available() and vector_store.has_index(digest):
+        return f"vector-{EMBEDDING_MODEL}-v{ANSWER_ENGINE_VERSION}"
+    return f"bm25-v{ANSWER_ENGINE_VERSION}"
+
+async def retrieve_passages(digest: str, question: str) -> List[Dict]:
+    """Passages most relevant to a question, with 1-based page numbers"""
+    if answer_engine(digest).startswith("vector"):
+        hits = await executors.run_io(vector_store.search, digest, question, CHAT_TOP_K)
+        return [{"page": chunk.page + 1, "text": chunk.text, "score": round(score, 4)} for chunk, score in hits]
+    
+    index = await get_index(digest)
+    hits = await executors.run_io(index.search, question, CHAT_TOP_K)
+    texts = await executors.run_io(hit_sentences, digest, index, [sentence_id for sentence_id, _ in hits])
+    return [
+        {
+            "page": index.pages[sentence_id] + 1 if index.pages else None,
+            "text": text,
+            "score": round(score, 4)
+        }
+        for (sentence_id, score), text in zip(hits, texts)
+    ]
+
+def hit_sentences(digest: str, index: InvertedIndex, sentence_ids: List[int]) -> List[str]:
+    """Texts of index hits, read from the page store unless the index keeps its own"""
+    if index.refs is None:
+        return [index.sentences[sentence_id] for sentence_id in sentence_ids]
+    return page_reader.sentences(digest, [index.refs[sentence_id] for sentence_id in sentence_ids])
+
+def sse_event(event: str, data: Dict) -> str:
+    """Format one named server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def indexed_qa(digest: str, index: InvertedIndex, question: str) -> str:
+    """Keyword question answering ranked with BM25 over the document index"""
+    hits = index.search(question, limit=CHAT_TOP_K)
+    return keyword_answer(hit_sentences(digest, index, [sentence_id for sentence_id, _ in hits]) if hits else [])
+
+def indexed_qa_many(digest: str, index: InvertedIndex, questions: List[str]) -> List[str]:
+    """Keyword answers to many questions, ranked in one vectorized pass over the document index"""
+    return keyword_answers(index, questions, CHAT_TOP_K, lambda sentence_ids: hit_sentences(digest, index, sentence_ids))
+
+def vector_qa(digest: str, question: str) -> Optional[str]:
+    """Answer with the document chunks closest to the question in embedding space"""
+    return vector_answer(vector_store.search(digest, question, limit=CHAT_TOP_K))
 
-# Initialize TTS on startup
-initialize_tts()
\ No newline at end of file
+def vector_qa_many(digest: str, questions: List[str]) -> List[Optional[str]]:
+    """Vector answers to many questions, embedded in one model call"""
+    return [vector_answer(hits) for hits in vector_store.search_many(digest, questions, limit=CHAT_TOP_K)]
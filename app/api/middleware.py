@@ -0,0 +1,89 @@
+"""
+Request instrumentation: latency metrics per route, opt-in tracing and the
+runtime-selected sampling profiler, as one ASGI middleware.
+"""
+
+import time
+from contextlib import ExitStack
+
+from app.services.metrics import registry
+from app.services.profiling import SamplingProfiler
+from app.services.tracing import TraceStore
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds",
+    "Time until the response starts (headers sent), by route",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests being handled")
+
+# Route label of requests that matched no route, so unknown paths don't create series
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_template(scope) -> str:
+    """
+    Path of a routed request with its path parameters put back as
+    ``{name}``, e.g. ``/api/jobs/{job_id}``: one label per route, not per id.
+    """
+    if "route" not in scope:
+        return UNMATCHED_ROUTE
+    names = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join(f"{{{names[part]}}}" if part in names else part for part in scope["path"].split("/"))
+
+
+class InstrumentationMiddleware:
+    """
+    Records ``http_request_duration_seconds`` for every HTTP request,
+    traces requests sent with ``X-Trace: 1`` (or sampled) and returns their
+    ``X-Trace-Id``, and runs requests to the profiled route under the
+    sampling profiler.
+
+    Streaming responses are measured until their headers are sent, i.e.
+    until the first byte is ready; traces and profiles cover the whole stream.
+    """
+
+    def __init__(self, app, traces: TraceStore, profiler: SamplingProfiler):
+        self.app = app
+        self.traces = traces
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        recorded = False
+
+        def record(status: int) -> None:
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            REQUEST_LATENCY.labels(scope["method"], route_template(scope), status).observe(time.perf_counter() - started)
+
+        requested = any(name == b"x-trace" and value not in (b"", b"0") for name, value in scope["headers"])
+        trace = None
+
+        async def instrumented_send(message):
+            if message["type"] == "http.response.start":
+                record(message["status"])
+                if trace is not None:
+                    message["headers"] = [*message.get("headers", []), (b"x-trace-id", trace.trace_id.encode())]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            with ExitStack() as stack:
+                if self.profiler.selects(scope["path"]):
+                    stack.enter_context(self.profiler.profile())
+                if self.traces.should_trace(requested):
+                    trace = stack.enter_context(self.traces.trace(f"{scope['method']} {scope['path']}"))
+                try:
+                    await self.app(scope, receive, instrumented_send)
+                except Exception:
+                    record(500)
+                    raise
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
@@ -0,0 +1,229 @@
+# app/services/answer_cache.py
+
+"""
+Answer Cache
+------------
+Two-tier cache of chat answers keyed by document content hash, answering
+engine and normalized question. The first tier is an in-process LRU with a
+TTL; the optional second tier is a shared state backend (SQLite on disk) so
+every worker and restarts benefit. A near-duplicate mode also serves a cached
+answer when a new question has nearly the same set of terms as a cached one.
+
+Expired answers are dropped from memory every ``PURGE_EVERY`` stores; the
+shared backend deletes its own expired entries the same way. Near-duplicate
+lookups compare at most ``NEAR_DUPLICATE_SCAN`` shared answers, the most
+recently stored first.
+"""
+
+import itertools
+import logging
+import re
+import threading
+import time
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from app.services.lru_cache import LRUCache
+from app.services.shared_state import PURGE_EVERY, StateBackend
+
+logger = logging.getLogger(__name__)
+
+# Key prefix of answers in the shared tier
+KEY_PREFIX = "answer:"
+
+WORD_RE = re.compile(r"\w+")
+
+# Shared answers compared per near-duplicate lookup, so a busy document costs the same as a quiet one
+NEAR_DUPLICATE_SCAN = 500
+
+
+def normalize_question(question: str) -> str:
+    """
+    Canonical form of a question: its words in order, case-folded, without
+    punctuation or extra whitespace. Every word is kept, stopwords too, so
+    a question and its negation never share an answer.
+
+    Args:
+        question (str): User question.
+
+    Returns:
+        str: Space-separated words.
+    """
+    return " ".join(WORD_RE.findall(question.casefold()))
+
+
+def term_set(normalized: str) -> FrozenSet[str]:
+    return frozenset(normalized.split())
+
+
+def similarity(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    """Jaccard similarity of two term sets."""
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class AnswerCache:
+    """
+    LRU + TTL answer cache with an optional shared second tier.
+
+    Args:
+        max_items (int): Answers kept in process memory.
+        ttl (float): Seconds an answer stays valid in either tier.
+        shared (Optional[StateBackend]): Second tier shared by all workers.
+        near_duplicate_threshold (float): Minimum term-set similarity for a
+            near-duplicate hit; 0 disables near-duplicate matching.
+    """
+
+    def __init__(
+        self,
+        max_items: int,
+        ttl: float,
+        shared: Optional[StateBackend] = None,
+        near_duplicate_threshold: float = 0.0,
+    ):
+        self.ttl = ttl
+        self.shared = shared
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.local = LRUCache(max_items)
+        self.stats: Dict[str, int] = {"hits": 0, "shared_hits": 0, "near_duplicate_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._puts = itertools.count(1)
+
+    def get(self, content_hash: str, engine: str, question: str) -> Optional[str]:
+        """
+        Looks up an answer, trying memory, then the shared tier, then
+        near-duplicate questions.
+
+        Args:
+            content_hash (str): Document content hash.
+            engine (str): Answering engine and version.
+            question (str): User question.
+
+        Returns:
+            Optional[str]: Cached answer, or None on a miss.
+        """
+        normalized = normalize_question(question)
+        key = (content_hash, engine, normalized)
+
+        answer = self._get_local(key)
+        if answer is not None:
+            self._count("hits")
+            return answer
+
+        if self.shared is not None:
+            entry = self.shared.get(self._shared_key(key))
+            if entry is not None:
+                self._put_local(key, entry["answer"], entry["expires_at"])
+                self._count("shared_hits")
+                return entry["answer"]
+
+        if self.near_duplicate_threshold > 0:
+            answer = self._get_near_duplicate(content_hash, engine, normalized)
+            if answer is not None:
+                self._count("near_duplicate_hits")
+                return answer
+
+        self._count("misses")
+        return None
+
+    def put(self, content_hash: str, engine: str, question: str, answer: str) -> None:
+        """
+        Stores an answer in both tiers.
+
+        Args:
+            content_hash (str): Document content hash.
+            engine (str): Answering engine and version.
+            question (str): User question.
+            answer (str): Answer to cache.
+        """
+        key = (content_hash, engine, normalize_question(question))
+        expires_at = time.time() + self.ttl
+        self._put_local(key, answer, expires_at)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), {"answer": answer, "expires_at": expires_at}, self.ttl)
+        if next(self._puts) % PURGE_EVERY == 0:
+            self._purge_local()
+
+    def invalidate(self, content_hash: str) -> int:
+        """
+        Drops every answer about a document, e.g. after it was re-ingested.
+
+        Args:
+            content_hash (str): Document content hash.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        removed = self.local.discard_where(lambda key: key[0] == content_hash)
+        if self.shared is not None:
+            for shared_key in self.shared.keys(f"{KEY_PREFIX}{content_hash}:"):
+                self.shared.delete(shared_key)
+                removed += 1
+        return removed
+
+    def metrics(self) -> Dict:
+        """Hit/miss counters, hit ratio and current size."""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = sum(stats.values())
+        hits = lookups - stats["misses"]
+        return {
+            **stats,
+            "lookups": lookups,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self.local),
+            "shared": self.shared is not None,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _get_local(self, key: Tuple[str, str, str]) -> Optional[str]:
+        entry = self.local.get(key)
+        if entry is None:
+            return None
+        answer, expires_at = entry
+        if expires_at <= time.time():
+            self.local.pop(key)
+            return None
+        return answer
+
+    def _put_local(self, key: Tuple[str, str, str], answer: str, expires_at: float) -> None:
+        self.local.put(key, (answer, expires_at))
+
+    def _purge_local(self) -> int:
+        now = time.time()
+        expired = {key for key, (_, expires_at) in self.local.items() if expires_at <= now}
+        return self.local.discard_where(lambda key: key in expired) if expired else 0
+
+    def _shared_key(self, key: Tuple[str, str, str]) -> str:
+        content_hash, engine, normalized = key
+        return f"{KEY_PREFIX}{content_hash}:{engine}:{normalized}"
+
+    def _get_near_duplicate(self, content_hash: str, engine: str, normalized: str) -> Optional[str]:
+        terms = term_set(normalized)
+        best_key, best_score = None, self.near_duplicate_threshold
+
+        for key in self.local.keys():
+            if key[0] == content_hash and key[1] == engine:
+                score = similarity(terms, term_set(key[2]))
+                if score >= best_score:
+                    best_key, best_score = key, score
+        if best_key is not None:
+            answer = self._get_local(best_key)
+            if answer is not None:
+                return answer
+
+        if self.shared is not None:
+            prefix = f"{KEY_PREFIX}{content_hash}:{engine}:"
+            best_shared, best_score = None, self.near_duplicate_threshold
+            for shared_key in self.shared.keys(prefix, NEAR_DUPLICATE_SCAN):
+                score = similarity(terms, term_set(shared_key[len(prefix):]))
+                if score >= best_score:
+                    best_shared, best_score = shared_key, score
+            if best_shared is not None:
+                entry = self.shared.get(best_shared)
+                if entry is not None:
+                    return entry["answer"]
+        return None
@@ -0,0 +1,81 @@
+# app/services/answering.py
+
+"""
+Extractive Answers
+------------------
+Answers assembled from retrieved text without a language model: the best
+keyword hits of a question joined together, or the chunks of the vector
+index closest to it, with their pages. Shared by the chat endpoints and
+the offline batch tool, so both answer alike.
+
+A batch of questions is ranked in one pass over the keyword index (see
+:meth:`InvertedIndex.search_many`), and the texts of all their hits are
+read in one call.
+"""
+
+from typing import Callable, List, Optional, Tuple
+
+from app.services.chunking import Chunk
+from app.services.search_index import InvertedIndex
+
+NO_ANSWER = (
+    "I couldn't find specific information about that question in the document. "
+    "Please try rephrasing your question or ask about different topics covered in the PDF."
+)
+
+
+def keyword_answer(texts: List[str]) -> str:
+    """
+    Joins the sentences retrieved for a question.
+
+    Args:
+        texts (List[str]): Hit sentences, best first.
+
+    Returns:
+        str: The answer, or :data:`NO_ANSWER` when nothing was retrieved.
+    """
+    if not texts:
+        return NO_ANSWER
+    return f"Based on the document: {' '.join(texts)}"
+
+
+def vector_answer(hits: List[Tuple[Chunk, float]]) -> Optional[str]:
+    """
+    Joins the chunks retrieved for a question, each with its page.
+
+    Args:
+        hits (List[Tuple[Chunk, float]]): Chunks with scores, best first.
+
+    Returns:
+        Optional[str]: The answer, or None when nothing was retrieved.
+    """
+    if not hits:
+        return None
+    answer = " ... ".join(f"[p. {chunk.page + 1}] {chunk.text}" for chunk, _ in hits)
+    return f"Based on the document: {answer}"
+
+
+def keyword_answers(
+    index: InvertedIndex,
+    questions: List[str],
+    limit: int,
+    read_sentences: Callable[[List[int]], List[str]],
+) -> List[str]:
+    """
+    Answers many questions about one document from its keyword index.
+
+    Args:
+        index (InvertedIndex): The document's index.
+        questions (List[str]): Questions, answered in order.
+        limit (int): Sentences per answer.
+        read_sentences (Callable[[List[int]], List[str]]): Texts of index
+            sentence ids, e.g. read from the page store.
+
+    Returns:
+        List[str]: One answer per question.
+    """
+    ranked = index.search_many(questions, limit)
+    # Each hit sentence is read once, in id order so neighbours share page store blocks
+    sentence_ids = sorted({sentence_id for hits in ranked for sentence_id, _ in hits})
+    texts = dict(zip(sentence_ids, read_sentences(sentence_ids))) if sentence_ids else {}
+    return [keyword_answer([texts[sentence_id] for sentence_id, _ in hits if sentence_id in texts]) for hits in ranked]
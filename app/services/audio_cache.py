@@ -0,0 +1,172 @@
+# app/services/audio_cache.py
+
+"""
+Audio Cache
+-----------
+Content-addressed cache of synthesized speech segments on disk. A segment is
+keyed by a hash of its text and everything that changes how it sounds
+(backend, voice, rate, volume), so a sentence is synthesized once per voice
+no matter which document, reader or worker process asks for it.
+
+The cache is bounded in bytes. File modification times record recency (hits
+touch the file), so eviction removes the least recently used segments
+across all workers sharing the directory.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.services.speech import VoiceSettings
+
+logger = logging.getLogger(__name__)
+
+# Eviction frees space down to this fraction of the budget, so it runs rarely
+EVICTION_TARGET = 0.9
+
+
+def segment_key(settings: VoiceSettings, text: str) -> str:
+    """
+    Content address of a synthesized segment.
+
+    Args:
+        settings (VoiceSettings): Voice the segment is rendered with.
+        text (str): Segment text.
+
+    Returns:
+        str: Hex digest.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    for part in (settings.backend, settings.voice, str(settings.rate), repr(float(settings.volume)), text):
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+class AudioCache:
+    """
+    Size-bounded LRU cache of WAV segments under ``<directory>/<xx>/<key>.wav``.
+
+    Args:
+        directory (str): Where segments are stored; may be shared by workers.
+        max_bytes (int): Size budget of all segments.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        # Bytes on disk, scanned on first store and after each eviction
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.wav"
+
+    def get(self, settings: VoiceSettings, text: str) -> Optional[bytes]:
+        """
+        Returns a cached segment and marks it recently used.
+
+        Args:
+            settings (VoiceSettings): Voice.
+            text (str): Segment text.
+
+        Returns:
+            Optional[bytes]: WAV file contents, or None on a miss.
+        """
+        path = self.path(segment_key(settings, text))
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return data
+
+    def contains(self, settings: VoiceSettings, text: str) -> bool:
+        return self.path(segment_key(settings, text)).exists()
+
+    def put(self, settings: VoiceSettings, text: str, data: bytes) -> None:
+        """
+        Stores a segment, evicting least recently used ones past the budget.
+
+        Args:
+            settings (VoiceSettings): Voice.
+            text (str): Segment text.
+            data (bytes): WAV file contents.
+        """
+        path = self.path(segment_key(settings, text))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{uuid.uuid4().hex}.tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self.stats["stores"] += 1
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def metrics(self) -> Dict:
+        """Hit/miss counters, hit ratio and bytes on disk."""
+        with self._lock:
+            stats = dict(self.stats)
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            size = self._size
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "lookups": lookups,
+            "hit_ratio": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        if not self.directory.exists():
+            return entries
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".wav"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Evicted by another worker meanwhile
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._scan())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        target = self.max_bytes * EVICTION_TARGET
+        removed = 0
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self._size = size
+        self.stats["evictions"] += removed
+        logger.info(f"Evicted {removed} audio segments, cache holds {size} bytes")
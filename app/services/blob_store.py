@@ -0,0 +1,153 @@
+# app/services/blob_store.py
+
+"""
+Blob Store
+----------
+Content-addressed storage for uploaded PDFs. Each distinct file is stored
+once under its BLAKE2b digest together with its search index; file_ids are
+references onto a blob (kept in the document store), so re-uploading the
+same book skips both the disk write and extraction.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Callable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the upload per hashing/write step
+CHUNK_SIZE = 1024 * 1024
+
+UUID_NAME_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def new_hasher():
+    """Hash used for content addresses (BLAKE2b, 32-byte digest)."""
+    return hashlib.blake2b(digest_size=32)
+
+
+def hash_file(path: Path) -> str:
+    """
+    Computes the content address of a file on disk.
+
+    Args:
+        path (Path): File to hash.
+
+    Returns:
+        str: Hex digest.
+    """
+    hasher = new_hasher()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class BlobStore:
+    """
+    Stores PDFs and their derived files under ``<root>/blobs/<digest>.*``.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blob_dir / f"{digest}.pdf"
+
+    def index_path(self, digest: str) -> Path:
+        return self.blob_dir / f"{digest}.index.json"
+
+    def vectors_path(self, digest: str) -> Path:
+        return self.blob_dir / f"{digest}.vectors.npy"
+
+    def chunks_path(self, digest: str) -> Path:
+        return self.blob_dir / f"{digest}.chunks.json"
+
+    def page_store_path(self, digest: str) -> Path:
+        return self.blob_dir / f"{digest}.pages.z"
+
+    def pages_path(self, digest: str) -> Path:
+        """Uncompressed page texts written before the page store (read once to convert)."""
+        return self.blob_dir / f"{digest}.pages.txt"
+
+    def page_offsets_path(self, digest: str) -> Path:
+        return self.blob_dir / f"{digest}.pages.npy"
+
+    def structure_path(self, digest: str) -> Path:
+        return self.blob_dir / f"{digest}.structure.json"
+
+    def temp_path(self) -> Path:
+        """Fresh path inside the blob directory for an upload in progress."""
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        return self.blob_dir / f".incoming-{uuid.uuid4().hex}"
+
+    def commit_blob(self, temp_path: Path, digest: str) -> Tuple[Path, bool]:
+        """
+        Moves a fully written upload to its content address.
+
+        Args:
+            temp_path (Path): File written by the upload.
+            digest (str): Its content hash.
+
+        Returns:
+            Tuple[Path, bool]: Blob path and whether the blob already existed,
+            in which case the temporary file is discarded.
+        """
+        blob_path = self.blob_path(digest)
+        if blob_path.exists():
+            temp_path.unlink(missing_ok=True)
+            return blob_path, True
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, blob_path)
+        return blob_path, False
+
+    def has_index(self, digest: str) -> bool:
+        return self.index_path(digest).exists()
+
+    def files(self, digest: str) -> List[Path]:
+        """The blob's PDF and every file derived from it."""
+        return sorted(self.blob_dir.glob(f"{digest}.*"))
+
+    def scan(self) -> Iterator[os.DirEntry]:
+        """Entries of the blob directory, including temporary files; none if it does not exist yet."""
+        try:
+            with os.scandir(self.blob_dir) as entries:
+                yield from entries
+        except FileNotFoundError:
+            return
+
+    def adopt_legacy_uploads(self, is_known: Callable[[str], bool]) -> List[Tuple[str, str]]:
+        """
+        Moves ``<root>/<uuid>.pdf`` files from before content addressing into
+        the blob store, collapsing byte-identical copies into one blob.
+
+        Args:
+            is_known (Callable[[str], bool]): True for file_ids already registered.
+
+        Returns:
+            List[Tuple[str, str]]: ``(file_id, digest)`` of every adopted file.
+        """
+        adopted = []
+        for path in sorted(self.root.glob("*.pdf")):
+            file_id = path.stem
+            if not UUID_NAME_RE.match(file_id) or is_known(file_id):
+                continue
+
+            digest = hash_file(path)
+            _, existed = self.commit_blob(path, digest)
+
+            legacy_index = self.root / f"{file_id}.index.json"
+            if legacy_index.exists():
+                if self.index_path(digest).exists():
+                    legacy_index.unlink()
+                else:
+                    os.replace(legacy_index, self.index_path(digest))
+
+            adopted.append((file_id, digest))
+            logger.info(f"Adopted legacy upload {file_id} -> {digest[:12]}{' (duplicate)' if existed else ''}")
+        return adopted
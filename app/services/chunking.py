@@ -0,0 +1,372 @@
+# app/services/chunking.py
+
+"""
+Chunking
+--------
+One segmentation of a document, computed at ingestion and shared by Q&A,
+search and reading. Extraction rebuilds each page from its layout blocks
+(columns in reading order, hyphenated line breaks joined) with paragraphs
+separated by blank lines; this module turns those blocks into sections
+(started by headings, recognised by font size and weight), paragraphs and
+sentences. Sentence splitting knows about abbreviations, initials and
+decimals, and every sentence keeps its character offsets into the page
+text, so the structure file stores no text of its own.
+
+Every step is a single pass over the text.
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+# Paragraphs of a page text are separated by a blank line
+PARAGRAPH_SEPARATOR = "\n\n"
+PARAGRAPH_BREAK_RE = re.compile(r"\n[ \t]*\n\s*")
+
+# Candidate sentence ends: terminal punctuation, closing quotes or brackets, then whitespace
+SENTENCE_END_RE = re.compile(r"[.!?…]+[\"'”’)\]]*(?=\s)")
+
+# Words that end with a full stop without ending the sentence (lowercase, without the final stop)
+ABBREVIATIONS = frozenset(
+    """
+    mr mrs ms dr prof sr jr st mt rev gen col capt lt sgt hon
+    vs etc al cf e.g i.e viz approx ca
+    fig figs eq eqs no nos vol vols ch chap sec pp p ed eds
+    inc ltd co corp dept univ
+    jan feb mar apr jun jul aug sep sept oct nov dec
+    """.split()
+)
+
+# A heading's font is at least this much larger than the body text...
+HEADING_SIZE_RATIO = 1.15
+# ...or it is bold, and it is never longer than this
+MAX_HEADING_WORDS = 15
+
+# Chunk size for dense retrieval, in words
+CHUNK_WORDS = 120
+
+STRUCTURE_VERSION = 1
+
+
+@dataclass(frozen=True)
+class TextBlock:
+    """One layout block of a page: a paragraph or heading with its dominant font."""
+
+    text: str
+    size: float = 0.0
+    bold: bool = False
+
+
+@dataclass(frozen=True)
+class Chunk:
+    text: str
+    page: int
+
+
+@dataclass(frozen=True)
+class Section:
+    title: str
+    page: int
+    paragraph: int
+
+
+def join_lines(lines: List[str]) -> str:
+    """
+    Joins the lines of a block into one line of text, removing hyphens
+    that only split a word across a line break.
+
+    Args:
+        lines (List[str]): Line texts in order.
+
+    Returns:
+        str: Text with single spaces.
+    """
+    text = ""
+    for line in lines:
+        line = " ".join(line.split())
+        if not line:
+            continue
+        if text.endswith("-") and len(text) > 1 and text[-2].isalpha() and line[0].islower():
+            text = text[:-1] + line
+        else:
+            text = f"{text} {line}" if text else line
+    return text
+
+
+def join_blocks(blocks: List[TextBlock]) -> str:
+    """Page text of a page's blocks, one paragraph each."""
+    return PARAGRAPH_SEPARATOR.join(block.text for block in blocks)
+
+
+def paragraph_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    Character ranges of the paragraphs of a text, split at blank lines.
+
+    Args:
+        text (str): Page text.
+
+    Returns:
+        List[Tuple[int, int]]: ``(start, end)`` of every non-empty paragraph.
+    """
+    spans = []
+    start = 0
+    for match in PARAGRAPH_BREAK_RE.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+    return [span for span in (_strip(text, start, end) for start, end in spans) if span[0] < span[1]]
+
+
+def sentence_spans(text: str, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Character ranges of the sentences of one paragraph.
+
+    Args:
+        text (str): Text containing the paragraph.
+        start (int): Paragraph start.
+        end (Optional[int]): Paragraph end; the end of the text when None.
+
+    Returns:
+        List[Tuple[int, int]]: ``(start, end)`` of every sentence, stripped.
+    """
+    end = len(text) if end is None else end
+    spans = []
+    sentence_start = start
+    for match in SENTENCE_END_RE.finditer(text, start, end):
+        if not _ends_sentence(text, match.start(), match.end(), end):
+            continue
+        spans.append(_strip(text, sentence_start, match.end()))
+        sentence_start = match.end()
+    spans.append(_strip(text, sentence_start, end))
+    return [span for span in spans if span[0] < span[1]]
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Splits text into sentences, never across paragraphs.
+
+    Args:
+        text (str): Raw text.
+
+    Returns:
+        List[str]: Sentences in order, with their punctuation.
+    """
+    return [
+        " ".join(text[start:end].split())
+        for paragraph_start, paragraph_end in paragraph_spans(text)
+        for start, end in sentence_spans(text, paragraph_start, paragraph_end)
+    ]
+
+
+def _strip(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _ends_sentence(text: str, mark_start: int, mark_end: int, limit: int) -> bool:
+    # The next word starting in lowercase continues the sentence ("approx. five")
+    following = mark_end
+    while following < limit and text[following].isspace():
+        following += 1
+    if following < limit and text[following].islower():
+        return False
+    if text[mark_start] != ".":
+        return True
+
+    # The word before the stop, e.g. "Dr", "e.g" or an initial "J"
+    word_start = mark_start
+    while word_start > 0 and not text[word_start - 1].isspace() and mark_start - word_start < 12:
+        word_start -= 1
+    word = text[word_start:mark_start].lstrip("\"'(“‘[")
+    if len(word) == 1 and word.isupper():
+        return False
+    return word.lower() not in ABBREVIATIONS
+
+
+class DocumentStructure:
+    """
+    Sections, paragraphs and sentences of a document as offsets into its
+    page texts.
+
+    Args:
+        sections (List[Section]): Headings in order.
+        paragraphs (List[Tuple[int, int]]): ``(page, section)`` of every
+            paragraph; section is -1 before the first heading.
+        sentences (List[List[Tuple[int, int, int]]]): Per page, ``(start,
+            end, paragraph)`` of every sentence.
+    """
+
+    def __init__(
+        self,
+        sections: List[Section],
+        paragraphs: List[Tuple[int, int]],
+        sentences: List[List[Tuple[int, int, int]]],
+    ):
+        self.sections = sections
+        self.paragraphs = paragraphs
+        self.sentences = sentences
+
+    @classmethod
+    def from_blocks(cls, pages: List[List[TextBlock]]) -> "DocumentStructure":
+        """
+        Builds the structure of pages extracted with their layout blocks;
+        the page texts are ``join_blocks`` of each page.
+
+        Args:
+            pages (List[List[TextBlock]]): Blocks of every page in reading order.
+
+        Returns:
+            DocumentStructure: The structure.
+        """
+        # The body font is the size that covers the most characters
+        sizes = Counter()
+        for blocks in pages:
+            for block in blocks:
+                sizes[block.size] += len(block.text)
+        body_size = sizes.most_common(1)[0][0] if sizes else 0.0
+
+        sections: List[Section] = []
+        paragraphs: List[Tuple[int, int]] = []
+        sentences: List[List[Tuple[int, int, int]]] = []
+        for number, blocks in enumerate(pages):
+            page_text = join_blocks(blocks)
+            page_sentences = []
+            offset = 0
+            for block in blocks:
+                end = offset + len(block.text)
+                paragraph = len(paragraphs)
+                if _is_heading(block, body_size):
+                    sections.append(Section(block.text, number, paragraph))
+                    page_sentences.append((offset, end, paragraph))
+                else:
+                    page_sentences.extend((start, stop, paragraph) for start, stop in sentence_spans(page_text, offset, end))
+                paragraphs.append((number, len(sections) - 1))
+                offset = end + len(PARAGRAPH_SEPARATOR)
+            sentences.append(page_sentences)
+        return cls(sections, paragraphs, sentences)
+
+    @classmethod
+    def from_text(cls, pages: List[str]) -> "DocumentStructure":
+        """
+        Builds the structure of plain page texts, where paragraphs are
+        separated by blank lines and headings cannot be recognised.
+
+        Args:
+            pages (List[str]): Page texts in page order.
+
+        Returns:
+            DocumentStructure: The structure, without sections.
+        """
+        paragraphs: List[Tuple[int, int]] = []
+        sentences: List[List[Tuple[int, int, int]]] = []
+        for number, text in enumerate(pages):
+            page_sentences = []
+            for start, end in paragraph_spans(text):
+                paragraph = len(paragraphs)
+                paragraphs.append((number, -1))
+                page_sentences.extend((s, e, paragraph) for s, e in sentence_spans(text, start, end))
+            sentences.append(page_sentences)
+        return cls([], paragraphs, sentences)
+
+    def page_sentences(self, page: int, text: str) -> List[str]:
+        """
+        Sentences of one page.
+
+        Args:
+            page (int): Page, 0-based.
+            text (str): Its page text.
+
+        Returns:
+            List[str]: Sentence texts in order.
+        """
+        if page >= len(self.sentences):
+            return []
+        return [" ".join(text[start:end].split()) for start, end, _ in self.sentences[page]]
+
+    def iter_sentences(self, pages: List[str], headings: bool = True) -> Iterator[Tuple[int, int, str]]:
+        """
+        Yields ``(page, paragraph, text)`` of every sentence in reading order.
+
+        Args:
+            pages (List[str]): Page texts in page order.
+            headings (bool): Include headings, which are one sentence each.
+        """
+        heading_paragraphs = set() if headings else {section.paragraph for section in self.sections}
+        for number, text in enumerate(pages):
+            for start, end, paragraph in self.sentences[number] if number < len(self.sentences) else []:
+                if paragraph not in heading_paragraphs:
+                    yield number, paragraph, " ".join(text[start:end].split())
+
+    def chunks(self, pages: List[str], words: int = CHUNK_WORDS) -> List[Chunk]:
+        """
+        Packs whole sentences into chunks of about ``words`` words for dense
+        retrieval. Chunks never cross a page or section, and consecutive
+        chunks share their boundary sentence for context.
+
+        Args:
+            pages (List[str]): Page texts in page order.
+            words (int): Target chunk size in words.
+
+        Returns:
+            List[Chunk]: Chunks in reading order.
+        """
+        chunks: List[Chunk] = []
+        current: List[str] = []
+        current_words = 0
+        current_key = None
+        for page, paragraph, text in self.iter_sentences(pages):
+            key = (page, self.paragraphs[paragraph][1])
+            length = len(text.split())
+            if current and (key != current_key or current_words + length > words):
+                chunks.append(Chunk(" ".join(current), current_key[0]))
+                # Carry the last sentence over unless the page or section changed
+                current = current[-1:] if key == current_key and len(current) > 1 else []
+                current_words = len(current[0].split()) if current else 0
+            current.append(text)
+            current_words += length
+            current_key = key
+        if current:
+            chunks.append(Chunk(" ".join(current), current_key[0]))
+        return chunks
+
+    def save(self, path: Path) -> None:
+        """Writes the structure as JSON, atomically."""
+        temp_path = path.with_name(f"{path.name}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": STRUCTURE_VERSION,
+                "sections": [[section.title, section.page, section.paragraph] for section in self.sections],
+                "paragraphs": self.paragraphs,
+                "sentences": self.sentences,
+            }, f, separators=(",", ":"))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["DocumentStructure"]:
+        """Reads a saved structure, or None if it is missing or outdated."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        if data.get("version") != STRUCTURE_VERSION:
+            return None
+        return cls(
+            [Section(*section) for section in data["sections"]],
+            [tuple(paragraph) for paragraph in data["paragraphs"]],
+            [[tuple(sentence) for sentence in page] for page in data["sentences"]],
+        )
+
+
+def _is_heading(block: TextBlock, body_size: float) -> bool:
+    words = len(block.text.split())
+    if words == 0 or words > MAX_HEADING_WORDS or block.text[-1] in ".,;:":
+        return False
+    return block.size >= body_size * HEADING_SIZE_RATIO or (block.bold and block.size >= body_size)
@@ -0,0 +1,320 @@
+# app/services/document_store.py
+
+"""
+Document Store
+--------------
+Database-backed store for document metadata, so several workers share
+state. The documents stored as a blob are its references: the blob is
+freed when the last of them is deleted.
+
+Page text lives in the compressed page store (:mod:`app.services.page_file`).
+Blobs ingested before it still have per-page rows here; they are only read,
+through a bounded LRU, to convert them, and deleted with the blob.
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import case, delete, func, select, update
+
+from app.api.core.db import SessionLocal
+from app.api.core.models import PdfDocument, PdfPage
+from app.services.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Page text kept in memory across all documents, in characters
+PAGE_CACHE_CHARS = 32 * 1024 * 1024
+PAGE_CACHE_ITEMS = 20000
+
+
+class DocumentStatus:
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+
+
+def _document_dict(document: PdfDocument) -> Dict:
+    return {
+        "file_id": document.file_id,
+        "filename": document.filename,
+        "content_hash": document.content_hash,
+        "status": document.status,
+        "error": document.error,
+        "job_id": document.job_id,
+        "page_count": document.page_count,
+        "created_at": document.created_at,
+        "last_accessed_at": document.last_accessed_at,
+    }
+
+
+class DocumentStore:
+    """
+    Documents in SQL, and the legacy page rows with an LRU in front.
+
+    All methods are synchronous; call them from a thread pool inside async
+    handlers.
+    """
+
+    def __init__(self, session_factory=SessionLocal, cache_chars: int = PAGE_CACHE_CHARS):
+        self.session_factory = session_factory
+        self.page_cache = LRUCache(PAGE_CACHE_ITEMS, max_weight=cache_chars, weigh=len)
+
+    # Documents
+
+    def add_document(
+        self,
+        file_id: str,
+        filename: str,
+        content_hash: str,
+        status: str,
+        job_id: Optional[str] = None,
+        page_count: Optional[int] = None,
+    ) -> Dict:
+        """
+        Registers an uploaded file.
+
+        Args:
+            file_id (str): Public document id.
+            filename (str): Original upload name.
+            content_hash (str): Blob content hash.
+            status (str): Initial :class:`DocumentStatus`.
+            job_id (Optional[str]): Ingestion job, if one was queued.
+            page_count (Optional[int]): Pages of an already processed blob.
+
+        Returns:
+            Dict: The stored document.
+        """
+        with self.session_factory() as session:
+            document = PdfDocument(
+                file_id=file_id,
+                filename=filename,
+                content_hash=content_hash,
+                status=status,
+                job_id=job_id,
+                page_count=page_count,
+            )
+            session.add(document)
+            session.commit()
+            return _document_dict(document)
+
+    def get_document(self, file_id: str) -> Optional[Dict]:
+        with self.session_factory() as session:
+            document = session.scalar(select(PdfDocument).where(PdfDocument.file_id == file_id))
+            return _document_dict(document) if document else None
+
+    def list_by_status(self, status: str) -> List[Dict]:
+        with self.session_factory() as session:
+            documents = session.scalars(select(PdfDocument).where(PdfDocument.status == status))
+            return [_document_dict(document) for document in documents]
+
+    def list_by_hashes(self, content_hashes: List[str], status: str = DocumentStatus.READY) -> Dict[str, List[Dict]]:
+        """
+        Groups the documents stored as each of several blobs.
+
+        Args:
+            content_hashes (List[str]): Blob content hashes.
+            status (str): Only documents in this :class:`DocumentStatus`.
+
+        Returns:
+            Dict[str, List[Dict]]: Documents by content hash; hashes with no
+            matching document are absent.
+        """
+        grouped: Dict[str, List[Dict]] = {}
+        with self.session_factory() as session:
+            documents = session.scalars(
+                select(PdfDocument).where(PdfDocument.content_hash.in_(set(content_hashes)), PdfDocument.status == status)
+            )
+            for document in documents:
+                grouped.setdefault(document.content_hash, []).append(_document_dict(document))
+        return grouped
+
+    def set_status(
+        self,
+        file_id: str,
+        status: str,
+        error: Optional[str] = None,
+        page_count: Optional[int] = None,
+        job_id: Optional[str] = None,
+    ) -> None:
+        values = {"status": status, "error": error}
+        if job_id is not None:
+            values["job_id"] = job_id
+        if page_count is not None:
+            values["page_count"] = page_count
+        with self.session_factory() as session:
+            session.execute(update(PdfDocument).where(PdfDocument.file_id == file_id).values(**values))
+            session.commit()
+
+    def list_documents(self, limit: int = 50, offset: int = 0, status: Optional[str] = None) -> List[Dict]:
+        """Documents, newest first, optionally only those in one :class:`DocumentStatus`."""
+        query = select(PdfDocument).order_by(PdfDocument.created_at.desc(), PdfDocument.id.desc())
+        if status is not None:
+            query = query.where(PdfDocument.status == status)
+        with self.session_factory() as session:
+            return [_document_dict(document) for document in session.scalars(query.limit(limit).offset(offset))]
+
+    def count_documents(self, status: Optional[str] = None) -> int:
+        query = select(func.count(PdfDocument.id))
+        if status is not None:
+            query = query.where(PdfDocument.status == status)
+        with self.session_factory() as session:
+            return session.scalar(query) or 0
+
+    def touch(self, file_id: str) -> None:
+        """Records that a document was read, for retention and quota eviction."""
+        with self.session_factory() as session:
+            session.execute(update(PdfDocument).where(PdfDocument.file_id == file_id).values(last_accessed_at=time.time()))
+            session.commit()
+
+    def reference_count(self, content_hash: str) -> int:
+        """Documents stored as a blob; the blob may be freed once this is 0."""
+        with self.session_factory() as session:
+            return session.scalar(select(func.count(PdfDocument.id)).where(PdfDocument.content_hash == content_hash)) or 0
+
+    def referenced_hashes(self, content_hashes: List[str]) -> Set[str]:
+        """The content hashes among ``content_hashes`` that some document is stored as."""
+        with self.session_factory() as session:
+            return set(session.scalars(select(PdfDocument.content_hash).where(PdfDocument.content_hash.in_(set(content_hashes))).distinct()))
+
+    def list_idle(self, accessed_before: float, limit: int) -> List[Dict]:
+        """
+        Documents not read since a point in time, least recently read first.
+
+        Documents still being processed are never idle.
+
+        Args:
+            accessed_before (float): Unix time.
+            limit (int): Most documents returned.
+
+        Returns:
+            List[Dict]: The documents.
+        """
+        with self.session_factory() as session:
+            documents = session.scalars(
+                select(PdfDocument)
+                .where(PdfDocument.last_accessed_at < accessed_before, PdfDocument.status != DocumentStatus.PROCESSING)
+                .order_by(PdfDocument.last_accessed_at)
+                .limit(limit)
+            )
+            return [_document_dict(document) for document in documents]
+
+    def least_recently_read_blobs(self, limit: int) -> List[Tuple[str, float]]:
+        """
+        Blobs by when any of their documents was last read, oldest first.
+
+        Blobs with a document still being processed are left out.
+
+        Args:
+            limit (int): Most blobs returned.
+
+        Returns:
+            List[Tuple[str, float]]: ``(content_hash, last_accessed_at)`` pairs.
+        """
+        processing = func.sum(case((PdfDocument.status == DocumentStatus.PROCESSING, 1), else_=0))
+        last_read = func.max(PdfDocument.last_accessed_at)
+        with self.session_factory() as session:
+            rows = session.execute(
+                select(PdfDocument.content_hash, last_read)
+                .group_by(PdfDocument.content_hash)
+                .having(processing == 0)
+                .order_by(last_read)
+                .limit(limit)
+            )
+            return [(content_hash, accessed_at) for content_hash, accessed_at in rows]
+
+    def delete_document(self, file_id: str, accessed_before: Optional[float] = None) -> bool:
+        """
+        Deletes a document, dropping its reference onto the blob.
+
+        Args:
+            file_id (str): Public document id.
+            accessed_before (Optional[float]): Only if it was not read since
+                this Unix time, so a read racing an eviction keeps it.
+
+        Returns:
+            bool: Whether a document was deleted.
+        """
+        query = delete(PdfDocument).where(PdfDocument.file_id == file_id)
+        if accessed_before is not None:
+            query = query.where(PdfDocument.last_accessed_at <= accessed_before)
+        with self.session_factory() as session:
+            deleted = session.execute(query).rowcount
+            session.commit()
+        return deleted > 0
+
+    def delete_blob_documents(self, content_hash: str, accessed_before: float) -> int:
+        """
+        Deletes every processed document of a blob not read since a point in time.
+
+        Args:
+            content_hash (str): Blob content hash.
+            accessed_before (float): Unix time; documents read or uploaded
+                later are kept.
+
+        Returns:
+            int: Documents deleted.
+        """
+        with self.session_factory() as session:
+            deleted = session.execute(
+                delete(PdfDocument).where(
+                    PdfDocument.content_hash == content_hash,
+                    PdfDocument.last_accessed_at <= accessed_before,
+                    PdfDocument.status != DocumentStatus.PROCESSING,
+                )
+            ).rowcount
+            session.commit()
+        return deleted
+
+    # Legacy page rows, read to convert them into the page store
+
+    def has_pages(self, content_hash: str) -> bool:
+        with self.session_factory() as session:
+            return session.scalar(select(PdfPage.id).where(PdfPage.content_hash == content_hash).limit(1)) is not None
+
+    def page_count(self, content_hash: str) -> int:
+        with self.session_factory() as session:
+            return session.scalar(select(func.count(PdfPage.id)).where(PdfPage.content_hash == content_hash)) or 0
+
+    def delete_pages(self, content_hash: str) -> None:
+        """Removes the page rows of a blob that is being freed."""
+        with self.session_factory() as session:
+            session.execute(delete(PdfPage).where(PdfPage.content_hash == content_hash))
+            session.commit()
+        self.page_cache.discard_where(lambda key: key[0] == content_hash)
+
+    def get_pages(self, content_hash: str, start: int = 0, count: Optional[int] = None) -> List[str]:
+        """
+        Returns a window of page texts, serving cached pages from memory.
+
+        Args:
+            content_hash (str): Blob content hash.
+            start (int): First page number.
+            count (Optional[int]): Number of pages; all remaining when None.
+
+        Returns:
+            List[str]: Page texts in page order.
+        """
+        if count is None:
+            count = max(0, self.page_count(content_hash) - start)
+        numbers = range(start, start + count)
+
+        pages = {number: self.page_cache.get((content_hash, number)) for number in numbers}
+        missing = [number for number, text in pages.items() if text is None]
+        if missing:
+            with self.session_factory() as session:
+                rows = session.execute(
+                    select(PdfPage.page_number, PdfPage.text).where(
+                        PdfPage.content_hash == content_hash,
+                        PdfPage.page_number >= missing[0],
+                        PdfPage.page_number <= missing[-1],
+                    )
+                )
+                for number, text in rows:
+                    if pages.get(number) is None and number in pages:
+                        pages[number] = text
+                        self.page_cache.put((content_hash, number), text)
+
+        return [pages[number] for number in numbers if pages[number] is not None]
+
@@ -0,0 +1,327 @@
+# app/services/embeddings.py
+
+"""
+Embeddings Service
+------------------
+Local CPU sentence embeddings for vector retrieval. Chunk texts go through a
+persistent cache keyed by model and content hash, and whatever is missing is
+encoded by one background worker that packs texts from all concurrent
+ingestion jobs into fixed-size batches. Re-ingesting overlapping material
+(another edition of the same book) therefore embeds only the new chunks.
+
+sentence-transformers is optional: without it :func:`embeddings_available`
+is False and chat keeps using the keyword index. It is imported together
+with the model on first use, so the API starts without paying for torch.
+"""
+
+import importlib.util
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from app.api.core.db import SessionLocal
+from app.api.core.models import ChunkEmbedding
+from app.services.blob_store import new_hasher
+
+logger = logging.getLogger(__name__)
+
+# Texts encoded per model call
+EMBEDDING_BATCH_SIZE = 64
+# How long a partly filled batch waits for texts from other jobs, in seconds
+BATCH_MAX_WAIT = 0.02
+# Hashes looked up / rows inserted per cache query
+CACHE_QUERY_BATCH = 500
+
+
+@lru_cache(maxsize=1)
+def embeddings_available() -> bool:
+    """True when sentence-transformers is installed (without importing it)."""
+    return importlib.util.find_spec("sentence_transformers") is not None
+
+
+def text_hash(text: str) -> str:
+    """Cache key of a chunk text."""
+    hasher = new_hasher()
+    hasher.update(text.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+class Embedder:
+    """
+    Lazily loaded sentence-transformers model producing unit-length vectors.
+
+    Args:
+        model_name (str): sentence-transformers model, e.g. ``all-MiniLM-L6-v2``.
+        batch_size (int): Texts encoded per model call.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    if not embeddings_available():
+                        raise RuntimeError("sentence-transformers is not installed")
+                    from sentence_transformers import SentenceTransformer
+
+                    logger.info(f"Loading embedding model {self.model_name}")
+                    self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def load(self) -> None:
+        """Loads the model now instead of on first use (blocking)."""
+        self.model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Encodes texts into L2-normalized float32 vectors.
+
+        Args:
+            texts (List[str]): Texts to encode.
+
+        Returns:
+            np.ndarray: Array of shape ``(len(texts), dimension)``.
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return vectors.astype(np.float32, copy=False)
+
+
+class EmbeddingCache:
+    """
+    Chunk embeddings in SQL, keyed by model name and text hash and stored as
+    float16 to halve their size.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Looks up cached vectors.
+
+        Args:
+            model (str): Model name.
+            hashes (List[str]): Text hashes.
+
+        Returns:
+            Dict[str, np.ndarray]: float32 vectors of the hashes found.
+        """
+        found = {}
+        with self.session_factory() as session:
+            for start in range(0, len(hashes), CACHE_QUERY_BATCH):
+                rows = session.execute(
+                    select(ChunkEmbedding.text_hash, ChunkEmbedding.vector).where(
+                        ChunkEmbedding.model == model,
+                        ChunkEmbedding.text_hash.in_(hashes[start:start + CACHE_QUERY_BATCH]),
+                    )
+                )
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float16).astype(np.float32)
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]) -> None:
+        """
+        Stores vectors, keeping the existing row when another job got there first.
+
+        Args:
+            model (str): Model name.
+            vectors (Dict[str, np.ndarray]): Vectors by text hash.
+        """
+        rows = [
+            {"model": model, "text_hash": key, "vector": vector.astype(np.float16).tobytes()}
+            for key, vector in vectors.items()
+        ]
+        statement = ChunkEmbedding.__table__.insert().prefix_with("OR IGNORE", dialect="sqlite")
+        with self.session_factory() as session:
+            for start in range(0, len(rows), CACHE_QUERY_BATCH):
+                session.execute(statement, rows[start:start + CACHE_QUERY_BATCH])
+            session.commit()
+
+
+class _BatchRequest:
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.vectors: Optional[np.ndarray] = None
+        self.filled = 0
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class EmbeddingBatcher:
+    """
+    Single worker thread that packs texts from concurrent callers into
+    batches of ``batch_size`` before running the model, so several small
+    ingestion jobs share full batches instead of each running partial ones.
+
+    Args:
+        embedder (Embedder): Model to run.
+        batch_size (int): Texts per model call.
+        max_wait (float): Seconds a partial batch waits for more texts.
+    """
+
+    def __init__(self, embedder: Embedder, batch_size: int = EMBEDDING_BATCH_SIZE, max_wait: float = BATCH_MAX_WAIT):
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self._requests: "queue.Queue[_BatchRequest]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Encodes texts on the batching worker, blocking until all are done.
+
+        Args:
+            texts (List[str]): Texts to encode.
+
+        Returns:
+            np.ndarray: float32 vectors in input order.
+        """
+        if not texts:
+            return np.zeros((0, self.embedder.dimension), dtype=np.float32)
+        self._ensure_worker()
+        request = _BatchRequest(texts)
+        self._requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.vectors
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        # Requests with texts still to encode, and the offset of the next one
+        pending = deque()
+        while True:
+            if not pending:
+                pending.append([self._requests.get(), 0])
+
+            batch: List[str] = []
+            parts = []
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                if not pending:
+                    try:
+                        pending.append([self._requests.get(timeout=max(0.0, deadline - time.monotonic())), 0])
+                    except queue.Empty:
+                        break
+                entry = pending[0]
+                request, offset = entry
+                take = request.texts[offset:offset + self.batch_size - len(batch)]
+                parts.append((request, offset, len(batch), len(take)))
+                batch.extend(take)
+                entry[1] += len(take)
+                if entry[1] >= len(request.texts):
+                    pending.popleft()
+
+            try:
+                vectors = self.embedder.embed(batch)
+                self.batches += 1
+            except BaseException as e:
+                for request, _, _, _ in parts:
+                    request.error = e
+                    request.done.set()
+                # Drop what remains of the failed requests
+                failed = {id(request) for request, _, _, _ in parts}
+                pending = deque(entry for entry in pending if id(entry[0]) not in failed)
+                continue
+
+            for request, offset, start, count in parts:
+                if request.error is not None:
+                    continue
+                if request.vectors is None:
+                    request.vectors = np.empty((len(request.texts), vectors.shape[1]), dtype=np.float32)
+                request.vectors[offset:offset + count] = vectors[start:start + count]
+                request.filled += count
+                if request.filled == len(request.texts):
+                    request.done.set()
+
+
+class EmbeddingService:
+    """
+    Embeds chunk texts through the cache and the shared batcher.
+
+    Args:
+        embedder (Embedder): Model used for misses and queries.
+        cache (Optional[EmbeddingCache]): Persistent vector cache.
+    """
+
+    def __init__(self, embedder: Embedder, cache: Optional[EmbeddingCache] = None):
+        self.embedder = embedder
+        self.cache = cache or EmbeddingCache()
+        self.batcher = EmbeddingBatcher(embedder, embedder.batch_size)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model_name(self) -> str:
+        return self.embedder.model_name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns vectors for chunk texts, computing only uncached ones.
+
+        Args:
+            texts (List[str]): Chunk texts.
+
+        Returns:
+            np.ndarray: float32 vectors in input order.
+        """
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model_name, list(set(hashes)))
+
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            computed = self.batcher.embed(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), computed))
+            self.cache.put_many(self.model_name, new_vectors)
+            vectors.update(new_vectors)
+        logger.info(f"Embedded {len(texts)} chunks, {len(missing)} computed")
+
+        if not texts:
+            return np.zeros((0, self.embedder.dimension), dtype=np.float32)
+        return np.stack([vectors[key] for key in hashes])
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Vector of a single question, computed directly to keep latency low."""
+        return self.embedder.embed([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Vectors of a batch of questions, computed in one model call."""
+        return self.embedder.embed(texts)
@@ -0,0 +1,336 @@
+# app/services/execution.py
+
+"""
+Execution Layer
+---------------
+Where blocking work runs, so ``async def`` handlers never run it on the
+event loop. CPU-bound work (extraction, chunking, indexing) goes to a
+process pool whose workers run at a lower scheduling priority, and blocking
+I/O (database, files) to a bounded thread pool. One slow call then costs a
+worker, not the server: the event loop keeps answering ``/api/health`` and
+every other request.
+
+Endpoints are additionally limited per group: a bounded number of requests
+run at once, more wait briefly for a slot, and each has a time limit.
+"""
+
+import asyncio
+import contextvars
+import functools
+import importlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional
+
+from app.api.core.config import CPU_WORKERS, IO_WORKERS, WEB_CONCURRENCY, WORKER_NICENESS
+
+logger = logging.getLogger(__name__)
+
+
+class OverloadedError(Exception):
+    """No slot of an endpoint limit became free in time."""
+
+
+class EndpointTimeoutError(Exception):
+    """A request ran past its endpoint's time limit."""
+
+
+def lower_priority(niceness: int) -> None:
+    """
+    Worker process initializer: yields the CPU to the API process, so
+    background work never delays request handling.
+    """
+    if niceness and hasattr(os, "nice"):
+        os.nice(niceness)
+
+
+def import_modules(names: Iterable[str]) -> None:
+    """Imports modules in a worker process ahead of the first task that needs them."""
+    for name in names:
+        importlib.import_module(name)
+
+
+def default_cpu_workers() -> int:
+    """Spare CPUs split between the API workers."""
+    return max(1, ((os.cpu_count() or 2) - 1) // max(1, WEB_CONCURRENCY))
+
+
+class Executors:
+    """
+    The process pool for CPU-bound work and the thread pool for blocking
+    I/O of one API worker. Both are created on first use, so importing
+    this module stays cheap.
+
+    Args:
+        cpu_workers (Optional[int]): Worker processes; by default the spare
+            CPUs are split between the API workers.
+        io_workers (int): Threads for blocking I/O.
+        niceness (int): Priority decrease of the worker processes.
+    """
+
+    def __init__(self, cpu_workers: Optional[int] = None, io_workers: int = 32, niceness: int = 10):
+        self.cpu_workers = cpu_workers or default_cpu_workers()
+        self.io_workers = io_workers
+        self.niceness = niceness
+        self._cpu: Optional[ProcessPoolExecutor] = None
+        self._io: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def cpu(self) -> ProcessPoolExecutor:
+        if self._cpu is None:
+            # spawn avoids forking a process that already runs threads and an event loop
+            self._cpu = ProcessPoolExecutor(
+                max_workers=self.cpu_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=lower_priority,
+                initargs=(self.niceness,),
+            )
+            logger.info(f"CPU pool started with {self.cpu_workers} workers")
+        return self._cpu
+
+    @property
+    def io(self) -> ThreadPoolExecutor:
+        if self._io is None:
+            self._io = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="io")
+        return self._io
+
+    async def run_cpu(self, func: Callable, *args) -> Any:
+        """
+        Runs a picklable function on the process pool.
+
+        Args:
+            func (Callable): Module-level function.
+            *args: Its (picklable) arguments.
+
+        Returns:
+            Any: The function's result.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu, func, *args)
+
+    async def run_io(self, func: Callable, *args) -> Any:
+        """
+        Runs a blocking function on the I/O thread pool, in the caller's
+        context (context variables stay visible).
+
+        Args:
+            func (Callable): Function to call.
+            *args: Its arguments.
+
+        Returns:
+            Any: The function's result.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.io, functools.partial(context.run, func, *args))
+
+    async def warm_up(self, modules: Iterable[str] = ()) -> None:
+        """
+        Starts the CPU workers and has each import the given modules, so the
+        first CPU-bound request does not pay for process start-up.
+
+        Args:
+            modules (Iterable[str]): Modules the CPU-bound tasks live in.
+        """
+        loop = asyncio.get_running_loop()
+        modules = list(modules)
+        await asyncio.gather(*(
+            loop.run_in_executor(self.cpu, import_modules, modules)
+            for _ in range(self.cpu_workers)
+        ))
+
+    def shutdown(self) -> None:
+        """Stops the pools, if they were started."""
+        if self._cpu is not None:
+            self._cpu.shutdown(wait=False, cancel_futures=True)
+            self._cpu = None
+        if self._io is not None:
+            self._io.shutdown(wait=False, cancel_futures=True)
+            self._io = None
+
+
+class EndpointLimit:
+    """
+    Concurrency limit and timeout shared by a group of endpoints, applied
+    as a decorator below the route decorator.
+
+    A request waits up to ``queue_timeout`` seconds for one of the
+    ``concurrency`` slots, else :class:`OverloadedError` is raised; a
+    handler running longer than ``timeout`` seconds is cancelled with
+    :class:`EndpointTimeoutError`. A streaming endpoint uses :meth:`stream`
+    instead of the decorator, so the slot is held and the time limit
+    applies until its body ends.
+
+    Args:
+        name (str): Group name, for errors and metrics.
+        concurrency (int): Requests handled at once.
+        timeout (float): Seconds a handler may run.
+        queue_timeout (float): Seconds a request may wait for a slot.
+    """
+
+    def __init__(self, name: str, concurrency: int, timeout: float, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.stats: Dict[str, int] = {"active": 0, "waiting": 0, "rejected": 0, "timed_out": 0}
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Holds one of the group's slots while the block runs.
+
+        Raises:
+            OverloadedError: No slot came free within ``queue_timeout``.
+        """
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self) -> None:
+        """
+        Takes a slot, to be given back with :meth:`release`.
+
+        Raises:
+            OverloadedError: No slot came free within ``queue_timeout``.
+        """
+        self.stats["waiting"] += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["rejected"] += 1
+            raise OverloadedError(f"Too many {self.name} requests in progress, retry later")
+        finally:
+            self.stats["waiting"] -= 1
+        self.stats["active"] += 1
+
+    def release(self) -> None:
+        self.stats["active"] -= 1
+        self.semaphore.release()
+
+    async def within(self, awaitable: Awaitable, deadline: float) -> Any:
+        """
+        Awaits work that must finish by a deadline on the event loop clock,
+        e.g. ``loop.time() + limit.timeout`` taken when the request started.
+
+        Raises:
+            EndpointTimeoutError: The deadline passed; the work is cancelled.
+        """
+        try:
+            return await asyncio.wait_for(awaitable, max(0.0, deadline - asyncio.get_running_loop().time()))
+        except asyncio.TimeoutError:
+            self.stats["timed_out"] += 1
+            raise EndpointTimeoutError(f"{self.name.capitalize()} request timed out after {self.timeout:.0f}s")
+
+    async def stream(
+        self,
+        prepare: Callable[[], Awaitable[AsyncIterator]],
+        on_timeout: Optional[Callable[[EndpointTimeoutError], Any]] = None,
+        idle: bool = False,
+    ) -> "LimitedStream":
+        """
+        Takes a slot, prepares a streamed response body within the time
+        limit and returns the body, which holds the slot until it ends.
+
+        Args:
+            prepare (Callable[[], Awaitable[AsyncIterator]]): Validates the
+                request and returns the body iterator.
+            on_timeout (Optional[Callable[[EndpointTimeoutError], Any]]):
+                Last item to send when the body runs out of time; the body
+                just ends when None.
+            idle (bool): Apply the time limit to each item instead of the
+                whole body, for long streams such as audio.
+
+        Returns:
+            LimitedStream: The body, to pass to the streaming response.
+
+        Raises:
+            OverloadedError: No slot came free within ``queue_timeout``.
+            EndpointTimeoutError: Preparing took longer than ``timeout``.
+        """
+        await self.acquire()
+        try:
+            deadline = asyncio.get_running_loop().time() + self.timeout
+            body = await self.within(prepare(), deadline)
+        except BaseException:
+            self.release()
+            raise
+        return LimitedStream(self, body, deadline, on_timeout, idle)
+
+    def __call__(self, handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        async def limited(*args, **kwargs):
+            async with self.slot():
+                deadline = asyncio.get_running_loop().time() + self.timeout
+                return await self.within(handler(*args, **kwargs), deadline)
+
+        return limited
+
+    def metrics(self) -> Dict:
+        return {"concurrency": self.concurrency, "timeout": self.timeout, **self.stats}
+
+
+class LimitedStream:
+    """
+    Streamed response body holding a slot of an :class:`EndpointLimit`.
+
+    The slot is given back when the body is exhausted, fails, runs out of
+    time or is closed, and when it is dropped without ever being iterated,
+    e.g. because the client left before the response started.
+    """
+
+    def __init__(
+        self,
+        limit: EndpointLimit,
+        body: AsyncIterator,
+        deadline: float,
+        on_timeout: Optional[Callable[[EndpointTimeoutError], Any]] = None,
+        idle: bool = False,
+    ):
+        self.limit = limit
+        self.body = body
+        self.deadline = deadline
+        self.on_timeout = on_timeout
+        self.idle = idle
+        self._held = True
+
+    def __aiter__(self) -> "LimitedStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if not self._held:
+            raise StopAsyncIteration
+        if self.idle:
+            self.deadline = asyncio.get_running_loop().time() + self.limit.timeout
+        try:
+            return await self.limit.within(self.body.__anext__(), self.deadline)
+        except EndpointTimeoutError as e:
+            logger.warning(str(e))
+            await self.aclose()
+            if self.on_timeout is None:
+                raise StopAsyncIteration
+            return self.on_timeout(e)
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self) -> None:
+        if self._held:
+            self._held = False
+            self.limit.release()
+            await self.body.aclose()
+
+    def __del__(self):
+        if self._held:
+            self._held = False
+            self.limit.release()
+
+
+# Shared pools for the API process
+executors = Executors(CPU_WORKERS or None, IO_WORKERS, WORKER_NICENESS)
@@ -0,0 +1,299 @@
+# app/services/extraction.py
+
+"""
+Extraction Engine
+-----------------
+Page-parallel PDF text extraction on the shared CPU process pool. Page ranges are fanned
+out to worker processes and the results are streamed back in page order, so
+async callers never block the event loop on PyMuPDF.
+
+Pages are rebuilt from their layout: text blocks in reading order (a second
+column after the first), each with its dominant font size and weight for
+heading detection by the chunker. Pages without a text layer that are
+covered by images (scanned books) are flagged for the OCR stage with a
+fingerprint of their images and a render resolution; ordinary pages pay
+nothing for that check.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from collections import Counter
+from typing import AsyncIterator, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from app.api.core.config import OCR_MAX_DPI, OCR_MIN_DPI
+from app.services.blob_store import new_hasher
+from app.services.chunking import TextBlock, join_blocks, join_lines
+from app.services.execution import Executors, executors
+from app.services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+EXTRACTED_PAGES = registry.counter("extraction_pages_total", "Pages extracted from uploaded PDFs")
+EXTRACTION_SECONDS = registry.counter("extraction_seconds_total", "Wall time spent extracting documents")
+EXTRACTION_RATE = registry.histogram(
+    "extraction_pages_per_second",
+    "Extraction throughput per document",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+
+# Pages handed to a worker per task; large enough to amortize fitz.open()
+PAGES_PER_TASK = 16
+
+
+# Span flag of bold text in PyMuPDF's "dict" output
+BOLD_FLAG = 16
+
+# A page with less text than this whose images cover this fraction of it is a scan
+SCAN_MAX_CHARS = 20
+SCAN_MIN_COVERAGE = 0.5
+
+
+@dataclass(frozen=True)
+class ScannedPage:
+    """An image-only page: fingerprint of its images and the DPI to render it at for OCR."""
+
+    fingerprint: str
+    dpi: int
+
+
+@dataclass(frozen=True)
+class PageText:
+    """
+    Text of a single page; ``number`` is 0-based like ``fitz.Page.number``
+    and ``text`` is ``join_blocks(blocks)``. ``scan`` is set for pages that
+    need OCR.
+    """
+
+    number: int
+    text: str
+    blocks: Tuple[TextBlock, ...] = ()
+    scan: Optional[ScannedPage] = None
+
+
+def count_pages(pdf_path: str) -> int:
+    """
+    Returns the number of pages in a PDF.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+
+    Returns:
+        int: Page count.
+    """
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def layout_blocks(page: fitz.Page, textpage: Optional[fitz.TextPage] = None) -> List[TextBlock]:
+    """
+    Text blocks of a page in reading order.
+
+    Blocks are read top to bottom; blocks that lie entirely in one half of
+    the page form columns, read left column first, until a block spanning
+    both halves (e.g. a heading across the page) starts a new band. Blocks
+    that continue the previous block's sentence in the same font are merged.
+
+    Args:
+        page (fitz.Page): Page to read.
+        textpage (Optional[fitz.TextPage]): Text to read instead of the
+            page's text layer, e.g. an OCR result.
+
+    Returns:
+        List[TextBlock]: Non-empty blocks.
+    """
+    middle = (page.rect.x0 + page.rect.x1) / 2
+    positioned = []
+    for block in page.get_text("dict", textpage=textpage)["blocks"]:
+        if block.get("type") != 0:
+            continue
+        lines = []
+        sizes: Counter = Counter()
+        bold = 0
+        for line in block["lines"]:
+            lines.append("".join(span["text"] for span in line["spans"]))
+            for span in line["spans"]:
+                length = len(span["text"].strip())
+                sizes[round(span["size"], 1)] += length
+                if span["flags"] & BOLD_FLAG:
+                    bold += length
+        text = join_lines(lines)
+        if text:
+            size = sizes.most_common(1)[0][0]
+            positioned.append((block["bbox"], TextBlock(text, size, bold * 2 > sum(sizes.values()))))
+
+    ordered: List[TextBlock] = []
+    left: List[TextBlock] = []
+    right: List[TextBlock] = []
+    for (x0, _, x1, _), block in sorted(positioned, key=lambda item: (item[0][1], item[0][0])):
+        if x1 <= middle:
+            left.append(block)
+        elif x0 >= middle:
+            right.append(block)
+        else:
+            ordered.extend(left + right)
+            left, right = [], []
+            ordered.append(block)
+    ordered.extend(left + right)
+
+    # A block that starts in lowercase continues the previous one in the same font (wrapped quotes)
+    merged: List[TextBlock] = []
+    for block in ordered:
+        previous = merged[-1] if merged else None
+        if (
+            previous is not None
+            and block.text[0].islower()
+            and (previous.size, previous.bold) == (block.size, block.bold)
+            and previous.text[-1] not in ".!?"
+        ):
+            merged[-1] = TextBlock(join_lines([previous.text, block.text]), block.size, block.bold)
+        else:
+            merged.append(block)
+    return merged
+
+
+def scanned_page(page: fitz.Page) -> Optional[ScannedPage]:
+    """
+    Recognises a scanned page by images covering most of it.
+
+    The fingerprint hashes the decoded images with their placement and the
+    page rotation, so the same scan in another file gets the same OCR. The
+    DPI renders the page at the resolution of its sharpest image, within
+    ``OCR_MIN_DPI`` and ``OCR_MAX_DPI``.
+
+    Args:
+        page (fitz.Page): Page without a usable text layer.
+
+    Returns:
+        Optional[ScannedPage]: The scan, or None for pages without images
+        (blank pages, vector drawings).
+    """
+    images = page.get_image_info(hashes=True)
+    covered = sum(abs(fitz.Rect(image["bbox"]) & page.rect) for image in images)
+    if not images or covered < abs(page.rect) * SCAN_MIN_COVERAGE:
+        return None
+
+    hasher = new_hasher()
+    hasher.update(f"{page.rotation}".encode())
+    native_dpi = 0.0
+    for image in images:
+        bbox = fitz.Rect(image["bbox"])
+        hasher.update(image["digest"])
+        hasher.update(f"{bbox.x0:.0f},{bbox.y0:.0f},{bbox.x1:.0f},{bbox.y1:.0f}".encode())
+        if bbox.width > 0:
+            native_dpi = max(native_dpi, image["width"] * 72 / bbox.width)
+    return ScannedPage(hasher.hexdigest(), int(min(max(native_dpi, OCR_MIN_DPI), OCR_MAX_DPI)))
+
+
+def extract_page_range(pdf_path: str, start: int, stop: int) -> List[Tuple[int, List[TextBlock], Optional[ScannedPage]]]:
+    """
+    Extracts the layout blocks of pages ``start`` to ``stop - 1``. Runs in a worker process.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        start (int): First page number (inclusive).
+        stop (int): Last page number (exclusive).
+
+    Returns:
+        List[Tuple[int, List[TextBlock], Optional[ScannedPage]]]:
+        ``(page_number, blocks, scan)`` in page order; ``scan`` is set for
+        pages that need OCR.
+    """
+    results = []
+    with fitz.open(pdf_path) as doc:
+        for number in range(start, stop):
+            page = doc.load_page(number)
+            blocks = layout_blocks(page)
+            # Only pages with (almost) no text layer are checked for scans
+            scan = None
+            if sum(len(block.text) for block in blocks) < SCAN_MAX_CHARS:
+                scan = scanned_page(page)
+            results.append((number, blocks, scan))
+    return results
+
+
+class ExtractionEngine:
+    """
+    Fans page ranges of a document out to the shared CPU process pool.
+
+    Args:
+        executors (Executors): Pools of the API process.
+        pages_per_task (int): Pages extracted per task.
+    """
+
+    def __init__(self, executors: Executors, pages_per_task: int = PAGES_PER_TASK):
+        self.executors = executors
+        self.pages_per_task = pages_per_task
+
+    async def page_count(self, pdf_path: str) -> int:
+        """
+        Counts the pages of a document without blocking the event loop.
+
+        Args:
+            pdf_path (str): Path to the PDF file.
+
+        Returns:
+            int: Page count.
+        """
+        return await self.executors.run_cpu(count_pages, pdf_path)
+
+    async def stream_pages(self, pdf_path: str, page_count: Optional[int] = None) -> AsyncIterator[PageText]:
+        """
+        Extracts a document in parallel and yields pages in page order.
+
+        All ranges are submitted up front; pages are yielded as soon as their
+        range and every earlier range have finished.
+
+        Args:
+            pdf_path (str): Path to the PDF file.
+            page_count (Optional[int]): Known page count, to skip counting again.
+
+        Yields:
+            PageText: One entry per page.
+        """
+        loop = asyncio.get_running_loop()
+        if page_count is None:
+            page_count = await self.page_count(pdf_path)
+
+        futures = [
+            loop.run_in_executor(
+                self.executors.cpu,
+                extract_page_range,
+                pdf_path,
+                start,
+                min(start + self.pages_per_task, page_count),
+            )
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+        started = time.perf_counter()
+        try:
+            for future in futures:
+                for number, blocks, scan in await future:
+                    yield PageText(number, join_blocks(blocks), tuple(blocks), scan)
+        finally:
+            for future in futures:
+                future.cancel()
+        elapsed = time.perf_counter() - started
+        EXTRACTED_PAGES.inc(page_count)
+        EXTRACTION_SECONDS.inc(elapsed)
+        if elapsed > 0:
+            EXTRACTION_RATE.observe(page_count / elapsed)
+
+    async def extract_pages(self, pdf_path: str) -> List[PageText]:
+        """
+        Extracts every page of a document.
+
+        Args:
+            pdf_path (str): Path to the PDF file.
+
+        Returns:
+            List[PageText]: Pages in page order.
+        """
+        return [page async for page in self.stream_pages(pdf_path)]
+
+
+# Shared engine for the API process
+extraction_engine = ExtractionEngine(executors)
@@ -0,0 +1,303 @@
+# app/services/ingestion.py
+
+"""
+Ingestion Queue
+---------------
+Bounded background job queue for document ingestion. Uploads enqueue a job
+and return immediately; a fixed number of workers run extraction, chunking
+and indexing while clients poll or subscribe to per-page progress. Job
+snapshots are published to the shared state backend so any API worker can
+report progress for any job; a background task writes them on the I/O
+threads, keeping only the latest snapshot of each job that is still
+waiting, so progress updates never block the event loop.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.services.execution import executors
+from app.services.shared_state import StateBackend
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept around so clients can still read their final status
+MAX_FINISHED_JOBS = 1000
+
+# How long job snapshots stay in shared state, and how often progress is published
+JOB_STATE_TTL = 24 * 60 * 60
+PUBLISH_INTERVAL = 0.5
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+@dataclass
+class IngestionJob:
+    """State of one ingestion job, updated in place by the worker running it."""
+
+    file_id: str
+    filename: str
+    file_path: str
+    content_hash: Optional[str] = None
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: JobStatus = JobStatus.QUEUED
+    stage: str = "queued"
+    total_pages: int = 0
+    pages_done: int = 0
+    error: Optional[str] = None
+    result: Dict = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    published_at: float = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.DONE, JobStatus.FAILED)
+
+    def to_dict(self) -> Dict:
+        progress = self.pages_done / self.total_pages if self.total_pages else 0.0
+        if self.status == JobStatus.DONE:
+            progress = 1.0
+        return {
+            "job_id": self.id,
+            "file_id": self.file_id,
+            "filename": self.filename,
+            "status": self.status.value,
+            "stage": self.stage,
+            "pages_done": self.pages_done,
+            "total_pages": self.total_pages,
+            "progress": round(progress, 4),
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+JobHandler = Callable[[IngestionJob, "IngestionQueue"], Awaitable[Dict]]
+
+
+class IngestionQueue:
+    """
+    Fixed-size worker pool in front of a bounded asyncio queue.
+
+    ``submit`` never waits: when ``max_pending`` jobs are already queued it
+    raises :class:`QueueFullError` so the API can answer 429 and push back on
+    bursty clients instead of piling up CPU-heavy work.
+    """
+
+    def __init__(self, handler: JobHandler, workers: int, max_pending: int, state: Optional[StateBackend] = None):
+        self.handler = handler
+        self.state = state
+        self.workers = workers
+        self.max_pending = max_pending
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._changed: Optional[asyncio.Event] = None
+        # Latest unpublished snapshot per job, written out by the publisher task
+        self._outbox: Dict[str, Dict] = {}
+        self._publisher: Optional[asyncio.Task] = None
+
+    def _ensure_started(self) -> None:
+        # Created lazily so the queue binds to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._changed = asyncio.Event()
+            # Workers outlive the request that starts them; an empty context keeps its trace out of theirs
+            self._tasks = [contextvars.Context().run(asyncio.create_task, self._worker(n)) for n in range(self.workers)]
+            logger.info(f"Ingestion queue started with {self.workers} workers")
+
+    def submit(self, job: IngestionJob) -> IngestionJob:
+        """
+        Enqueues a job without waiting.
+
+        Args:
+            job (IngestionJob): Job to run.
+
+        Returns:
+            IngestionJob: The queued job.
+
+        Raises:
+            QueueFullError: If ``max_pending`` jobs are already waiting.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Ingestion queue is full ({self.max_pending} jobs pending)")
+
+        self.jobs[job.id] = job
+        self._publish(job)
+        self._prune()
+        return job
+
+    def record_finished(self, job: IngestionJob, result: Dict) -> IngestionJob:
+        """
+        Registers a job whose work was already done, e.g. a deduplicated upload.
+
+        Args:
+            job (IngestionJob): Job to record.
+            result (Dict): Result to report.
+
+        Returns:
+            IngestionJob: The finished job.
+        """
+        self.update(job, status=JobStatus.DONE, stage="done", result=result)
+        self.jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    def snapshot(self, job_id: str) -> Optional[Dict]:
+        """
+        Current state of a job, whether it runs in this worker or another one.
+
+        Args:
+            job_id (str): Job id.
+
+        Returns:
+            Optional[Dict]: The job's ``to_dict()`` snapshot, or None if unknown.
+        """
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.state is not None:
+            return self.state.get(f"job:{job_id}")
+        return None
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def update(self, job: IngestionJob, **changes) -> None:
+        """
+        Applies changes to a job and wakes up progress subscribers.
+
+        Args:
+            job (IngestionJob): Job to update.
+            **changes: Attribute values to set.
+        """
+        milestone = "status" in changes or "stage" in changes
+        for name, value in changes.items():
+            setattr(job, name, value)
+        job.updated_at = time.time()
+        if milestone or job.updated_at - job.published_at >= PUBLISH_INTERVAL:
+            self._publish(job)
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    async def watch(self, job_id: str) -> AsyncIterator[Dict]:
+        """
+        Yields job snapshots whenever the job changes, until it finishes.
+
+        Args:
+            job_id (str): Job to follow.
+
+        Yields:
+            Dict: The job's ``to_dict()`` snapshot.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            # Running in another worker: follow the published snapshots
+            async for snapshot in self._watch_shared(job_id):
+                yield snapshot
+            return
+
+        last_seen = None
+        while True:
+            if job.updated_at != last_seen:
+                last_seen = job.updated_at
+                yield job.to_dict()
+            if job.finished:
+                return
+            if self._changed is None:
+                await asyncio.sleep(0.1)
+                continue
+            changed = self._changed
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _watch_shared(self, job_id: str) -> AsyncIterator[Dict]:
+        last_seen = None
+        while True:
+            snapshot = await executors.run_io(self.snapshot, job_id)
+            if snapshot is None:
+                return
+            if snapshot != last_seen:
+                last_seen = snapshot
+                yield snapshot
+            if snapshot["status"] in (JobStatus.DONE.value, JobStatus.FAILED.value):
+                return
+            await asyncio.sleep(PUBLISH_INTERVAL)
+
+    def _publish(self, job: IngestionJob) -> None:
+        if self.state is None:
+            return
+        job.published_at = job.updated_at
+        self._outbox[job.id] = job.to_dict()
+        if self._publisher is None or self._publisher.done():
+            # Outlives the request that starts it, like the workers
+            self._publisher = contextvars.Context().run(asyncio.create_task, self._drain_outbox())
+
+    async def _drain_outbox(self) -> None:
+        while self._outbox:
+            job_id = next(iter(self._outbox))
+            snapshot = self._outbox.pop(job_id)
+            try:
+                await executors.run_io(self.state.set, f"job:{job_id}", snapshot, JOB_STATE_TTL)
+            except Exception as e:
+                logger.warning(f"Could not publish job {job_id} state: {e}")
+
+    async def _worker(self, number: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                self.update(job, status=JobStatus.RUNNING, stage="starting")
+                result = await self.handler(job, self)
+                self.update(job, status=JobStatus.DONE, stage="done", result=result or {})
+                logger.info(f"Ingestion job {job.id} finished for file {job.file_id}")
+            except asyncio.CancelledError:
+                self.update(job, status=JobStatus.FAILED, stage="cancelled", error="Cancelled")
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion job {job.id} failed: {e}")
+                self.update(job, status=JobStatus.FAILED, stage="failed", error=str(e))
+            finally:
+                self._queue.task_done()
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    async def stop(self) -> None:
+        """Cancels the workers; queued jobs that have not started are dropped."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Publish the final snapshots, including those of the jobs just cancelled
+        if self._publisher is not None:
+            await asyncio.gather(self._publisher, return_exceptions=True)
+            await self._drain_outbox()
+            self._publisher = None
+        self._queue = None
+        self._changed = None
@@ -0,0 +1,274 @@
+# app/services/library_index.py
+
+"""
+Library Index
+-------------
+Full-text search across every stored document. Page text is indexed with
+SQLite FTS5 in a fixed number of shard files; each blob lives in the shard
+picked by its content hash, so adding or removing a document only touches
+one shard. A query runs on all shards in parallel and the best hits are
+merged by BM25 score.
+
+Each shard only knows its own page and term counts, so FTS5's ``bm25()``
+is not comparable between shards, and a term on every page of a shard
+scores nothing there. Shards therefore return each hit's per-term BM25
+factors with their counts, and the hits are scored with IDF over the
+whole library before they are merged.
+"""
+
+import dataclasses
+import heapq
+import logging
+import math
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from app.services.search_index import query_terms
+
+logger = logging.getLogger(__name__)
+
+# Tokens around the matched terms in a snippet, and the markers around matches
+SNIPPET_TOKENS = 16
+SNIPPET_MARK = "**"
+
+# Hits each shard proposes per hit wanted; its own ranking uses shard-local IDF
+CANDIDATE_FACTOR = 2
+
+# FTS5 gives terms on at least half of a shard's pages this IDF
+FTS5_MIN_IDF = 1e-6
+
+
+@dataclass(frozen=True)
+class LibraryHit:
+    content_hash: str
+    page: int
+    snippet: str
+    score: float
+
+
+def fts5_idf(pages: int, matches: int) -> float:
+    """IDF FTS5's ``bm25()`` uses within one shard."""
+    idf = math.log((pages - matches + 0.5) / (matches + 0.5))
+    return idf if idf > 0 else FTS5_MIN_IDF
+
+
+def library_idf(pages: int, matches: int) -> float:
+    """IDF of a term over the whole library; positive even for a term on every page."""
+    return math.log(1 + (pages - matches + 0.5) / (matches + 0.5))
+
+
+class LibraryShard:
+    """
+    One FTS5 database holding the pages of a subset of blobs.
+
+    Pages of a blob get consecutive rowids, recorded in ``documents``, so a
+    blob is removed with a rowid range delete instead of a table scan.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5("
+            "text, content_hash UNINDEXED, page UNINDEXED, tokenize='porter unicode61')"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "content_hash TEXT PRIMARY KEY, first_rowid INTEGER NOT NULL, page_count INTEGER NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def contains(self, digest: str) -> bool:
+        row = self._connect().execute("SELECT 1 FROM documents WHERE content_hash = ?", (digest,)).fetchone()
+        return row is not None
+
+    def add(self, digest: str, pages: List[str]) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete(conn, digest)
+            first_rowid = conn.execute("SELECT coalesce(max(rowid), 0) + 1 FROM pages").fetchone()[0]
+            conn.executemany(
+                "INSERT INTO pages (rowid, text, content_hash, page) VALUES (?, ?, ?, ?)",
+                ((first_rowid + number, text, digest, number) for number, text in enumerate(pages)),
+            )
+            conn.execute(
+                "INSERT INTO documents (content_hash, first_rowid, page_count) VALUES (?, ?, ?)",
+                (digest, first_rowid, len(pages)),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def remove(self, digest: str) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete(conn, digest)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _delete(self, conn: sqlite3.Connection, digest: str) -> None:
+        row = conn.execute(
+            "SELECT first_rowid, page_count FROM documents WHERE content_hash = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            return
+        first_rowid, page_count = row
+        conn.execute("DELETE FROM pages WHERE rowid >= ? AND rowid < ?", (first_rowid, first_rowid + page_count))
+        conn.execute("DELETE FROM documents WHERE content_hash = ?", (digest,))
+
+    def search(self, match: str, terms: List[str], limit: int) -> Tuple[int, List[int], List[Tuple[LibraryHit, List[float]]]]:
+        """
+        Best pages for a query in this shard, with what library-wide
+        scoring needs, read in one transaction.
+
+        Args:
+            match (str): FTS5 query.
+            terms (List[str]): Query terms, each a single token.
+            limit (int): Maximum number of hits.
+
+        Returns:
+            Tuple[int, List[int], List[Tuple[LibraryHit, List[float]]]]:
+            Pages in the shard, pages matching each term, and the hits by
+            shard-local score, each with its BM25 term-frequency factor per
+            term (0 where the page lacks the term).
+        """
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            rows = conn.execute(
+                "SELECT rowid, content_hash, page, snippet(pages, 0, ?, ?, '…', ?), bm25(pages) "
+                "FROM pages WHERE pages MATCH ? ORDER BY rank LIMIT ?",
+                (SNIPPET_MARK, SNIPPET_MARK, SNIPPET_TOKENS, match, limit),
+            ).fetchall()
+            pages = conn.execute("SELECT coalesce(sum(page_count), 0) FROM documents").fetchone()[0]
+            matches = [
+                conn.execute("SELECT count(*) FROM pages WHERE pages MATCH ?", (f'"{term}"',)).fetchone()[0]
+                for term in terms
+            ]
+            factors = {rowid: [0.0] * len(terms) for rowid, *_ in rows}
+            placeholders = ", ".join("?" * len(factors))
+            for number, term in enumerate(terms):
+                if not matches[number] or not factors:
+                    continue
+                # With one term, bm25() is that term's IDF times its frequency factor
+                idf = fts5_idf(pages, matches[number])
+                for rowid, score in conn.execute(
+                    f"SELECT rowid, bm25(pages) FROM pages WHERE pages MATCH ? AND rowid IN ({placeholders})",
+                    (f'"{term}"', *factors),
+                ):
+                    factors[rowid][number] = -score / idf
+        finally:
+            conn.execute("COMMIT")
+        # FTS5 BM25 is negative, lower is better
+        hits = [(LibraryHit(digest, page, snippet, -score), factors[rowid]) for rowid, digest, page, snippet, score in rows]
+        return pages, matches, hits
+
+
+class LibraryIndex:
+    """
+    Sharded full-text index over the pages of all documents.
+
+    Args:
+        directory (str): Where the shard databases live.
+        shards (int): Number of shards; fixed for the lifetime of the index.
+    """
+
+    def __init__(self, directory: str, shards: int = 4):
+        self.directory = Path(directory)
+        self.shards = [LibraryShard(self.directory / f"shard-{number:02d}.db") for number in range(shards)]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(len(self.shards), thread_name_prefix="library-search")
+        return self._executor
+
+    def shard_for(self, digest: str) -> LibraryShard:
+        return self.shards[int(digest[:8], 16) % len(self.shards)]
+
+    def contains(self, digest: str) -> bool:
+        return self.shard_for(digest).contains(digest)
+
+    def add(self, digest: str, pages: List[str]) -> None:
+        """
+        Indexes (or re-indexes) the pages of a blob.
+
+        Args:
+            digest (str): Blob content hash.
+            pages (List[str]): Page texts in page order.
+        """
+        self.shard_for(digest).add(digest, pages)
+        logger.info(f"Library index: added {digest[:12]} ({len(pages)} pages)")
+
+    def remove(self, digest: str) -> None:
+        """Drops a blob's pages from the index."""
+        self.shard_for(digest).remove(digest)
+
+    def search(self, query: str, limit: int = 10) -> List[LibraryHit]:
+        """
+        Finds the best-matching pages across the library.
+
+        Pages containing every query term are preferred; if there are fewer
+        than ``limit`` of them, pages matching any term fill the rest.
+
+        Args:
+            query (str): Free-text query.
+            limit (int): Maximum number of hits.
+
+        Returns:
+            List[LibraryHit]: Hits, best first.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+
+        terms = list(dict.fromkeys(terms))
+        quoted = [f'"{term}"' for term in terms]
+        hits = self._search_shards(" ".join(quoted), terms, limit)
+        if len(hits) < limit and len(terms) > 1:
+            seen = {(hit.content_hash, hit.page) for hit in hits}
+            extra = self._search_shards(" OR ".join(quoted), terms, limit)
+            hits += [hit for hit in extra if (hit.content_hash, hit.page) not in seen][:limit - len(hits)]
+        return hits
+
+    def _search_shards(self, match: str, terms: List[str], limit: int) -> List[LibraryHit]:
+        results = list(self.executor.map(lambda shard: shard.search(match, terms, limit * CANDIDATE_FACTOR), self.shards))
+        pages = sum(shard_pages for shard_pages, _, _ in results)
+        idfs = [
+            library_idf(pages, sum(matches[number] for _, matches, _ in results))
+            for number in range(len(terms))
+        ]
+        hits = (
+            dataclasses.replace(hit, score=sum(idf * factor for idf, factor in zip(idfs, factors)))
+            for _, _, shard_hits in results
+            for hit, factors in shard_hits
+        )
+        return heapq.nlargest(limit, hits, key=lambda hit: hit.score)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
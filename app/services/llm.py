@@ -0,0 +1,163 @@
+# app/services/llm.py
+
+"""
+LLM Backends
+------------
+Pluggable answer generators for streaming chat. Every backend turns a
+question and the retrieved passages into an async stream of text pieces:
+
+- ``extractive``: no model, streams the retrieved passages back as the answer
+  (the default, same content as ``/api/chat``);
+- ``stub``: deterministic local model with a per-token delay, for tests and
+  benchmarks;
+- ``openai``: any OpenAI-compatible chat completions API (optional
+  ``openai`` package, imported when the first answer is generated).
+"""
+
+import asyncio
+import importlib.util
+import re
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional
+
+# Words plus their trailing whitespace, so joined pieces reproduce the text
+PIECE_RE = re.compile(r"\S+\s*")
+
+SYSTEM_PROMPT = (
+    "You answer questions about a book using only the passages provided. "
+    "Cite page numbers like [p. 12]. If the passages do not contain the answer, say so."
+)
+
+
+def format_passages(passages: List[Dict]) -> str:
+    return "\n\n".join(f"[p. {passage['page']}] {passage['text']}" for passage in passages)
+
+
+class LLMBackend(ABC):
+    """Generates an answer from retrieved passages as a stream of text pieces."""
+
+    name = "base"
+
+    @abstractmethod
+    def stream(self, question: str, passages: List[Dict]) -> AsyncIterator[str]:
+        """
+        Streams the answer to a question.
+
+        Args:
+            question (str): User question.
+            passages (List[Dict]): Retrieved passages with ``page`` and ``text``.
+
+        Returns:
+            AsyncIterator[str]: Answer pieces in order; closing the iterator
+            stops generation.
+        """
+
+    def warm_up(self) -> None:
+        """Loads what the first answer would otherwise wait for (blocking)."""
+
+
+class ExtractiveBackend(LLMBackend):
+    """Answers with the retrieved passages themselves."""
+
+    name = "extractive"
+
+    async def stream(self, question: str, passages: List[Dict]) -> AsyncIterator[str]:
+        if not passages:
+            yield "I couldn't find specific information about that question in the document."
+            return
+        answer = "Based on the document: " + " ... ".join(
+            f"[p. {passage['page']}] {passage['text']}" for passage in passages
+        )
+        for piece in PIECE_RE.findall(answer):
+            yield piece
+
+
+class StubBackend(LLMBackend):
+    """
+    Local stand-in model: a fixed-format answer naming the cited pages,
+    emitted one word at a time.
+
+    Args:
+        delay (float): Seconds to wait before each word.
+    """
+
+    name = "stub"
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+
+    async def stream(self, question: str, passages: List[Dict]) -> AsyncIterator[str]:
+        pages = ", ".join(str(passage["page"]) for passage in passages) or "none"
+        answer = f"Stub answer to: {question.strip()} (pages {pages})"
+        for piece in PIECE_RE.findall(answer):
+            await asyncio.sleep(self.delay)
+            yield piece
+
+
+class OpenAIBackend(LLMBackend):
+    """
+    Streams completions from an OpenAI-compatible API.
+
+    Args:
+        model (str): Chat model name.
+        base_url (Optional[str]): API base URL for compatible local servers.
+    """
+
+    name = "openai"
+
+    def __init__(self, model: str, base_url: Optional[str] = None):
+        if importlib.util.find_spec("openai") is None:
+            raise RuntimeError("The openai package is not installed")
+        self.model = model
+        self.base_url = base_url
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(base_url=self.base_url)
+        return self._client
+
+    def warm_up(self) -> None:
+        self.client
+
+    async def stream(self, question: str, passages: List[Dict]) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            temperature=0,
+            stream=True,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": f"Passages:\n{format_passages(passages)}\n\nQuestion: {question}"},
+            ],
+        )
+        try:
+            async for event in response:
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+        finally:
+            # Stops the upstream request when the client goes away
+            await response.close()
+
+
+def create_llm_backend(name: str, model: str = "gpt-3.5-turbo", base_url: Optional[str] = None) -> LLMBackend:
+    """
+    Builds the configured backend.
+
+    Args:
+        name (str): ``extractive``, ``stub`` or ``openai``.
+        model (str): Model name for API backends.
+        base_url (Optional[str]): API base URL for API backends.
+
+    Returns:
+        LLMBackend: The backend.
+    """
+    if name == "extractive":
+        return ExtractiveBackend()
+    if name == "stub":
+        return StubBackend()
+    if name == "openai":
+        return OpenAIBackend(model, base_url)
+    raise ValueError(f"Unknown LLM backend: {name}")
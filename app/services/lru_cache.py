@@ -0,0 +1,114 @@
+# app/services/lru_cache.py
+
+"""
+LRU Cache
+---------
+Small thread-safe LRU cache bounded by entry count and, optionally, by a
+total weight (e.g. characters of page text), so memory stays capped no
+matter how many documents are stored.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Least-recently-used mapping with count and weight limits.
+
+    Args:
+        max_items (int): Maximum number of entries.
+        max_weight (Optional[int]): Maximum summed weight of all entries.
+        weigh (Optional[Callable[[Any], int]]): Weight of a value; required
+            when ``max_weight`` is set.
+    """
+
+    def __init__(self, max_items: int, max_weight: Optional[int] = None, weigh: Optional[Callable[[Any], int]] = None):
+        self.max_items = max_items
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: 1)
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._weights: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            weight = self.weigh(value)
+            self._data[key] = value
+            self._weights[key] = weight
+            self.weight += weight
+            self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key]
+            self._remove(key)
+            return value
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Removes every entry whose key matches a predicate.
+
+        Args:
+            predicate (Callable[[Hashable], bool]): Key filter.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._weights.clear()
+            self.weight = 0
+
+    def keys(self) -> list:
+        """Snapshot of the keys, least recently used first."""
+        with self._lock:
+            return list(self._data)
+
+    def items(self) -> list:
+        """Snapshot of the entries, least recently used first."""
+        with self._lock:
+            return list(self._data.items())
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _remove(self, key: Hashable) -> None:
+        del self._data[key]
+        self.weight -= self._weights.pop(key)
+
+    def _evict(self) -> None:
+        # Always keep the newest entry, even if it alone exceeds max_weight
+        while len(self._data) > 1 and (
+            len(self._data) > self.max_items
+            or (self.max_weight is not None and self.weight > self.max_weight)
+        ):
+            self._remove(next(iter(self._data)))
@@ -0,0 +1,233 @@
+# app/services/metrics.py
+
+"""
+Metrics
+-------
+Counters, gauges and histograms rendered in the Prometheus text format for
+``GET /metrics``. Services define their metrics at module level on the
+shared :data:`registry` and update them in their hot paths; values that
+already exist elsewhere (cache statistics, queue depths) are read at scrape
+time by collectors instead of being mirrored.
+
+Metrics are per process: with several API workers each scrape reaches one
+of them, so give every worker its own scrape target or aggregate by
+``instance``.
+"""
+
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Upper bounds of latency buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        for value in values
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Metric:
+    """
+    A named metric with optional labels; ``labels(...)`` selects one series.
+
+    Args:
+        name (str): Metric name.
+        documentation (str): Help text.
+        labelnames (Sequence[str]): Label names, in the order ``labels`` takes values.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], "Metric"] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> "Metric":
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        key = tuple(str(value) for value in values)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def _new_series(self) -> "Metric":
+        return type(self)(self.name, self.documentation)
+
+    def series(self) -> Iterable[Tuple[Tuple[str, ...], "Metric"]]:
+        if self.labelnames:
+            return list(self._series.items())
+        return [((), self)]
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """``(suffix, extra labels, value)`` of this (unlabelled) series."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for values, series in self.series():
+            for suffix, extra, value in series.samples():
+                labels = format_labels(self.labelnames, values)
+                if extra:
+                    labels = labels[:-1] + "," + extra + "}" if labels else "{" + extra + "}"
+                lines.append(f"{self.name}{suffix}{labels} {format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        return [("", "", self.value)]
+
+
+class Gauge(Metric):
+    """Value that goes up and down."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        return [("", "", self.value)]
+
+
+class Histogram(Metric):
+    """
+    Observations counted into cumulative buckets, plus their sum and count.
+
+    Args:
+        buckets (Sequence[float]): Bucket upper bounds, ascending.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_series(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        samples, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            samples.append(("_bucket", f'le="{format_value(bound)}"', cumulative))
+        samples.append(("_bucket", 'le="+Inf"', count))
+        samples.append(("_sum", "", total))
+        samples.append(("_count", "", count))
+        return samples
+
+
+class Registry:
+    """Metrics and collectors of the process, rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets or LATENCY_BUCKETS))
+
+    def add_collector(self, collector: Callable[[], Iterable[Metric]]) -> None:
+        """
+        Adds a function called at every scrape, returning unregistered
+        metrics filled with current values.
+
+        Args:
+            collector (Callable[[], Iterable[Metric]]): The collector.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for metric in collector():
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Metrics of the API process
+registry = Registry()
@@ -0,0 +1,257 @@
+# app/services/ocr.py
+
+"""
+OCR
+---
+Text for scanned pages. Extraction flags pages that have no text layer but
+are covered by images; this stage renders just those pages at a resolution
+matched to their scans and runs them through Tesseract (via PyMuPDF) on a
+process pool, reading the result with the same layout rules as ordinary
+pages.
+
+Recognised pages are cached by a fingerprint of their images, so uploading
+the same scans again costs a lookup. Each document gets a time budget;
+pages still waiting when it runs out stay without text instead of holding
+up ingestion.
+
+Tesseract is a system dependency: without it :func:`ocr_available` is False
+and scanned pages are skipped with a warning.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from sqlalchemy import select
+
+from app.api.core.config import OCR_LANGUAGE, OCR_TIME_BUDGET, OCR_WORKERS, WORKER_NICENESS
+from app.api.core.db import SessionLocal
+from app.api.core.models import PageOcr
+from app.services.chunking import TextBlock
+from app.services.execution import default_cpu_workers, executors, lower_priority
+from app.services.extraction import ScannedPage, layout_blocks
+
+logger = logging.getLogger(__name__)
+
+# Fingerprints looked up / rows inserted per cache query
+CACHE_QUERY_BATCH = 500
+
+
+@lru_cache(maxsize=1)
+def ocr_available() -> bool:
+    """True when PyMuPDF finds a Tesseract installation with its language data."""
+    try:
+        fitz.get_tessdata()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _init_worker(niceness: int) -> None:
+    lower_priority(niceness)
+    # Pages already run in parallel; Tesseract's own threads would only compete with them
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def ocr_page(pdf_path: str, number: int, dpi: int, language: str) -> List[TextBlock]:
+    """
+    Recognises the text of one page. Runs in a worker process.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        number (int): Page number, 0-based.
+        dpi (int): Render resolution.
+        language (str): Tesseract language(s), e.g. ``eng`` or ``eng+deu``.
+
+    Returns:
+        List[TextBlock]: Blocks in reading order.
+    """
+    with fitz.open(pdf_path) as doc:
+        page = doc.load_page(number)
+        textpage = page.get_textpage_ocr(language=language, dpi=dpi, full=True)
+        return layout_blocks(page, textpage)
+
+
+class OcrCache:
+    """
+    Recognised page blocks in SQL, keyed by language and page fingerprint.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def get_many(self, language: str, fingerprints: List[str]) -> Dict[str, List[TextBlock]]:
+        """
+        Looks up recognised pages.
+
+        Args:
+            language (str): OCR language.
+            fingerprints (List[str]): Page fingerprints.
+
+        Returns:
+            Dict[str, List[TextBlock]]: Blocks of the fingerprints found.
+        """
+        found = {}
+        with self.session_factory() as session:
+            for start in range(0, len(fingerprints), CACHE_QUERY_BATCH):
+                rows = session.execute(
+                    select(PageOcr.page_hash, PageOcr.blocks).where(
+                        PageOcr.language == language,
+                        PageOcr.page_hash.in_(fingerprints[start:start + CACHE_QUERY_BATCH]),
+                    )
+                )
+                for key, blocks in rows:
+                    found[key] = [TextBlock(*block) for block in json.loads(blocks)]
+        return found
+
+    def put_many(self, language: str, pages: Dict[str, List[TextBlock]]) -> None:
+        """
+        Stores recognised pages, keeping the existing row when another job got there first.
+
+        Args:
+            language (str): OCR language.
+            pages (Dict[str, List[TextBlock]]): Blocks by page fingerprint.
+        """
+        rows = [
+            {
+                "language": language,
+                "page_hash": key,
+                "blocks": json.dumps([[block.text, block.size, block.bold] for block in blocks]),
+            }
+            for key, blocks in pages.items()
+        ]
+        statement = PageOcr.__table__.insert().prefix_with("OR IGNORE", dialect="sqlite")
+        with self.session_factory() as session:
+            for start in range(0, len(rows), CACHE_QUERY_BATCH):
+                session.execute(statement, rows[start:start + CACHE_QUERY_BATCH])
+            session.commit()
+
+
+class OcrEngine:
+    """
+    Runs the scanned pages of a document through Tesseract on a process pool.
+
+    The pool is created on first use, so documents with a text layer never
+    start it.
+
+    Args:
+        language (str): Tesseract language(s).
+        max_workers (Optional[int]): Worker processes; by default the spare
+            CPUs are split between the API workers.
+        time_budget (float): Seconds of OCR per document.
+        cache (Optional[OcrCache]): Recognised pages by fingerprint.
+    """
+
+    def __init__(
+        self,
+        language: str,
+        max_workers: Optional[int] = None,
+        time_budget: float = 300.0,
+        cache: Optional[OcrCache] = None,
+    ):
+        self.language = language
+        self.max_workers = max_workers or default_cpu_workers()
+        self.time_budget = time_budget
+        self.cache = cache
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn avoids forking a process that already runs threads and an event loop
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(WORKER_NICENESS,),
+            )
+            logger.info(f"OCR pool started with {self.max_workers} workers")
+        return self._executor
+
+    async def recognize(self, pdf_path: str, pages: Dict[int, ScannedPage]) -> AsyncIterator[Tuple[int, List[TextBlock]]]:
+        """
+        Recognises scanned pages, yielding them as they finish.
+
+        Cached pages come first. Pages sharing a fingerprint (repeated
+        scans, blank scanned pages) are recognised once. When the time
+        budget runs out, the remaining pages are dropped (a page a worker
+        has already started still runs to the end, its result unused).
+
+        Args:
+            pdf_path (str): Path to the PDF file.
+            pages (Dict[int, ScannedPage]): Scanned pages by page number.
+
+        Yields:
+            Tuple[int, List[TextBlock]]: ``(page_number, blocks)``; pages
+            that failed or ran out of time are missing.
+        """
+        deadline = time.monotonic() + self.time_budget
+        loop = asyncio.get_running_loop()
+
+        by_fingerprint: Dict[str, List[int]] = {}
+        for number, scan in sorted(pages.items()):
+            by_fingerprint.setdefault(scan.fingerprint, []).append(number)
+
+        cached: Dict[str, List[TextBlock]] = {}
+        if self.cache is not None:
+            cached = await executors.run_io(self.cache.get_many, self.language, list(by_fingerprint))
+        for fingerprint, blocks in cached.items():
+            for number in by_fingerprint[fingerprint]:
+                yield number, blocks
+
+        futures = {
+            loop.run_in_executor(
+                self.executor,
+                ocr_page,
+                pdf_path,
+                numbers[0],
+                pages[numbers[0]].dpi,
+                self.language,
+            ): fingerprint
+            for fingerprint, numbers in by_fingerprint.items()
+            if fingerprint not in cached
+        }
+        pending = set(futures)
+        recognized: Dict[str, List[TextBlock]] = {}
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    fingerprint = futures[future]
+                    numbers = by_fingerprint[fingerprint]
+                    try:
+                        blocks = future.result()
+                    except Exception as e:
+                        logger.warning(f"OCR failed for page {numbers[0] + 1} of {pdf_path}: {e}")
+                        continue
+                    recognized[fingerprint] = blocks
+                    for number in numbers:
+                        yield number, blocks
+            if pending:
+                skipped = sum(len(by_fingerprint[futures[future]]) for future in pending)
+                logger.warning(f"OCR time budget of {self.time_budget:.0f}s ran out, {skipped} pages of {pdf_path} left without text")
+        finally:
+            for future in pending:
+                future.cancel()
+            if recognized and self.cache is not None:
+                await executors.run_io(self.cache.put_many, self.language, recognized)
+
+    def shutdown(self) -> None:
+        """Stops the worker processes, if they were started."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Shared engine for the API process
+ocr_engine = OcrEngine(OCR_LANGUAGE, OCR_WORKERS or None, OCR_TIME_BUDGET, OcrCache())
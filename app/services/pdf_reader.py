@@ -8,6 +8,7 @@ Handles PDF file processing and text extraction using PyMuPDF.
 
 import fitz  # PyMuPDF
 from pathlib import Path
+from typing import List
 
 
 class PDFReaderService:
@@ -26,8 +27,25 @@ class PDFReaderService:
         Returns:
             str: Extracted full text.
         """
+        return "".join(PDFReaderService.extract_pages(pdf_path))
+
+    @staticmethod
+    def extract_pages(pdf_path: Path) -> List[str]:
+        """
+        Extracts the text of each page, keeping page boundaries.
+
+        For large documents inside the API prefer
+        ``app.services.extraction.ExtractionEngine``, which runs pages in
+        parallel off the event loop.
+
+        Args:
+            pdf_path (Path): Path to the PDF file.
+
+        Returns:
+            List[str]: One string per page, in page order.
+        """
         if not pdf_path.exists() or not pdf_path.is_file():
             raise FileNotFoundError(f"PDF file not found at: {pdf_path}")
 
         with fitz.open(pdf_path) as doc:
-            return "".join(page.get_text() for page in doc)
\ No newline at end of file
+            return [page.get_text() for page in doc]
\ No newline at end of file
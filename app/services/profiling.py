@@ -0,0 +1,150 @@
+# app/services/profiling.py
+
+"""
+Sampling Profiler
+-----------------
+An opt-in statistical profiler switched on at runtime for one route. While
+a request to that route is in flight, a background thread samples the
+stacks of the process's threads every few milliseconds and counts them as
+collapsed stacks (``frame;frame;frame count``), the input format of
+flame graph tools. Outside those requests, and when no route is selected,
+it costs nothing.
+
+Requests share the event loop and the I/O threads, so concurrent requests
+to other routes show up in the samples too; profile under a load that is
+mostly the route of interest.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Pattern
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+# Innermost frames of threads that are waiting for work rather than running it
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("selectors.py", "select"),
+}
+
+
+def route_pattern(route: str) -> Pattern:
+    """Regex matching the request paths of a route, ``{param}`` standing for one path segment."""
+    parts = re.split(r"\{[^}]*\}", route)
+    return re.compile("[^/]+".join(re.escape(part) for part in parts) + "/?")
+
+
+def collapse(frame) -> Optional[str]:
+    """A stack as ``file:function`` frames joined by ``;``, outermost first; None when idle."""
+    if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+        return None
+    frames = []
+    while frame is not None:
+        frames.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class SamplingProfiler:
+    """
+    Samples thread stacks while requests to a selected route run.
+
+    Args:
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.route: Optional[str] = None
+        self.pattern: Optional[Pattern] = None
+        self.deadline = 0.0
+        self.requests = 0
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._in_flight = 0
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, route: str, seconds: float) -> None:
+        """
+        Profiles requests to a route for a while, discarding earlier samples.
+
+        Args:
+            route (str): Route path as declared, e.g. ``/api/chat`` or
+                ``/api/read/start/{file_id}``.
+            seconds (float): How long the route stays selected.
+        """
+        with self._lock:
+            self.route = route
+            self.pattern = route_pattern(route)
+            self.deadline = time.monotonic() + seconds
+            self.requests = 0
+            self.samples = 0
+            self.stacks = Counter()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self.route = None
+        self._wake.set()
+
+    def active(self) -> bool:
+        return self.route is not None and time.monotonic() < self.deadline
+
+    def selects(self, path: str) -> bool:
+        """Whether a request for this path is to be profiled."""
+        pattern = self.pattern
+        return self.active() and pattern is not None and pattern.fullmatch(path) is not None
+
+    @contextmanager
+    def profile(self) -> Iterator[None]:
+        """Samples while the block (a request to the selected route) runs."""
+        with self._lock:
+            self._in_flight += 1
+            self.requests += 1
+        self._wake.set()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def report(self) -> Dict:
+        return {
+            "route": self.route,
+            "active": self.active(),
+            "seconds_left": round(max(0.0, self.deadline - time.monotonic()), 1) if self.route else 0.0,
+            "requests": self.requests,
+            "samples": self.samples,
+            "stacks": "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()),
+        }
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while self.active():
+            if not self._in_flight:
+                self._wake.wait(max(0.0, self.deadline - time.monotonic()))
+                self._wake.clear()
+                continue
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = collapse(frame)
+                if stack is not None:
+                    self.stacks[stack] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+
+# Shared profiler of the API process
+profiler = SamplingProfiler()
@@ -0,0 +1,456 @@
+# app/services/reading_sessions.py
+
+"""
+Reading Sessions
+----------------
+One session per reader instead of one process-wide TTS engine. A session
+records what is being read and where (page and sentence); its audio is
+streamed by whichever API worker the client connects to, and pause, resume,
+seek and stop are updates to the shared session record that the streaming
+worker picks up between sentences. Updates take a short-lived claim on the
+session in shared state, so concurrent ones from different workers are
+applied one after the other instead of overwriting each other.
+
+Synthesis for all sessions of a worker goes through a fixed number of slots
+handed out round-robin, so hundreds of readers share the speech processes
+fairly and a new reader never waits behind another reader's whole book.
+Segments found in the audio cache skip the slots altogether, and segments
+nobody waits for any more, e.g. after a client disconnected, are dropped
+from the queue or cancelled while synthesizing.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from app.services.execution import executors
+from app.services.shared_state import StateBackend
+from app.services.speech import AudioFormat, read_wav, speech_segments, split_for_speech, wav_stream_header
+
+logger = logging.getLogger(__name__)
+
+# Sessions expire this long after their last change
+SESSION_TTL = 6 * 60 * 60
+
+# Segments a session synthesizes ahead of the one it is streaming
+SESSION_LOOKAHEAD = 2
+
+# How often a paused stream checks whether it was resumed, in seconds
+PAUSE_POLL_INTERVAL = 0.25
+
+# Longest a session update holds the session's claim should its worker die, and how
+# often a blocked update retries, in seconds
+UPDATE_CLAIM_TTL = 5
+UPDATE_RETRY_INTERVAL = 0.01
+
+
+class SessionState:
+    PLAYING = "playing"
+    PAUSED = "paused"
+    STOPPED = "stopped"
+    FINISHED = "finished"
+
+
+class SessionNotFoundError(Exception):
+    """Raised for unknown or expired session ids."""
+
+
+class FairSynthesisScheduler:
+    """
+    Round-robin access to a fixed number of synthesis slots.
+
+    Each session has its own queue; whenever a slot frees up the next
+    session in turn gets it, regardless of how much it has queued. A
+    cancelled segment leaves the queue, or has its synthesis cancelled if
+    it already holds a slot.
+
+    Args:
+        synthesize (Callable[[str], Awaitable[bytes]]): Renders one segment to WAV.
+        slots (int): Segments synthesized at once.
+    """
+
+    def __init__(self, synthesize: Callable[[str], Awaitable[bytes]], slots: int):
+        self.synthesize = synthesize
+        self.slots = slots
+        self.active = 0
+        self._queues: "OrderedDict[str, Deque[Tuple[str, asyncio.Future]]]" = OrderedDict()
+        self._running: Dict[asyncio.Future, asyncio.Future] = {}
+
+    def submit(self, session_id: str, text: str) -> asyncio.Future:
+        """
+        Queues a segment for a session.
+
+        Args:
+            session_id (str): Owner, for fairness.
+            text (str): Segment text.
+
+        Returns:
+            asyncio.Future: Resolves to the WAV bytes; cancel it to drop the segment.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(session_id, deque()).append((text, future))
+        future.add_done_callback(lambda future: self._abandoned(session_id, future))
+        self._dispatch()
+        return future
+
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _dispatch(self) -> None:
+        while self.active < self.slots and self._queues:
+            session_id, queue = next(iter(self._queues.items()))
+            text, future = queue.popleft()
+            if queue:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+            if future.done():
+                continue
+
+            self.active += 1
+            task = asyncio.ensure_future(self.synthesize(text))
+            self._running[future] = task
+            task.add_done_callback(lambda task, future=future: self._finished(task, future))
+
+    def _abandoned(self, session_id: str, future: asyncio.Future) -> None:
+        if not future.cancelled():
+            return
+        task = self._running.get(future)
+        if task is not None:
+            task.cancel()
+            return
+        queue = self._queues.get(session_id)
+        if queue is not None:
+            for entry in queue:
+                if entry[1] is future:
+                    queue.remove(entry)
+                    break
+            if not queue:
+                del self._queues[session_id]
+
+    def _finished(self, task: asyncio.Future, future: asyncio.Future) -> None:
+        self.active -= 1
+        self._running.pop(future, None)
+        if not future.done():
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+        self._dispatch()
+
+
+class ReadingSessionManager:
+    """
+    Creates, controls and streams reading sessions kept in shared state.
+
+    Args:
+        state (StateBackend): Store shared by all API workers.
+        scheduler (FairSynthesisScheduler): This worker's synthesis slots.
+        load_sentences (Callable[[str, int], Optional[List[str]]]): Returns
+            the sentences of a page (0-based) of a blob, or None past the
+            last page. Called from a worker thread.
+        lookahead (int): Segments synthesized ahead per session.
+        lookup (Optional[Callable[[str], Awaitable[Optional[bytes]]]]): Returns
+            an already synthesized segment, or None to synthesize it.
+    """
+
+    def __init__(
+        self,
+        state: StateBackend,
+        scheduler: FairSynthesisScheduler,
+        load_sentences: Callable[[str, int], Optional[List[str]]],
+        lookahead: int = SESSION_LOOKAHEAD,
+        lookup: Optional[Callable[[str], Awaitable[Optional[bytes]]]] = None,
+    ):
+        self.state = state
+        self.scheduler = scheduler
+        self.load_sentences = load_sentences
+        self.lookahead = lookahead
+        self.lookup = lookup
+
+    # Session records
+
+    def create(
+        self,
+        file_id: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        page_count: Optional[int] = None,
+        text: Optional[str] = None,
+        page: int = 0,
+    ) -> Dict:
+        """
+        Starts a session reading a document from a page, or a piece of text.
+
+        Args:
+            file_id (Optional[str]): Document being read.
+            content_hash (Optional[str]): Its blob, where the pages come from.
+            page_count (Optional[int]): Pages in the document.
+            text (Optional[str]): Text to read instead of a document.
+            page (int): First page, 0-based.
+
+        Returns:
+            Dict: The session.
+        """
+        session = {
+            "session_id": uuid.uuid4().hex,
+            "file_id": file_id,
+            "content_hash": content_hash,
+            "page_count": page_count if text is None else 1,
+            "text": text,
+            "state": SessionState.PLAYING,
+            "page": page,
+            "sentence": 0,
+            "generation": 0,
+            "created_at": time.time(),
+        }
+        self._save(session)
+        return session
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """
+        Returns a session with its current reading position, or None.
+
+        Args:
+            session_id (str): Session id.
+        """
+        session = self.state.get(self._key(session_id))
+        if session is None:
+            return None
+        progress = self.state.get(self._progress_key(session_id))
+        if progress and progress["generation"] == session["generation"]:
+            session["page"], session["sentence"] = progress["page"], progress["sentence"]
+        return session
+
+    def pause(self, session_id: str) -> Dict:
+        return self._update(session_id, lambda session: session.update(state=SessionState.PAUSED))
+
+    def resume(self, session_id: str) -> Dict:
+        return self._update(session_id, lambda session: session.update(state=SessionState.PLAYING))
+
+    def stop(self, session_id: str) -> Dict:
+        return self._update(session_id, lambda session: session.update(state=SessionState.STOPPED))
+
+    def seek(self, session_id: str, page: int, sentence: int = 0) -> Dict:
+        """
+        Moves a session to a page and sentence; streams drop what they had
+        synthesized ahead and continue from there.
+
+        Args:
+            session_id (str): Session id.
+            page (int): Page, 0-based.
+            sentence (int): Sentence offset within the page.
+
+        Returns:
+            Dict: The updated session.
+
+        Raises:
+            SessionNotFoundError: Unknown session.
+            ValueError: Page outside the document.
+        """
+        def move(session: Dict) -> None:
+            if page < 0 or (session["page_count"] and page >= session["page_count"]) or sentence < 0:
+                raise ValueError("Position is outside the document")
+            state = SessionState.PLAYING if session["state"] == SessionState.FINISHED else session["state"]
+            session.update(page=page, sentence=sentence, state=state, generation=session["generation"] + 1)
+
+        return self._update(session_id, move)
+
+    def _require(self, session_id: str) -> Dict:
+        session = self.state.get(self._key(session_id))
+        if session is None:
+            raise SessionNotFoundError(session_id)
+        return session
+
+    def _update(self, session_id: str, change: Callable[[Dict], None]) -> Dict:
+        with self._claimed(session_id):
+            session = self._require(session_id)
+            change(session)
+            self._save(session)
+        return self.get(session_id)
+
+    @contextmanager
+    def _claimed(self, session_id: str) -> Iterator[None]:
+        # Read-modify-write of the session record, one worker at a time
+        key = f"reading:claim:{session_id}"
+        while not self.state.claim(key, {"pid": os.getpid()}, UPDATE_CLAIM_TTL):
+            time.sleep(UPDATE_RETRY_INTERVAL)
+        try:
+            yield
+        finally:
+            self.state.delete(key)
+
+    def _save(self, session: Dict) -> None:
+        self.state.set(self._key(session["session_id"]), session, SESSION_TTL)
+
+    def _key(self, session_id: str) -> str:
+        return f"reading:session:{session_id}"
+
+    def _progress_key(self, session_id: str) -> str:
+        return f"reading:progress:{session_id}"
+
+    # Audio
+
+    async def _segments(self, session: Dict, page: int) -> List[str]:
+        if session["text"] is not None:
+            return split_for_speech(session["text"]) if page == 0 else []
+        if session["page_count"] is not None and page >= session["page_count"]:
+            return []
+        sentences = await executors.run_io(self.load_sentences, session["content_hash"], page)
+        return speech_segments(sentences) if sentences else []
+
+    async def _audio(self, session_id: str, text: str) -> bytes:
+        if self.lookup is not None:
+            data = await self.lookup(text)
+            if data is not None:
+                return data
+        return await self.scheduler.submit(session_id, text)
+
+    async def prewarm(self, content_hash: str, words: int) -> int:
+        """
+        Synthesizes the opening of a document ahead of its first reader, so
+        its audio is served from the cache. Takes turns with readers for
+        one synthesis slot at a time.
+
+        Args:
+            content_hash (str): Blob to read.
+            words (int): How much of the document, in words.
+
+        Returns:
+            int: Segments synthesized.
+        """
+        session = {"text": None, "content_hash": content_hash, "page_count": None}
+        synthesized = 0
+        page = 0
+        while words > 0:
+            if not await self._has_page(session, page):
+                break
+            for text in await self._segments(session, page):
+                if self.lookup is None or await self.lookup(text) is None:
+                    await self.scheduler.submit(f"prewarm:{content_hash}", text)
+                    synthesized += 1
+                words -= len(text.split())
+                if words <= 0:
+                    break
+            page += 1
+        return synthesized
+
+    async def stream(self, session_id: str) -> AsyncIterator[bytes]:
+        """
+        Streams a session as one WAV from its current position.
+
+        Between segments the stream follows the shared record: it waits
+        while paused, restarts at the new position after a seek, and ends
+        when the session is stopped, finishes, or a newer stream for the
+        same session starts.
+
+        Args:
+            session_id (str): Session id.
+
+        Yields:
+            bytes: The WAV header, then PCM frames sentence by sentence; empty
+            chunks while paused.
+
+        Raises:
+            SessionNotFoundError: Unknown session.
+        """
+        session = await executors.run_io(self.get, session_id)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+
+        stream_id = uuid.uuid4().hex
+        generation = session["generation"]
+        page, sentence = session["page"], session["sentence"]
+        await executors.run_io(self._save_progress, session_id, stream_id, generation, page, sentence)
+
+        # Cursor over the segments still to be submitted
+        cursor = {"page": page, "sentence": sentence, "segments": None}
+        in_flight: Deque[Tuple[int, int, asyncio.Future]] = deque()
+        audio_format: Optional[AudioFormat] = None
+
+        async def fill() -> None:
+            while len(in_flight) < self.lookahead:
+                if cursor["segments"] is None:
+                    cursor["segments"] = await self._segments(session, cursor["page"])
+                    if not cursor["segments"] and not await self._has_page(session, cursor["page"]):
+                        return
+                if cursor["sentence"] >= len(cursor["segments"]):
+                    cursor["page"] += 1
+                    cursor["sentence"] = 0
+                    cursor["segments"] = None
+                    continue
+                text = cursor["segments"][cursor["sentence"]]
+                in_flight.append((cursor["page"], cursor["sentence"], asyncio.ensure_future(self._audio(session_id, text))))
+                cursor["sentence"] += 1
+
+        def cancel_in_flight() -> None:
+            while in_flight:
+                in_flight.popleft()[2].cancel()
+
+        try:
+            while True:
+                current = await executors.run_io(self.state.get, self._key(session_id))
+                progress = await executors.run_io(self.state.get, self._progress_key(session_id))
+                if current is None or current["state"] == SessionState.STOPPED:
+                    break
+                if progress is not None and progress["stream_id"] != stream_id:
+                    # A newer stream took over this session
+                    break
+                if current["generation"] != generation:
+                    cancel_in_flight()
+                    generation = current["generation"]
+                    cursor.update(page=current["page"], sentence=current["sentence"], segments=None)
+                if current["state"] == SessionState.PAUSED:
+                    await asyncio.sleep(PAUSE_POLL_INTERVAL)
+                    # Nothing goes on the wire; a paused stream is not mistaken for a stalled one
+                    yield b""
+                    continue
+
+                await fill()
+                if not in_flight:
+                    await executors.run_io(self._finish, session_id, generation)
+                    break
+
+                segment_page, segment_sentence, future = in_flight.popleft()
+                data = await future
+                segment_format, frames = read_wav(data)
+                if audio_format is None:
+                    audio_format = segment_format
+                    yield wav_stream_header(audio_format)
+                if segment_format == audio_format:
+                    yield frames
+                else:
+                    logger.warning(f"Skipping segment with audio format {segment_format}, stream uses {audio_format}")
+
+                await executors.run_io(
+                    self._save_progress, session_id, stream_id, generation, segment_page, segment_sentence + 1
+                )
+        finally:
+            cancel_in_flight()
+
+    async def _has_page(self, session: Dict, page: int) -> bool:
+        if session["text"] is not None:
+            return page == 0
+        if session["page_count"] is not None:
+            return page < session["page_count"]
+        return await executors.run_io(self.load_sentences, session["content_hash"], page) is not None
+
+    def _save_progress(self, session_id: str, stream_id: str, generation: int, page: int, sentence: int) -> None:
+        self.state.set(
+            self._progress_key(session_id),
+            {"stream_id": stream_id, "generation": generation, "page": page, "sentence": sentence},
+            SESSION_TTL,
+        )
+
+    def _finish(self, session_id: str, generation: int) -> None:
+        with self._claimed(session_id):
+            session = self.state.get(self._key(session_id))
+            if session is not None and session["generation"] == generation:
+                session["state"] = SessionState.FINISHED
+                self._save(session)
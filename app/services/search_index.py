@@ -0,0 +1,410 @@
+# app/services/search_index.py
+
+"""
+Search Index Service
+--------------------
+Per-document inverted index with BM25 ranking, built once at upload time
+and persisted next to the PDF so keyword Q&A never rescans the raw text.
+Indexes built from a document structure keep only the page store ids of
+their sentences; hit texts are read from the page store.
+
+Batches of questions are ranked together: each query term's BM25 weights
+are computed once per batch as arrays, and the scores of a block of
+questions are summed over all sentences in one vectorized pass.
+"""
+
+import itertools
+import json
+import math
+import os
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.chunking import DocumentStructure, TextBlock, join_blocks, split_sentences
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    """
+    a about an and are as at be been but by can could did do does for from had
+    has have how i if in into is it its me my no not of on or our so than that
+    the their them then there these they this to was we were what when where
+    which who whom why will with would you your
+    """.split()
+)
+
+# BM25 tuning parameters (standard defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Extra score for query terms that appear next to each other in a sentence
+PROXIMITY_BONUS = 0.5
+# Postings are impact-ordered, so only the best entries of a term are scored
+MAX_POSTINGS_SCAN = 2000
+# Question-by-sentence scores held at once when ranking a batch (float64 cells)
+BATCH_SCORE_CELLS = 2 * 1024 * 1024
+
+# Version 2 stores page store sentence ids instead of sentence texts
+INDEX_VERSION = 2
+SUPPORTED_INDEX_VERSIONS = (1, 2)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases text and splits it into alphanumeric tokens.
+
+    Args:
+        text (str): Raw text.
+
+    Returns:
+        List[str]: Tokens in document order.
+    """
+    return TOKEN_RE.findall(text.lower())
+
+
+def query_terms(question: str) -> List[str]:
+    """
+    Tokenizes a question and drops stopwords and single characters.
+
+    Args:
+        question (str): User question.
+
+    Returns:
+        List[str]: Distinct query terms in question order.
+    """
+    seen = []
+    for token in tokenize(question):
+        if len(token) > 1 and token not in STOPWORDS and token not in seen:
+            seen.append(token)
+    return seen
+
+
+class InvertedIndex:
+    """
+    Token -> sentence postings with in-sentence positions.
+
+    Postings are stored as ``{token: [[sentence_id, pos, pos, ...], ...]}``
+    so term frequency is ``len(entry) - 1`` and positions stay available for
+    proximity scoring. Each posting list is sorted by BM25 impact (higher
+    term frequency, shorter sentence first), which lets a query stop after
+    the top entries of very common terms.
+    """
+
+    def __init__(
+        self,
+        sentences: Optional[List[str]],
+        postings: Dict[str, List[List[int]]],
+        lengths: List[int],
+        pages: Optional[List[int]] = None,
+        refs: Optional[List[int]] = None,
+    ):
+        # Sentence texts; None for loaded indexes that reference the page store
+        self.sentences = sentences
+        self.postings = postings
+        self.lengths = lengths
+        # 0-based page number of each sentence, when built from pages
+        self.pages = pages
+        # Page store sentence id of each sentence, when built from a structure
+        self.refs = refs
+        total = sum(lengths)
+        self.avg_length = total / len(lengths) if lengths else 0.0
+        # BM25 weights of the scanned postings of queried terms, as (sentence ids, weights)
+        self._term_weights: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def build(
+        cls,
+        sentences: Iterable[str],
+        pages: Optional[Iterable[int]] = None,
+        refs: Optional[Iterable[int]] = None,
+    ) -> "InvertedIndex":
+        """
+        Builds an index over the given sentences.
+
+        Args:
+            sentences (Iterable[str]): Sentences in document order.
+            pages (Optional[Iterable[int]]): Page number of each sentence.
+            refs (Optional[Iterable[int]]): Page store id of each sentence.
+
+        Returns:
+            InvertedIndex: The populated index.
+        """
+        kept: List[str] = []
+        lengths: List[int] = []
+        kept_pages: List[int] = []
+        kept_refs: List[int] = []
+        postings: Dict[str, List[List[int]]] = defaultdict(list)
+        page_numbers = iter(pages) if pages is not None else itertools.repeat(0)
+        sentence_refs = iter(refs) if refs is not None else itertools.repeat(0)
+
+        for sentence, page_number, ref in zip(sentences, page_numbers, sentence_refs):
+            tokens = tokenize(sentence)
+            if not tokens:
+                continue
+            sentence_id = len(kept)
+            kept.append(sentence)
+            lengths.append(len(tokens))
+            kept_pages.append(page_number)
+            kept_refs.append(ref)
+
+            positions: Dict[str, List[int]] = defaultdict(list)
+            for pos, token in enumerate(tokens):
+                positions[token].append(pos)
+            for token, pos_list in positions.items():
+                postings[token].append([sentence_id, *pos_list])
+
+        for entries in postings.values():
+            entries.sort(key=lambda entry: (1 - len(entry), lengths[entry[0]], entry[0]))
+
+        return cls(
+            kept,
+            dict(postings),
+            lengths,
+            kept_pages if pages is not None else None,
+            kept_refs if refs is not None else None,
+        )
+
+    @classmethod
+    def from_text(cls, text: str) -> "InvertedIndex":
+        """
+        Splits text into sentences and indexes them.
+
+        Args:
+            text (str): Full document text.
+
+        Returns:
+            InvertedIndex: The populated index.
+        """
+        return cls.build(split_sentences(text))
+
+    @classmethod
+    def from_pages(cls, pages: List[str], structure: Optional[DocumentStructure] = None) -> "InvertedIndex":
+        """
+        Indexes a document page by page, remembering each sentence's page
+        and, with a structure, its id in the page store (the sentence's
+        position in the structure, headings included).
+
+        Args:
+            pages (List[str]): Page texts in page order.
+            structure (Optional[DocumentStructure]): Sentences from ingestion;
+                split from the page texts when None. Headings are left out,
+                they are not answers.
+
+        Returns:
+            InvertedIndex: The populated index.
+        """
+        # Only a structure saved with the pages matches the page store's sentence ids
+        stored = structure is not None
+        structure = structure or DocumentStructure.from_text(pages)
+        heading_paragraphs = {section.paragraph for section in structure.sections}
+        sentences: List[str] = []
+        page_numbers: List[int] = []
+        refs: List[int] = []
+        for ref, (number, paragraph, text) in enumerate(structure.iter_sentences(pages)):
+            if paragraph in heading_paragraphs:
+                continue
+            sentences.append(text)
+            page_numbers.append(number)
+            refs.append(ref)
+        return cls.build(sentences, page_numbers, refs if stored else None)
+
+    def search(self, question: str, limit: int = 3) -> List[Tuple[int, float]]:
+        """
+        Ranks sentences against a question with BM25.
+
+        Only the postings of the query terms are visited, and at most
+        ``MAX_POSTINGS_SCAN`` impact-ordered entries per term, so the cost is
+        bounded independently of document length.
+
+        Args:
+            question (str): User question.
+            limit (int): Maximum number of hits.
+
+        Returns:
+            List[Tuple[int, float]]: ``(sentence_id, score)`` pairs, best first.
+        """
+        terms = [t for t in query_terms(question) if t in self.postings]
+        if not terms:
+            return []
+
+        n = len(self.lengths)
+        scores: Dict[int, float] = defaultdict(float)
+        positions: Dict[int, Dict[str, List[int]]] = defaultdict(dict)
+
+        for term in terms:
+            entries = self.postings[term]
+            df = len(entries)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for entry in entries[:MAX_POSTINGS_SCAN]:
+                sentence_id = entry[0]
+                tf = len(entry) - 1
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[sentence_id] / self.avg_length)
+                scores[sentence_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+                positions[sentence_id][term] = entry[1:]
+
+        # Reward sentences where consecutive query terms appear side by side
+        for first, second in zip(terms, terms[1:]):
+            for sentence_id, term_positions in positions.items():
+                if first in term_positions and second in term_positions:
+                    following = set(term_positions[second])
+                    if any(p + 1 in following for p in term_positions[first]):
+                        scores[sentence_id] += PROXIMITY_BONUS
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def term_weights(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 contribution of a term to each sentence it is scored for, the
+        same values :meth:`search` adds up.
+
+        Args:
+            term (str): An indexed query term.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Sentence ids and their weights.
+        """
+        weights = self._term_weights.get(term)
+        if weights is None:
+            entries = self.postings[term]
+            scanned = entries[:MAX_POSTINGS_SCAN]
+            df = len(entries)
+            idf = math.log(1 + (len(self.lengths) - df + 0.5) / (df + 0.5))
+            ids = np.fromiter((entry[0] for entry in scanned), dtype=np.int64, count=len(scanned))
+            tf = np.fromiter((len(entry) - 1 for entry in scanned), dtype=np.float64, count=len(scanned))
+            lengths = np.fromiter((self.lengths[sentence_id] for sentence_id in ids.tolist()), dtype=np.float64, count=len(scanned))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / self.avg_length)
+            weights = (ids, idf * tf * (BM25_K1 + 1) / (tf + norm))
+            self._term_weights[term] = weights
+        return weights
+
+    def adjacent(self, first: str, second: str) -> np.ndarray:
+        """Sentences scored for both terms in which ``second`` directly follows ``first``."""
+        first_positions = {entry[0]: entry[1:] for entry in self.postings[first][:MAX_POSTINGS_SCAN]}
+        sentence_ids = []
+        for entry in self.postings[second][:MAX_POSTINGS_SCAN]:
+            positions = first_positions.get(entry[0])
+            if positions is not None:
+                following = set(entry[1:])
+                if any(p + 1 in following for p in positions):
+                    sentence_ids.append(entry[0])
+        return np.array(sentence_ids, dtype=np.int64)
+
+    def search_many(self, questions: List[str], limit: int = 3) -> List[List[Tuple[int, float]]]:
+        """
+        Ranks sentences against many questions at once, with the same results
+        as calling :meth:`search` for each.
+
+        The questions are tokenized together, every distinct term and term
+        pair is weighed once, and the scores of a block of questions are
+        accumulated over all sentences with one ``bincount``.
+
+        Args:
+            questions (List[str]): User questions.
+            limit (int): Maximum number of hits per question.
+
+        Returns:
+            List[List[Tuple[int, float]]]: ``(sentence_id, score)`` pairs, best
+            first, for each question in order.
+        """
+        n = len(self.lengths)
+        question_terms = [[t for t in query_terms(question) if t in self.postings] for question in questions]
+        pairs: Dict[Tuple[str, str], np.ndarray] = {}
+        results: List[List[Tuple[int, float]]] = []
+        rows_per_block = max(1, BATCH_SCORE_CELLS // max(n, 1))
+
+        for start in range(0, len(questions), rows_per_block):
+            block = question_terms[start:start + rows_per_block]
+            bins: List[np.ndarray] = []
+            values: List[np.ndarray] = []
+            for row, terms in enumerate(block):
+                for term in terms:
+                    ids, weights = self.term_weights(term)
+                    bins.append(ids + row * n)
+                    values.append(weights)
+                # Proximity bonuses after the term weights, in the order search adds them
+                for pair in zip(terms, terms[1:]):
+                    if pair not in pairs:
+                        pairs[pair] = self.adjacent(*pair)
+                    bins.append(pairs[pair] + row * n)
+                    values.append(np.full(len(pairs[pair]), PROXIMITY_BONUS))
+            if not bins:
+                results.extend([] for _ in block)
+                continue
+            scores = np.bincount(np.concatenate(bins), np.concatenate(values), minlength=len(block) * n).reshape(len(block), n)
+
+            for row, terms in enumerate(block):
+                row_scores = scores[row]
+                candidates = np.flatnonzero(row_scores) if terms else np.empty(0, dtype=np.int64)
+                if len(candidates) > limit:
+                    # Everything scoring at least the limit-th best, so ties are broken by id as in search
+                    threshold = np.partition(row_scores[candidates], len(candidates) - limit)[len(candidates) - limit]
+                    candidates = candidates[row_scores[candidates] >= threshold]
+                order = np.lexsort((candidates, -row_scores[candidates]))[:limit]
+                results.append([(int(candidates[i]), float(row_scores[candidates[i]])) for i in order])
+        return results
+
+    def to_dict(self) -> dict:
+        data = {
+            "version": INDEX_VERSION,
+            "lengths": self.lengths,
+            "postings": self.postings,
+            "pages": self.pages,
+        }
+        # Sentences that live in the page store are not stored twice
+        if self.refs is not None:
+            data["refs"] = self.refs
+        else:
+            data["sentences"] = self.sentences
+        return data
+
+    def save(self, path: Path) -> None:
+        """
+        Writes the index to disk atomically as JSON.
+
+        Args:
+            path (Path): Destination file.
+        """
+        path = Path(path)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "InvertedIndex":
+        """
+        Loads an index previously written by :meth:`save`.
+
+        Args:
+            path (Path): Index file.
+
+        Returns:
+            InvertedIndex: The loaded index.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") not in SUPPORTED_INDEX_VERSIONS:
+            raise ValueError(f"Unsupported index version in {path}")
+        return cls(data.get("sentences"), data["postings"], data["lengths"], data.get("pages"), data.get("refs"))
+
+
+def build_page_index(blocks: List[List[TextBlock]], index_path: Path) -> DocumentStructure:
+    """
+    Segments extracted pages and writes their keyword index. Runs in a
+    worker process, so the pure-Python work stays off the API process.
+
+    Args:
+        blocks (List[List[TextBlock]]): Layout blocks of every page.
+        index_path (Path): Destination of the index.
+
+    Returns:
+        DocumentStructure: The structure the index was built from.
+    """
+    structure = DocumentStructure.from_blocks(blocks)
+    pages = [join_blocks(page_blocks) for page_blocks in blocks]
+    InvertedIndex.from_pages(pages, structure).save(index_path)
+    return structure
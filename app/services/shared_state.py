@@ -0,0 +1,204 @@
+# app/services/shared_state.py
+
+"""
+Shared State
+------------
+Small key/value store for state that every API worker must see: job
+progress, reading-session control and startup coordination. SQLite in WAL
+mode is the default for single-node deployments; the in-memory backend is a
+drop-in stand-in for tests and single-process runs.
+
+Expired entries stop being visible at once and are deleted in bulk every
+``PURGE_EVERY`` writes, and by each storage compaction pass.
+"""
+
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+# Expired entries are deleted every this many writes, so they don't pile up between reads
+PURGE_EVERY = 1000
+
+
+class StateBackend(ABC):
+    """Interface for shared key/value state with optional expiry."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict]:
+        """Returns the value stored under ``key``, or None if missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: Dict, ttl: Optional[float] = None) -> None:
+        """Stores ``value`` under ``key``, expiring after ``ttl`` seconds if given."""
+
+    @abstractmethod
+    def claim(self, key: str, value: Dict, ttl: float) -> bool:
+        """Stores ``value`` only if ``key`` is absent; True if this caller won."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Removes ``key`` if present."""
+
+    @abstractmethod
+    def keys(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Lists live keys starting with ``prefix``, at most ``limit`` of them, latest expiry first."""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Deletes expired entries, returning how many were removed."""
+
+
+class InMemoryStateBackend(StateBackend):
+    """Process-local backend; shares nothing between workers."""
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._writes = itertools.count(1)
+
+    def _live(self, key: str) -> Optional[Dict]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            value = self._live(key)
+            return json.loads(json.dumps(value)) if value is not None else None
+
+    def set(self, key: str, value: Dict, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (json.loads(json.dumps(value)), time.time() + ttl if ttl else None)
+        if next(self._writes) % PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def claim(self, key: str, value: Dict, ttl: float) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._data[key] = (json.loads(json.dumps(value)), time.time() + ttl)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def keys(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        with self._lock:
+            live = [key for key in list(self._data) if key.startswith(prefix) and self._live(key) is not None]
+            live.sort(key=lambda key: self._data[key][1] or float("inf"), reverse=True)
+            return live[:limit]
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._data.items() if expires_at is not None and expires_at <= now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    Backend on a SQLite file in WAL mode, shared by all workers on one host.
+
+    Each thread gets its own connection; WAL lets readers proceed while a
+    writer commits.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._writes = itertools.count(1)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shared_state ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS shared_state_expires_at ON shared_state (expires_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Dict, ttl: Optional[float] = None) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl if ttl else None),
+        )
+        if next(self._writes) % PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def claim(self, key: str, value: Dict, ttl: float) -> bool:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM shared_state WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        self._connect().execute("DELETE FROM shared_state WHERE key = ?", (key,))
+
+    def keys(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        # Keys that never expire sort first; LIMIT -1 is no limit
+        rows = self._connect().execute(
+            "SELECT key FROM shared_state WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?) "
+            "ORDER BY expires_at IS NULL DESC, expires_at DESC LIMIT ?",
+            (prefix, prefix + "\uffff", time.time(), -1 if limit is None else limit),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge_expired(self) -> int:
+        cursor = self._connect().execute(
+            "DELETE FROM shared_state WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+
+def create_state_backend(url: str) -> StateBackend:
+    """
+    Builds a backend from a URL: ``memory://`` or ``sqlite:///path/to/file.db``.
+
+    Args:
+        url (str): Backend URL.
+
+    Returns:
+        StateBackend: The configured backend.
+    """
+    if url.startswith("memory://"):
+        return InMemoryStateBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteStateBackend(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported state backend URL: {url}")
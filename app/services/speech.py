@@ -0,0 +1,404 @@
+# app/services/speech.py
+
+"""
+Speech Synthesis
+----------------
+Offline text-to-speech rendered to WAV audio for the client, instead of
+being played on the server's speakers. Text is split into sentence-sized
+segments that are synthesized a few ahead of playback on a process pool
+(each worker process owns its own engine), and their PCM frames are
+streamed as one open-ended WAV, so playback starts after the first sentence.
+
+Backends: ``pyttsx3`` (platform voices), ``espeak`` (espeak-ng / espeak
+command line) and ``stub`` (generated tone, for tests).
+"""
+
+import asyncio
+import io
+import logging
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import struct
+import subprocess
+import tempfile
+import wave
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from app.services.chunking import split_sentences
+from app.services.execution import executors
+from app.services.metrics import registry
+from app.services.tracing import span
+
+if TYPE_CHECKING:
+    from app.services.audio_cache import AudioCache
+
+logger = logging.getLogger(__name__)
+
+SYNTHESIS_SECONDS = registry.histogram("tts_synthesis_seconds", "Time to synthesize one segment, including waiting for a worker")
+SYNTHESIS_REAL_TIME_FACTOR = registry.histogram(
+    "tts_real_time_factor",
+    "Synthesis time divided by the duration of the audio produced (below 1 is faster than playback)",
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0),
+)
+SYNTHESIZED_AUDIO_SECONDS = registry.counter("tts_audio_seconds_total", "Seconds of audio synthesized")
+
+# Segments longer than this are split at clause or word boundaries
+MAX_SEGMENT_CHARS = 300
+# Sentences shorter than this are merged with the next one
+MIN_SEGMENT_CHARS = 40
+
+CLAUSE_END_RE = re.compile(r"(?<=[,)])\s+")
+
+# Format of the stub backend
+STUB_SAMPLE_RATE = 22050
+STUB_SECONDS_PER_WORD = 0.05
+
+
+@dataclass(frozen=True)
+class VoiceSettings:
+    """Everything that determines how a segment sounds."""
+
+    backend: str
+    voice: str = ""
+    rate: int = 150
+    volume: float = 0.8
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    channels: int
+    sample_width: int
+    frame_rate: int
+
+
+def split_for_speech(text: str, max_chars: int = MAX_SEGMENT_CHARS, min_chars: int = MIN_SEGMENT_CHARS) -> List[str]:
+    """
+    Splits text into sentence-sized segments for synthesis.
+
+    Args:
+        text (str): Text to read.
+        max_chars (int): Longest segment; longer sentences are split.
+        min_chars (int): Shorter sentences are merged with the next one.
+
+    Returns:
+        List[str]: Non-empty segments in reading order.
+    """
+    return speech_segments(split_sentences(text), max_chars, min_chars)
+
+
+def speech_segments(sentences: Iterable[str], max_chars: int = MAX_SEGMENT_CHARS, min_chars: int = MIN_SEGMENT_CHARS) -> List[str]:
+    """
+    Turns sentences into segments for synthesis.
+
+    Args:
+        sentences (Iterable[str]): Sentences in reading order.
+        max_chars (int): Longest segment; longer sentences are split.
+        min_chars (int): Shorter sentences are merged with the next one.
+
+    Returns:
+        List[str]: Non-empty segments in reading order.
+    """
+    segments: List[str] = []
+    pending = ""
+    for sentence in sentences:
+        pending = f"{pending} {sentence}".strip() if pending else sentence.strip()
+        if len(pending) < min_chars:
+            continue
+        segments.extend(_split_long(pending, max_chars))
+        pending = ""
+    if pending:
+        segments.extend(_split_long(pending, max_chars))
+    return segments
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    if len(sentence) <= max_chars:
+        return [sentence]
+    parts: List[str] = []
+    current = ""
+    for piece in CLAUSE_END_RE.split(sentence):
+        for word in piece.split(" ") if len(piece) > max_chars else [piece]:
+            if current and len(current) + len(word) + 1 > max_chars:
+                parts.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+    if current:
+        parts.append(current)
+    return parts
+
+
+def read_wav(data: bytes) -> Tuple[AudioFormat, bytes]:
+    """
+    Splits a WAV file into its format and PCM frames.
+
+    Args:
+        data (bytes): WAV file contents.
+
+    Returns:
+        Tuple[AudioFormat, bytes]: Format and raw frames.
+    """
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        audio_format = AudioFormat(wav.getnchannels(), wav.getsampwidth(), wav.getframerate())
+        # Streamed WAVs (espeak --stdout) declare a bogus length; read to the end
+        frames = wav.readframes(wav.getnframes())
+    return audio_format, frames
+
+
+def wav_duration(data: bytes) -> float:
+    """Seconds of audio in a WAV file, 0 when it cannot be read."""
+    try:
+        audio_format, frames = read_wav(data)
+    except Exception:
+        return 0.0
+    bytes_per_second = audio_format.frame_rate * audio_format.sample_width * audio_format.channels
+    return len(frames) / bytes_per_second if bytes_per_second else 0.0
+
+
+def wav_stream_header(audio_format: AudioFormat) -> bytes:
+    """
+    Header of a WAV of unknown length, followed directly by PCM frames.
+
+    Args:
+        audio_format (AudioFormat): Format of the frames that follow.
+
+    Returns:
+        bytes: 44-byte RIFF/WAVE header with maximal chunk sizes.
+    """
+    block_align = audio_format.channels * audio_format.sample_width
+    return b"".join([
+        b"RIFF", struct.pack("<I", 0xFFFFFFFF), b"WAVE",
+        b"fmt ", struct.pack(
+            "<IHHIIHH", 16, 1, audio_format.channels, audio_format.frame_rate,
+            audio_format.frame_rate * block_align, block_align, audio_format.sample_width * 8,
+        ),
+        b"data", struct.pack("<I", 0xFFFFFFFF),
+    ])
+
+
+class SpeechBackend(ABC):
+    """Renders text to a complete WAV file."""
+
+    def __init__(self, settings: VoiceSettings):
+        self.settings = settings
+
+    @abstractmethod
+    def synthesize(self, text: str) -> bytes:
+        """
+        Synthesizes one segment.
+
+        Args:
+            text (str): Segment text.
+
+        Returns:
+            bytes: WAV file contents.
+        """
+
+
+class Pyttsx3Backend(SpeechBackend):
+    """Platform voices through pyttsx3, rendered to a file rather than the speakers."""
+
+    def __init__(self, settings: VoiceSettings):
+        super().__init__(settings)
+        import pyttsx3
+
+        self.engine = pyttsx3.init()
+        self.engine.setProperty("rate", settings.rate)
+        self.engine.setProperty("volume", settings.volume)
+        if settings.voice:
+            self.engine.setProperty("voice", settings.voice)
+
+    def synthesize(self, text: str) -> bytes:
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            self.engine.save_to_file(text, path)
+            self.engine.runAndWait()
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+
+class EspeakBackend(SpeechBackend):
+    """espeak-ng (or espeak) command line writing WAV to stdout."""
+
+    def __init__(self, settings: VoiceSettings):
+        super().__init__(settings)
+        self.command = shutil.which("espeak-ng") or shutil.which("espeak")
+        if self.command is None:
+            raise RuntimeError("Neither espeak-ng nor espeak is installed")
+
+    def synthesize(self, text: str) -> bytes:
+        result = subprocess.run(
+            [
+                self.command, "--stdout",
+                "-v", self.settings.voice or "en",
+                "-s", str(self.settings.rate),
+                # espeak amplitude runs 0-200, 100 is normal
+                "-a", str(int(self.settings.volume * 100)),
+                # Text comes on stdin as UTF-8, so a segment starting with "-" is never read as an option
+                "-b", "1", "--stdin",
+            ],
+            input=text.encode("utf-8"),
+            capture_output=True,
+            check=True,
+        )
+        return result.stdout
+
+
+class StubBackend(SpeechBackend):
+    """Quiet tone whose length follows the word count; no speech engine needed."""
+
+    def synthesize(self, text: str) -> bytes:
+        frames = int(STUB_SAMPLE_RATE * STUB_SECONDS_PER_WORD * max(1, len(text.split())))
+        amplitude = int(3000 * self.settings.volume)
+        samples = (int(amplitude * math.sin(2 * math.pi * 440 * i / STUB_SAMPLE_RATE)) for i in range(frames))
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(STUB_SAMPLE_RATE)
+            wav.writeframes(struct.pack(f"<{frames}h", *samples))
+        return buffer.getvalue()
+
+
+BACKENDS = {"pyttsx3": Pyttsx3Backend, "espeak": EspeakBackend, "stub": StubBackend}
+
+# Engines of the current worker process, one per voice
+_process_backends: Dict[VoiceSettings, SpeechBackend] = {}
+
+
+def load_backend(settings: VoiceSettings) -> SpeechBackend:
+    """
+    Returns this process's engine for a voice, starting it on first use.
+
+    Args:
+        settings (VoiceSettings): Voice to use.
+
+    Returns:
+        SpeechBackend: The engine.
+    """
+    backend = _process_backends.get(settings)
+    if backend is None:
+        if settings.backend not in BACKENDS:
+            raise ValueError(f"Unknown TTS backend: {settings.backend}")
+        backend = _process_backends[settings] = BACKENDS[settings.backend](settings)
+    return backend
+
+
+def warm_up_worker(settings: VoiceSettings) -> None:
+    """Starts the engine of a voice in a worker process ahead of the first segment."""
+    load_backend(settings)
+
+
+def synthesize_segment(settings: VoiceSettings, text: str) -> bytes:
+    """
+    Synthesizes one segment with this process's engine. Runs in a worker process.
+
+    Args:
+        settings (VoiceSettings): Voice to use.
+        text (str): Segment text.
+
+    Returns:
+        bytes: WAV file contents.
+    """
+    return load_backend(settings).synthesize(text)
+
+
+class SpeechPipeline:
+    """
+    Synthesizes segments on a process pool for reading sessions to stream.
+
+    The pool is created on first use so importing this module stays cheap.
+    With an audio cache, rendered segments are stored and can be read back.
+
+    Args:
+        settings (VoiceSettings): Default voice.
+        max_workers (int): Synthesis processes.
+        cache (Optional[AudioCache]): Cache of synthesized segments.
+    """
+
+    def __init__(
+        self,
+        settings: VoiceSettings,
+        max_workers: int = 2,
+        cache: Optional["AudioCache"] = None,
+    ):
+        self.settings = settings
+        self.max_workers = max_workers
+        self.cache = cache
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn avoids forking a process that already runs threads and an event loop
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Speech pool started with {self.max_workers} workers")
+        return self._executor
+
+    async def warm_up(self) -> None:
+        """
+        Starts the worker processes and the default voice's engine in them,
+        so the first reader does not wait for either.
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self.executor, warm_up_worker, self.settings)
+            for _ in range(self.max_workers)
+        ))
+
+    async def cached(self, text: str, settings: Optional[VoiceSettings] = None) -> Optional[bytes]:
+        """
+        Returns a segment from the audio cache without synthesizing it.
+
+        Args:
+            text (str): Segment text.
+            settings (Optional[VoiceSettings]): Voice; the default when None.
+
+        Returns:
+            Optional[bytes]: WAV file contents, or None when not cached.
+        """
+        if self.cache is None:
+            return None
+        return await executors.run_io(self.cache.get, settings or self.settings, text)
+
+    async def render(self, text: str, settings: Optional[VoiceSettings] = None) -> bytes:
+        """
+        Synthesizes one segment on the pool and stores it in the audio
+        cache, without looking the segment up first.
+
+        Args:
+            text (str): Segment text.
+            settings (Optional[VoiceSettings]): Voice; the default when None.
+
+        Returns:
+            bytes: WAV file contents.
+        """
+        settings = settings or self.settings
+        loop = asyncio.get_running_loop()
+        with span("tts.synthesize", chars=len(text)) as timing:
+            data = await loop.run_in_executor(self.executor, synthesize_segment, settings, text)
+        SYNTHESIS_SECONDS.observe(timing.duration)
+        audio_seconds = wav_duration(data)
+        if audio_seconds > 0:
+            SYNTHESIZED_AUDIO_SECONDS.inc(audio_seconds)
+            SYNTHESIS_REAL_TIME_FACTOR.observe(timing.duration / audio_seconds)
+        if self.cache is not None:
+            await executors.run_io(self.cache.put, settings, text, data)
+        return data
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,407 @@
+# app/services/storage.py
+
+"""
+Storage Lifecycle
+-----------------
+Deleting documents and collecting the storage they leave behind. The
+documents stored as a blob are its references; deleting one drops a
+reference, and the blob (the PDF and every file derived from it) is freed
+together with what other services keep about it once the last one is gone.
+
+A background compactor enforces the retention period and the storage quota,
+evicting the least recently read blobs first, and sweeps up orphans: blob
+files no document refers to, abandoned temporary files, stale resumable
+uploads and expired shared state entries. It works through small batches
+on the I/O threads and takes no locks. Freeing a blob moves its files
+aside, counts the references again and puts the files back if an upload
+reused the blob in the meantime.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.blob_store import BlobStore
+from app.services.document_store import DocumentStore
+from app.services.execution import Executors
+from app.services.metrics import registry
+from app.services.shared_state import StateBackend
+from app.services.upload_sessions import UploadSessionStore
+
+logger = logging.getLogger(__name__)
+
+# Documents or blobs handled per compaction step, and the pause between steps in seconds
+BATCH_SIZE = 20
+BATCH_PAUSE = 0.05
+
+# Files younger than this are never collected as orphans, in seconds: an upload or
+# ingestion may still be writing them
+ORPHAN_GRACE = 3600
+
+# Resumable uploads that have not received a chunk for this long are discarded, in seconds
+STALE_UPLOAD_AGE = 24 * 3600
+
+# Shared state keys: one worker compacts per interval, and the last report is shared
+CLAIM_KEY = "storage:compaction"
+REPORT_KEY = "storage:last_compaction"
+
+# Longest a pass started on request holds the claim, in seconds, should its worker die mid-pass
+REQUEST_CLAIM_TTL = 600
+
+DOCUMENTS_DELETED = registry.counter("documents_deleted_total", "Documents deleted, by reason", ["reason"])
+BLOBS_FREED = registry.counter("blobs_freed_total", "Blobs freed after their last document was deleted")
+BYTES_FREED = registry.counter("storage_freed_bytes_total", "Bytes freed from the blob store")
+
+
+def is_temporary(name: str) -> bool:
+    """Upload and atomic-write temporaries in the blob directory."""
+    return name.startswith(".") or name.endswith(".tmp")
+
+
+class StorageCompactor:
+    """
+    Frees unreferenced blobs and enforces retention and the storage quota.
+
+    Args:
+        blob_store (BlobStore): Where blobs live.
+        document_store (DocumentStore): Documents, the references onto blobs.
+        upload_sessions (UploadSessionStore): Resumable uploads, discarded when stale.
+        executors (Executors): Pools of the API process; compaction runs on its I/O threads.
+        state (StateBackend): Shared state, so one worker compacts per interval.
+        retention_days (float): Days a document is kept after it was last read (0 keeps it).
+        quota (int): Bytes the blob store may take (0 for no limit).
+        interval (float): Seconds between background passes (0 disables them).
+    """
+
+    def __init__(
+        self,
+        blob_store: BlobStore,
+        document_store: DocumentStore,
+        upload_sessions: UploadSessionStore,
+        executors: Executors,
+        state: StateBackend,
+        retention_days: float = 0,
+        quota: int = 0,
+        interval: float = 300,
+    ):
+        self.blob_store = blob_store
+        self.document_store = document_store
+        self.upload_sessions = upload_sessions
+        self.executors = executors
+        self.state = state
+        self.retention_days = retention_days
+        self.quota = quota
+        self.interval = interval
+        self.trash_dir = blob_store.root / ".trash"
+        self.running = False
+        self._cleanups: Dict[str, Callable[[str], object]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def on_release(self, name: str, cleanup: Callable[[str], object]) -> None:
+        """
+        Registers what to drop when a blob is freed, e.g. its cached index.
+
+        Args:
+            name (str): Name used in log messages.
+            cleanup (Callable[[str], object]): Called with the blob's content
+                hash on an I/O thread.
+        """
+        self._cleanups[name] = cleanup
+
+    # Freeing blobs
+
+    def release(self, digest: str) -> int:
+        """
+        Frees a blob if no document refers to it any more.
+
+        Args:
+            digest (str): Blob content hash.
+
+        Returns:
+            int: Bytes freed; 0 while the blob is still referenced.
+        """
+        if self.document_store.reference_count(digest):
+            return 0
+
+        # Move the files aside before counting again: an upload that referenced the
+        # blob in between gets them back, a later one writes the blob anew
+        trash = self.trash_dir / f"{digest}-{uuid.uuid4().hex[:8]}"
+        trash.mkdir(parents=True, exist_ok=True)
+        moved: List[Path] = []
+        for path in self.blob_store.files(digest):
+            try:
+                os.replace(path, trash / path.name)
+                moved.append(path)
+            except FileNotFoundError:
+                continue
+
+        if self.document_store.reference_count(digest):
+            for path in moved:
+                if not path.exists():
+                    os.replace(trash / path.name, path)
+            shutil.rmtree(trash, ignore_errors=True)
+            return 0
+
+        freed = sum(path.stat().st_size for path in trash.iterdir())
+        shutil.rmtree(trash, ignore_errors=True)
+        self.document_store.delete_pages(digest)
+        for name, cleanup in self._cleanups.items():
+            try:
+                cleanup(digest)
+            except Exception as e:
+                logger.warning(f"Releasing {digest[:12]}: {name} cleanup failed: {e}")
+
+        BLOBS_FREED.inc()
+        BYTES_FREED.inc(freed)
+        logger.info(f"Freed blob {digest[:12]} ({freed} bytes, {len(moved)} files)")
+        return freed
+
+    def delete_document(self, file_id: str, reason: str = "deleted", accessed_before: Optional[float] = None) -> Optional[Dict]:
+        """
+        Deletes a document and frees its blob if that was the last reference.
+
+        Args:
+            file_id (str): Public document id.
+            reason (str): Why, for the deletion counter.
+            accessed_before (Optional[float]): Only if it was not read since
+                this Unix time.
+
+        Returns:
+            Optional[Dict]: ``references`` left on the blob and ``bytes_freed``,
+            or None if nothing was deleted.
+        """
+        document = self.document_store.get_document(file_id)
+        if document is None or not self.document_store.delete_document(file_id, accessed_before):
+            return None
+        DOCUMENTS_DELETED.labels(reason).inc()
+        digest = document["content_hash"]
+        freed = self.release(digest)
+        return {"references": self.document_store.reference_count(digest), "bytes_freed": freed}
+
+    # Usage
+
+    def blob_size(self, digest: str) -> int:
+        """Bytes taken by a blob and its derived files."""
+        size = 0
+        for path in self.blob_store.files(digest):
+            try:
+                size += path.stat().st_size
+            except FileNotFoundError:
+                continue
+        return size
+
+    def scan(self) -> Tuple[Dict[str, int], Dict[str, float], List[Path]]:
+        """
+        Walks the blob directory once.
+
+        Returns:
+            Tuple[Dict[str, int], Dict[str, float], List[Path]]: Bytes and the
+            newest modification time by content hash, and temporary files
+            older than the orphan grace period.
+        """
+        sizes: Dict[str, int] = {}
+        modified: Dict[str, float] = {}
+        stale: List[Path] = []
+        cutoff = time.time() - ORPHAN_GRACE
+        for entry in self.blob_store.scan():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if not entry.is_file():
+                continue
+            if is_temporary(entry.name):
+                if stat.st_mtime < cutoff:
+                    stale.append(Path(entry.path))
+                continue
+            digest = entry.name.split(".", 1)[0]
+            sizes[digest] = sizes.get(digest, 0) + stat.st_size
+            modified[digest] = max(modified.get(digest, 0.0), stat.st_mtime)
+        return sizes, modified, stale
+
+    def usage(self) -> Dict:
+        """Bytes and number of blobs in the blob store."""
+        sizes, _, _ = self.scan()
+        return {"bytes": sum(sizes.values()), "blobs": len(sizes)}
+
+    # Compaction steps, each a short batch
+
+    def expire_batch(self, accessed_before: float) -> Tuple[int, int]:
+        """
+        Deletes documents not read since a point in time.
+
+        Returns:
+            Tuple[int, int]: Documents deleted and bytes freed.
+        """
+        deleted = freed = 0
+        for document in self.document_store.list_idle(accessed_before, BATCH_SIZE):
+            result = self.delete_document(document["file_id"], "retention", accessed_before)
+            if result is not None:
+                deleted += 1
+                freed += result["bytes_freed"]
+        return deleted, freed
+
+    def evict_batch(self, excess: int) -> Tuple[int, int, int]:
+        """
+        Deletes the documents of the least recently read blobs until about
+        ``excess`` bytes are freed.
+
+        Returns:
+            Tuple[int, int, int]: Blobs freed, documents deleted and bytes freed.
+        """
+        blobs = deleted = freed = 0
+        for digest, last_read in self.document_store.least_recently_read_blobs(BATCH_SIZE):
+            if freed >= excess:
+                break
+            removed = self.document_store.delete_blob_documents(digest, last_read)
+            DOCUMENTS_DELETED.labels("quota").inc(removed)
+            deleted += removed
+            released = self.release(digest)
+            if released:
+                blobs += 1
+                freed += released
+        return blobs, deleted, freed
+
+    def unreferenced(self, digests: List[str]) -> List[str]:
+        """The blobs among ``digests`` no document refers to."""
+        referenced = set()
+        for start in range(0, len(digests), 500):
+            referenced |= self.document_store.referenced_hashes(digests[start:start + 500])
+        return [digest for digest in digests if digest not in referenced]
+
+    def remove_files(self, paths: List[Path]) -> int:
+        """Deletes abandoned temporary files, returning the bytes freed."""
+        freed = 0
+        for path in paths:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                freed += size
+            except FileNotFoundError:
+                continue
+        # Leftovers of a release cut short by a crash
+        if self.trash_dir.exists():
+            cutoff = time.time() - ORPHAN_GRACE
+            for entry in self.trash_dir.iterdir():
+                if entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry, ignore_errors=True)
+        return freed
+
+    # Background passes
+
+    async def compact(self) -> Dict:
+        """
+        Runs one compaction pass: retention, quota, orphans, stale uploads.
+
+        Returns:
+            Dict: What the pass removed; also kept as the last report.
+        """
+        run = self.executors.run_io
+        started = time.perf_counter()
+        report = {
+            "started_at": time.time(),
+            "documents_expired": 0,
+            "documents_evicted": 0,
+            "blobs_evicted": 0,
+            "orphans_freed": 0,
+            "temp_files_removed": 0,
+            "uploads_expired": 0,
+            "state_entries_purged": 0,
+            "bytes_freed": 0,
+        }
+        self.running = True
+        try:
+            if self.retention_days > 0:
+                cutoff = time.time() - self.retention_days * 86400
+                while True:
+                    deleted, freed = await run(self.expire_batch, cutoff)
+                    report["documents_expired"] += deleted
+                    report["bytes_freed"] += freed
+                    if not deleted:
+                        break
+                    await asyncio.sleep(BATCH_PAUSE)
+
+            sizes, modified, stale = await run(self.scan)
+            usage = sum(sizes.values())
+            while self.quota > 0 and usage > self.quota:
+                blobs, deleted, freed = await run(self.evict_batch, usage - self.quota)
+                report["blobs_evicted"] += blobs
+                report["documents_evicted"] += deleted
+                report["bytes_freed"] += freed
+                usage -= freed
+                if not deleted:
+                    break
+                await asyncio.sleep(BATCH_PAUSE)
+
+            cutoff = time.time() - ORPHAN_GRACE
+            candidates = [digest for digest, mtime in modified.items() if mtime < cutoff]
+            orphans = await run(self.unreferenced, candidates)
+            for digest in orphans:
+                freed = await run(self.release, digest)
+                report["orphans_freed"] += 1 if freed else 0
+                report["bytes_freed"] += freed
+
+            report["temp_files_removed"] = len(stale)
+            report["bytes_freed"] += await run(self.remove_files, stale)
+            report["uploads_expired"] = await run(self.upload_sessions.expire, STALE_UPLOAD_AGE)
+            report["state_entries_purged"] = await run(self.state.purge_expired)
+        finally:
+            self.running = False
+
+        report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        await run(self.state.set, REPORT_KEY, report)
+        if report["bytes_freed"]:
+            logger.info(f"Storage compaction freed {report['bytes_freed']} bytes: {report}")
+        return report
+
+    async def compact_now(self) -> Optional[Dict]:
+        """
+        Runs a pass on request, under the same claim as the background passes
+        so no two workers compact at once.
+
+        Returns:
+            Optional[Dict]: The pass's report, or None when another pass holds
+            the claim.
+        """
+        run = self.executors.run_io
+        if self.running or not await run(self.state.claim, CLAIM_KEY, {"pid": os.getpid()}, REQUEST_CLAIM_TTL):
+            return None
+        try:
+            return await self.compact()
+        finally:
+            await run(self.state.delete, CLAIM_KEY)
+
+    def last_report(self) -> Optional[Dict]:
+        """Report of the latest pass by any worker."""
+        return self.state.get(REPORT_KEY)
+
+    def start(self) -> None:
+        """Runs a pass every ``interval`` seconds in the background, unless disabled."""
+        if self.interval > 0 and self._task is None:
+            # Passes outlive the request or startup step that starts them; an empty context keeps traces out
+            self._task = contextvars.Context().run(asyncio.create_task, self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # One worker per interval; the claim lapses before the next one
+                claimed = await self.executors.run_io(self.state.claim, CLAIM_KEY, {"pid": os.getpid()}, self.interval / 2)
+                if claimed and not self.running:
+                    await self.compact()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Storage compaction failed: {e}")
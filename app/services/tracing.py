@@ -0,0 +1,186 @@
+# app/services/tracing.py
+
+"""
+Request Tracing
+---------------
+Opt-in spans of one request, to see where its time went. A trace is
+started per request (on ``X-Trace: 1`` or for a sampled fraction) and kept
+in a context variable; :func:`span` blocks in the hot paths then record
+their name, parent, start offset and duration into it. Context variables
+follow the request into ``executors.run_io`` threads, so blocking work is
+traced as well; work on the process pools is timed from the calling side.
+
+Finished traces are kept in a bounded in-memory buffer and served as JSON.
+Without an active trace, :func:`span` only measures its duration.
+"""
+
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from app.api.core.config import TRACE_BUFFER, TRACE_SAMPLE_RATE
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: int
+    parent_id: Optional[int]
+    start: float
+    duration: float = 0.0
+    attributes: Dict = field(default_factory=dict)
+
+
+class Trace:
+    """
+    Spans of one request.
+
+    Args:
+        name (str): What was traced, e.g. ``POST /api/chat``.
+    """
+
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attributes: Dict = {}
+        self.spans: List[Span] = []
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def new_span(self, name: str, parent_id: Optional[int], attributes: Dict) -> Span:
+        with self._lock:
+            self._next_id += 1
+            span = Span(name, self._next_id, parent_id, time.perf_counter(), attributes=attributes)
+            self.spans.append(span)
+        return span
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.start
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "spans": [
+                {
+                    "name": span.name,
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "start_ms": round((span.start - self.start) * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3),
+                    "attributes": span.attributes,
+                }
+                for span in sorted(self.spans, key=lambda span: span.start)
+            ],
+        }
+
+
+# Trace of the request being handled and the innermost open span in it
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """
+    Times a block, recording it in the current trace if there is one.
+
+    Args:
+        name (str): Span name, e.g. ``chat.retrieval``.
+        **attributes: Extra details stored with the span.
+
+    Yields:
+        Span: Its ``duration`` (seconds) is set when the block exits, and
+        ``attributes`` may be added to inside the block.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        current = Span(name, 0, None, time.perf_counter(), attributes=attributes)
+        try:
+            yield current
+        finally:
+            current.duration = time.perf_counter() - current.start
+        return
+
+    current = trace.new_span(name, _current_span.get(), attributes)
+    token = _current_span.set(current.span_id)
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _current_span.reset(token)
+
+
+class TraceStore:
+    """
+    Starts request traces and keeps the most recent finished ones.
+
+    Args:
+        capacity (int): Finished traces kept.
+        sample_rate (float): Fraction of requests traced without being asked to.
+    """
+
+    def __init__(self, capacity: int = 200, sample_rate: float = 0.0):
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def should_trace(self, requested: bool) -> bool:
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def trace(self, name: str) -> Iterator[Trace]:
+        """Makes a new trace current for the block and stores it afterwards."""
+        trace = Trace(name)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(None)
+        try:
+            yield trace
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            trace.finish()
+            with self._lock:
+                self._traces[trace.trace_id] = trace
+                while len(self._traces) > self.capacity:
+                    self._traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> Optional[Dict]:
+        trace = self._traces.get(trace_id)
+        return trace.to_dict() if trace is not None else None
+
+    def recent(self, limit: int = 20) -> List[Dict]:
+        """Summaries of the latest traces, newest first."""
+        with self._lock:
+            traces = list(self._traces.values())[-limit:]
+        return [
+            {
+                "trace_id": trace.trace_id,
+                "name": trace.name,
+                "started_at": trace.started_at,
+                "duration_ms": round(trace.duration * 1000, 3),
+                "spans": len(trace.spans),
+            }
+            for trace in reversed(traces)
+        ]
+
+
+# Recent traces of the API process
+trace_store = TraceStore(TRACE_BUFFER, TRACE_SAMPLE_RATE)
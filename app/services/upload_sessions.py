@@ -0,0 +1,205 @@
+# app/services/upload_sessions.py
+
+"""
+Upload Sessions
+---------------
+Chunked, non-blocking upload writes and resumable (offset-based) upload
+sessions. Request bodies are copied to disk in fixed-size chunks through
+worker threads, and size limits are enforced on the bytes actually received
+rather than on client-declared sizes.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+import anyio
+
+from app.services.execution import executors
+from app.services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_BYTES_IN_FLIGHT = registry.gauge("upload_bytes_in_flight", "Bytes received so far by uploads still being received")
+UPLOAD_BYTES = registry.counter("upload_bytes_total", "Upload bytes received")
+
+
+class UploadTooLargeError(Exception):
+    """Raised when more bytes arrive than the configured limit allows."""
+
+
+class OffsetMismatchError(Exception):
+    """Raised when a resumable chunk does not start at the current offset."""
+
+    def __init__(self, expected: int):
+        super().__init__(f"Chunk must start at offset {expected}")
+        self.expected = expected
+
+
+async def write_stream(chunks: AsyncIterator[bytes], path: Path, limit: int, already_written: int = 0, hasher=None) -> int:
+    """
+    Appends an async byte stream to a file without blocking the event loop.
+
+    Args:
+        chunks (AsyncIterator[bytes]): Incoming body chunks.
+        path (Path): File to append to (created if missing).
+        limit (int): Maximum total file size in bytes.
+        already_written (int): Bytes already in the file.
+        hasher: Optional hashlib object updated with every chunk.
+
+    Returns:
+        int: Total file size after writing.
+
+    Raises:
+        UploadTooLargeError: As soon as the limit is exceeded; the bytes
+            written so far are left for the caller to clean up.
+    """
+    size = already_written
+    received = 0
+    try:
+        async with await anyio.open_file(path, "ab") as f:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                received += len(chunk)
+                UPLOAD_BYTES.inc(len(chunk))
+                UPLOAD_BYTES_IN_FLIGHT.inc(len(chunk))
+                if size > limit:
+                    raise UploadTooLargeError(f"Upload exceeds {limit} bytes")
+                if hasher is not None:
+                    hasher.update(chunk)
+                await f.write(chunk)
+    finally:
+        UPLOAD_BYTES_IN_FLIGHT.dec(received)
+    return size
+
+
+class UploadSessionStore:
+    """
+    Resumable uploads kept as ``<dir>/<upload_id>.part`` plus a JSON sidecar.
+
+    The current offset is the size of the part file, so a client that lost
+    its connection asks for the offset and continues from there.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def part_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.part"
+
+    def meta_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.json"
+
+    def create(self, filename: str, size: Optional[int] = None) -> Dict:
+        """
+        Starts a new resumable upload.
+
+        Args:
+            filename (str): Original file name.
+            size (Optional[int]): Total size announced by the client.
+
+        Returns:
+            Dict: Session metadata including ``upload_id`` and ``offset``.
+
+        Raises:
+            UploadTooLargeError: If the announced size exceeds the limit.
+        """
+        if size is not None and size > self.max_size:
+            raise UploadTooLargeError(f"Upload exceeds {self.max_size} bytes")
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        upload_id = uuid.uuid4().hex
+        meta = {"upload_id": upload_id, "filename": filename, "size": size, "created_at": time.time()}
+        with open(self.meta_path(upload_id), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        self.part_path(upload_id).touch()
+        return {**meta, "offset": 0}
+
+    def get(self, upload_id: str) -> Optional[Dict]:
+        """
+        Returns session metadata with the current offset, or None if unknown.
+
+        Args:
+            upload_id (str): Session id.
+        """
+        meta_path = self.meta_path(upload_id)
+        if not meta_path.exists():
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        meta["offset"] = self.part_path(upload_id).stat().st_size
+        return meta
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> int:
+        """
+        Appends a chunk that must start exactly at the current offset.
+
+        Args:
+            upload_id (str): Session id.
+            offset (int): Offset the client believes it is writing at.
+            chunks (AsyncIterator[bytes]): Chunk body.
+
+        Returns:
+            int: New offset.
+
+        Raises:
+            KeyError: Unknown session.
+            OffsetMismatchError: ``offset`` is not the current size.
+            UploadTooLargeError: The session would exceed its size limit.
+        """
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        async with lock:
+            meta = self.get(upload_id)
+            if meta is None:
+                raise KeyError(upload_id)
+            if offset != meta["offset"]:
+                raise OffsetMismatchError(meta["offset"])
+
+            limit = min(self.max_size, meta["size"]) if meta["size"] else self.max_size
+            part_path = self.part_path(upload_id)
+            try:
+                return await write_stream(chunks, part_path, limit, already_written=offset)
+            except BaseException:
+                # Drop the partial chunk so the client can retry from the same offset
+                await executors.run_io(os.truncate, part_path, offset)
+                raise
+
+    def discard(self, upload_id: str) -> None:
+        """Removes a session's metadata and any remaining part file."""
+        self.part_path(upload_id).unlink(missing_ok=True)
+        self.meta_path(upload_id).unlink(missing_ok=True)
+        self._locks.pop(upload_id, None)
+
+    def expire(self, max_age: float) -> int:
+        """
+        Discards sessions that have not received a chunk for a while.
+
+        Args:
+            max_age (float): Seconds since the last write.
+
+        Returns:
+            int: Sessions discarded.
+        """
+        cutoff = time.time() - max_age
+        expired = 0
+        for meta_path in self.directory.glob("*.json"):
+            upload_id = meta_path.stem
+            part_path = self.part_path(upload_id)
+            try:
+                last_write = part_path.stat().st_mtime if part_path.exists() else meta_path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            lock = self._locks.get(upload_id)
+            if last_write < cutoff and not (lock is not None and lock.locked()):
+                self.discard(upload_id)
+                expired += 1
+        return expired
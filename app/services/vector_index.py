@@ -0,0 +1,279 @@
+# app/services/vector_index.py
+
+"""
+Vector Index Service
+--------------------
+Per-document dense retrieval. Pages are split into chunks of whole sentences
+that remember their page (see the chunking module), embedded once at ingestion and saved next to the
+blob as a matrix of unit vectors (float16 or int8 to cut memory) plus chunk
+metadata. Matrices are memory-mapped on load and the most recently used
+indexes stay open, so a query costs one embedding and one matrix-vector
+product, and a restart never re-embeds.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.services.blob_store import BlobStore
+from app.services.chunking import Chunk, DocumentStructure
+from app.services.embeddings import EmbeddingService
+from app.services.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per step, bounding the float32 copy of a quantized matrix
+SEARCH_BLOCK_ROWS = 8192
+
+# Query-by-chunk scores held at once when searching a batch of queries
+QUERY_BLOCK_CELLS = 4 * 1024 * 1024
+
+# int8 storage maps [-1, 1] onto [-127, 127]
+INT8_SCALE = 127.0
+
+VECTOR_INDEX_VERSION = 1
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, float]:
+    """
+    Converts unit vectors to their storage type.
+
+    Args:
+        vectors (np.ndarray): float32 unit vectors.
+        dtype (str): ``float32``, ``float16`` or ``int8``.
+
+    Returns:
+        Tuple[np.ndarray, float]: Stored matrix and the factor that turns its
+        dot products back into cosine scores.
+    """
+    if dtype == "int8":
+        return np.round(vectors * INT8_SCALE).astype(np.int8), 1.0 / INT8_SCALE
+    if dtype in ("float16", "float32"):
+        return vectors.astype(dtype), 1.0
+    raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+
+class VectorIndex:
+    """
+    Exact inner-product search over unit-length chunk embeddings.
+
+    Args:
+        vectors (np.ndarray): ``(chunks, dimension)`` matrix, possibly memory-mapped.
+        chunks (List[Chunk]): Chunk for each row.
+        scale (float): Factor turning row dot products into cosine scores.
+    """
+
+    def __init__(self, vectors: np.ndarray, chunks: List[Chunk], scale: float = 1.0):
+        self.vectors = vectors
+        self.chunks = chunks
+        self.scale = scale
+
+    def search(self, query: np.ndarray, limit: int = 3) -> List[Tuple[int, float]]:
+        """
+        Finds the chunks closest to a query vector by cosine similarity.
+
+        Args:
+            query (np.ndarray): Unit-length query embedding.
+            limit (int): Maximum number of results.
+
+        Returns:
+            List[Tuple[int, float]]: ``(chunk_id, score)`` pairs, best first.
+        """
+        if not self.chunks or limit <= 0:
+            return []
+        query = query.astype(np.float32, copy=False)
+        scores = np.empty(len(self.chunks), dtype=np.float32)
+        for start in range(0, len(scores), SEARCH_BLOCK_ROWS):
+            block = self.vectors[start:start + SEARCH_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+        scores *= self.scale
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(chunk_id), float(scores[chunk_id])) for chunk_id in top]
+
+    def search_many(self, queries: np.ndarray, limit: int = 3) -> List[List[Tuple[int, float]]]:
+        """
+        Finds the closest chunks for several query vectors, with one
+        matrix-matrix product per block of queries and rows.
+
+        Args:
+            queries (np.ndarray): ``(questions, dimension)`` unit-length embeddings.
+            limit (int): Maximum number of results per query.
+
+        Returns:
+            List[List[Tuple[int, float]]]: ``(chunk_id, score)`` pairs, best
+            first, for each query in order.
+        """
+        if not self.chunks or limit <= 0:
+            return [[] for _ in range(len(queries))]
+        queries = queries.astype(np.float32, copy=False)
+        count = len(self.chunks)
+        limit = min(limit, count)
+        results = []
+        for first in range(0, len(queries), max(1, QUERY_BLOCK_CELLS // count)):
+            block_queries = queries[first:first + max(1, QUERY_BLOCK_CELLS // count)]
+            scores = np.empty((len(block_queries), count), dtype=np.float32)
+            for start in range(0, count, SEARCH_BLOCK_ROWS):
+                block = self.vectors[start:start + SEARCH_BLOCK_ROWS]
+                scores[:, start:start + len(block)] = block_queries @ block.astype(np.float32, copy=False).T
+            scores *= self.scale
+            top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+            for row, candidates in enumerate(top):
+                candidates = candidates[np.argsort(-scores[row, candidates])]
+                results.append([(int(chunk_id), float(scores[row, chunk_id])) for chunk_id in candidates])
+        return results
+
+    def save(self, vectors_path: Path, chunks_path: Path) -> None:
+        """
+        Writes the matrix (``.npy``) and chunk metadata (JSON) atomically.
+
+        Args:
+            vectors_path (Path): Destination of the embedding matrix.
+            chunks_path (Path): Destination of the chunk list.
+        """
+        vectors_path, chunks_path = Path(vectors_path), Path(chunks_path)
+        tmp_vectors = vectors_path.with_suffix(vectors_path.suffix + ".tmp")
+        tmp_chunks = chunks_path.with_suffix(chunks_path.suffix + ".tmp")
+
+        with open(tmp_vectors, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors))
+        with open(tmp_chunks, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": VECTOR_INDEX_VERSION,
+                    "scale": self.scale,
+                    "texts": [chunk.text for chunk in self.chunks],
+                    "pages": [chunk.page for chunk in self.chunks],
+                },
+                f,
+                separators=(",", ":"),
+            )
+        # Chunks last: their presence marks a complete index
+        os.replace(tmp_vectors, vectors_path)
+        os.replace(tmp_chunks, chunks_path)
+
+    @classmethod
+    def load(cls, vectors_path: Path, chunks_path: Path) -> "VectorIndex":
+        """
+        Opens an index written by :meth:`save`, memory-mapping the matrix.
+
+        Args:
+            vectors_path (Path): Embedding matrix file.
+            chunks_path (Path): Chunk list file.
+
+        Returns:
+            VectorIndex: The loaded index.
+
+        Raises:
+            ValueError: If the files were written by an incompatible version.
+        """
+        with open(chunks_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != VECTOR_INDEX_VERSION:
+            raise ValueError(f"Unsupported vector index version: {data.get('version')}")
+
+        chunks = [Chunk(text, page) for text, page in zip(data["texts"], data["pages"])]
+        vectors = np.load(vectors_path, mmap_mode="r")
+        return cls(vectors, chunks, data.get("scale", 1.0))
+
+
+class VectorIndexStore:
+    """
+    Builds, persists and caches vector indexes by blob content hash.
+
+    Args:
+        blob_store (BlobStore): Where index files are kept.
+        embeddings (EmbeddingService): Cached, batched embeddings for chunks and queries.
+        cache_size (int): Indexes kept open at once.
+        dtype (str): Storage type of new indexes (see :func:`quantize`).
+    """
+
+    def __init__(self, blob_store: BlobStore, embeddings: EmbeddingService, cache_size: int, dtype: str = "float16"):
+        self.blob_store = blob_store
+        self.embeddings = embeddings
+        self.cache = LRUCache(cache_size)
+        self.dtype = dtype
+
+    def has_index(self, digest: str) -> bool:
+        return self.blob_store.chunks_path(digest).exists()
+
+    def build(self, digest: str, pages: List[str], structure: Optional[DocumentStructure] = None) -> VectorIndex:
+        """
+        Chunks and embeds a document, then saves and caches its index.
+
+        Args:
+            digest (str): Blob content hash.
+            pages (List[str]): Page texts in page order.
+            structure (Optional[DocumentStructure]): Sentences and sections
+                from ingestion; split from the page texts when None.
+
+        Returns:
+            VectorIndex: The new index.
+        """
+        chunks = (structure or DocumentStructure.from_text(pages)).chunks(pages)
+        vectors, scale = quantize(self.embeddings.embed([chunk.text for chunk in chunks]), self.dtype)
+        index = VectorIndex(vectors, chunks, scale)
+        index.save(self.blob_store.vectors_path(digest), self.blob_store.chunks_path(digest))
+        self.cache.put(digest, index)
+        logger.info(f"Vector index for {digest[:12]}: {len(chunks)} chunks")
+        return index
+
+    def get(self, digest: str) -> Optional[VectorIndex]:
+        """Open index of a blob, or None if it has not been built."""
+        index = self.cache.get(digest)
+        if index is None:
+            if not self.has_index(digest):
+                return None
+            index = VectorIndex.load(self.blob_store.vectors_path(digest), self.blob_store.chunks_path(digest))
+            self.cache.put(digest, index)
+        return index
+
+    def search(self, digest: str, question: str, limit: int = 3) -> List[Tuple[Chunk, float]]:
+        """
+        Retrieves the chunks of a document most similar to a question.
+
+        Args:
+            digest (str): Blob content hash.
+            question (str): User question.
+            limit (int): Maximum number of chunks.
+
+        Returns:
+            List[Tuple[Chunk, float]]: Chunks with cosine scores, best first;
+            empty if the document has no vector index.
+        """
+        index = self.get(digest)
+        if index is None:
+            return []
+        query = self.embeddings.embed_query(question)
+        return [(index.chunks[chunk_id], score) for chunk_id, score in index.search(query, limit)]
+
+    def search_many(self, digest: str, questions: List[str], limit: int = 3) -> List[List[Tuple[Chunk, float]]]:
+        """
+        Retrieves the closest chunks for several questions, embedding them
+        in one model call.
+
+        Args:
+            digest (str): Blob content hash.
+            questions (List[str]): User questions.
+            limit (int): Maximum number of chunks per question.
+
+        Returns:
+            List[List[Tuple[Chunk, float]]]: Chunks with cosine scores, best
+            first, for each question in order; all empty if the document has
+            no vector index.
+        """
+        index = self.get(digest)
+        if index is None or not questions:
+            return [[] for _ in questions]
+        queries = self.embeddings.embed_queries(questions)
+        return [
+            [(index.chunks[chunk_id], score) for chunk_id, score in hits]
+            for hits in index.search_many(queries, limit)
+        ]
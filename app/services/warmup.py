@@ -0,0 +1,89 @@
+# app/services/warmup.py
+
+"""
+Warm-up and Readiness
+---------------------
+Heavy subsystems (worker pools, speech engines, the embedding model) start
+on first use, so the API comes up in the time it takes to import it. After
+startup the same subsystems can be started in the background, in stages,
+so the first real request does not pay for them either.
+
+The API is *healthy* as soon as it answers; it is *ready* once startup and
+the warm-up stages have finished. A stage that fails leaves its subsystem
+to start on first use as before, it does not keep the API unready.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUp:
+    """
+    Named warm-up stages, run concurrently in the background, and the
+    readiness they add up to.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Callable[[], Awaitable]] = {}
+        self.status: Dict[str, Dict] = {}
+        self.started = False
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, name: str, stage: Callable[[], Awaitable]) -> None:
+        """
+        Registers a stage.
+
+        Args:
+            name (str): Stage name, as reported by :meth:`report`.
+            stage (Callable[[], Awaitable]): Starts the subsystem.
+        """
+        self._stages[name] = stage
+        self.status[name] = {"state": "pending"}
+
+    def start(self, background: bool = True) -> None:
+        """
+        Marks startup as finished and runs the stages in the background.
+
+        Args:
+            background (bool): Run the stages; when False they are skipped and
+                their subsystems start on first use.
+        """
+        self.started = True
+        if background and self._stages:
+            self._task = asyncio.create_task(self._run())
+        else:
+            for status in self.status.values():
+                status["state"] = "skipped"
+
+    @property
+    def ready(self) -> bool:
+        return self.started and (self._task is None or self._task.done())
+
+    def report(self) -> Dict:
+        return {"ready": self.ready, "stages": self.status}
+
+    async def _run(self) -> None:
+        started = time.perf_counter()
+        await asyncio.gather(*(self._run_stage(name, stage) for name, stage in self._stages.items()))
+        logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+    async def _run_stage(self, name: str, stage: Callable[[], Awaitable]) -> None:
+        status = self.status[name]
+        status["state"] = "running"
+        started = time.perf_counter()
+        try:
+            await stage()
+            status["state"] = "done"
+        except Exception as e:
+            logger.warning(f"Warm-up of {name} failed, it starts on first use instead: {e}")
+            status["state"] = "failed"
+            status["error"] = str(e)
+        status["seconds"] = round(time.perf_counter() - started, 3)
+
+    def cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
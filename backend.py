@@ -1,24 +1,56 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+import argparse
+import gc
 import uvicorn
 import os
 import logging
 
+from app.api.core.config import UPLOAD_DIR, WARM_UP, WEB_CONCURRENCY
+from app.api.core.db import init_db
+from app.api.middleware import InstrumentationMiddleware
+from app.services.execution import EndpointTimeoutError, OverloadedError, executors
+from app.services.metrics import registry
+from app.services.ocr import ocr_engine
+from app.services.profiling import profiler
+from app.services.tracing import trace_store
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create uploads directory if it doesn't exist
-os.makedirs("uploads", exist_ok=True)
+os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("PDF Reader API Server starting up...")
+    await executors.run_io(init_db)
+    # Adopt legacy uploads and resume ingestion cut off by the last shutdown
+    await endpoints.recover_documents()
+    # Everything loaded so far lives as long as the process; keeping it out of
+    # the collector's reach makes full collections scan only request garbage
+    gc.freeze()
+    # Serve right away; worker pools and models start in the background (see /api/ready)
+    endpoints.warm_up.start(background=WARM_UP)
+    # Retention, quota and orphan collection in small background passes
+    endpoints.storage.start()
     yield
     # Shutdown
     logger.info("PDF Reader API Server shutting down...")
+    endpoints.warm_up.cancel()
+    profiler.stop()
+    await endpoints.storage.stop()
+    await endpoints.ingestion_queue.stop()
+    executors.shutdown()
+    ocr_engine.shutdown()
+    endpoints.library_index.shutdown()
+    for task in list(endpoints.prewarm_tasks):
+        task.cancel()
+    endpoints.speech_pipeline.shutdown()
 
 # Create FastAPI app with modern lifespan
 app = FastAPI(
@@ -35,8 +67,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
+# Latency per route, opt-in request traces and the runtime-selected profiler
+app.add_middleware(InstrumentationMiddleware, traces=trace_store, profiler=profiler)
+
+# Endpoint limits: over capacity is retryable, a handler running out of time is not
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request, exc: OverloadedError):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+@app.exception_handler(EndpointTimeoutError)
+async def endpoint_timeout_handler(request, exc: EndpointTimeoutError):
+    return JSONResponse({"detail": str(exc)}, status_code=504)
+
 # Import and include routes (create these endpoints)
 from app.api import endpoints
 app.include_router(endpoints.router, prefix="/api")
@@ -49,13 +94,30 @@ async def root():
 async def health_check():
     return {"status": "healthy", "message": "API is running"}
 
+@app.get("/metrics")
+async def metrics():
+    # Collectors read cache statistics that take locks, keep them off the event loop
+    return PlainTextResponse(await executors.run_io(registry.render), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
-    logger.info("Starting PDF Reader API Server...")
+    parser = argparse.ArgumentParser(description="Run the PDF Reader API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY,
+                        help="API worker processes; more than one disables auto-reload")
+    parser.add_argument("--reload", action="store_true", help="Auto-reload on code changes (single worker)")
+    args = parser.parse_args()
+    
+    # Workers read this to split the extraction pool between them
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    
+    logger.info(f"Starting PDF Reader API Server with {args.workers} worker(s)...")
     uvicorn.run(
         "backend:app",
-        host="127.0.0.1",
-        port=8000,
-        reload=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reload=args.reload and args.workers == 1,
         log_level="info"
     )
     logger.info("PDF Reader API Server started successfully!")
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Answers a file of questions about a PDF offline, without the API server,
+the way /api/chat/batch does with the keyword index, and reports answers
+per second.
+
+The question file has one question per line (blank lines and lines starting
+with # are skipped), or is JSON Lines with a "question" or "message" field.
+
+    python batch_qa.py book.pdf questions.txt
+    python batch_qa.py book.pdf questions.jsonl --output answers.ndjson --compare
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from app.services.answering import keyword_answer, keyword_answers
+from app.services.chunking import DocumentStructure, join_blocks
+from app.services.extraction import count_pages, extract_page_range
+from app.services.search_index import InvertedIndex
+
+# Sentences per answer, as in /api/chat
+TOP_K = 3
+
+
+def read_questions(path: Path) -> List[str]:
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.suffix in (".jsonl", ".ndjson"):
+                record = json.loads(line)
+                line = record.get("question") or record.get("message") or ""
+            questions.append(line)
+    return questions
+
+
+def build_index(pdf_path: Path) -> InvertedIndex:
+    """Extracts a PDF's text layer and indexes it as ingestion does (scanned pages are not recognised)"""
+    pages = extract_page_range(str(pdf_path), 0, count_pages(str(pdf_path)))
+    blocks = [page_blocks for _, page_blocks, _ in pages]
+    structure = DocumentStructure.from_blocks(blocks)
+    return InvertedIndex.from_pages([join_blocks(page_blocks) for page_blocks in blocks], structure)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", type=Path, help="PDF to answer questions about")
+    parser.add_argument("questions", type=Path, help="Question file (text or JSON Lines)")
+    parser.add_argument("--output", type=Path, help="Write answers here as NDJSON instead of to stdout")
+    parser.add_argument("--compare", action="store_true", help="Also answer one question at a time and compare")
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions)
+    if not questions:
+        sys.exit(f"No questions in {args.questions}")
+
+    started = time.perf_counter()
+    index = build_index(args.pdf)
+    indexed = time.perf_counter() - started
+
+    def read_sentences(sentence_ids: List[int]) -> List[str]:
+        return [index.sentences[sentence_id] for sentence_id in sentence_ids]
+
+    started = time.perf_counter()
+    answers = keyword_answers(index, questions, TOP_K, read_sentences)
+    batched = time.perf_counter() - started
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for number, (question, answer) in enumerate(zip(questions, answers)):
+            output.write(json.dumps({"index": number, "question": question, "answer": answer}) + "\n")
+    finally:
+        if args.output:
+            output.close()
+
+    # The summary goes to stderr so answers on stdout stay valid NDJSON
+    report = sys.stderr
+    print(f"{args.pdf.name}: {len(index.lengths)} sentences, indexed in {indexed:.2f}s", file=report)
+    print(f"batched:    {len(questions)} answers in {batched:.3f}s  {len(questions) / batched:10.0f} answers/s", file=report)
+    if args.compare:
+        started = time.perf_counter()
+        single = [keyword_answer(read_sentences([sentence_id for sentence_id, _ in index.search(question, TOP_K)])) for question in questions]
+        one_by_one = time.perf_counter() - started
+        print(f"one by one: {len(questions)} answers in {one_by_one:.3f}s  {len(questions) / one_by_one:10.0f} answers/s", file=report)
+        print(f"speedup {one_by_one / batched:.1f}x, answers {'identical' if single == answers else 'DIFFER'}", file=report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,556 @@
+"""
+API benchmark
+-------------
+Replays request mixes against the API and reports, per endpoint,
+throughput, p50/p95/p99 latency and the peak RSS of the server while the
+endpoint was exercised. Results can be saved as a baseline JSON file and
+compared against on a later commit, so regressions in the extraction, Q&A
+and speech paths show up as numbers.
+
+The server is either ``backend:app`` in this process, driven through an
+ASGI client (``--mode asgi``, no sockets), or a live uvicorn subprocess
+(``--mode live``). Synthetic books of ``--pages`` pages (1 to 5,000) are
+generated with PyMuPDF; every upload is made unique, so it is extracted
+rather than deduplicated.
+
+Each operation of the mix first runs on its own, so its latency and memory
+can be attributed, then the whole mix runs together:
+
+- ``upload``: upload a book and wait until it is processed (``upload`` and
+  ``ingest[<pages>p]``)
+- ``chat``: ask a question about a ready book (``chat``)
+- ``read``: start reading at a random page, wait for the first audio, stop
+  (``read_start``, ``first_audio``, ``read_stop``)
+
+Run from the repository root:
+
+    python -m benchmarks.bench_api --mode asgi --pages 1 50 500 --save baseline.json
+    python -m benchmarks.bench_api --mode live --pages 1 50 500 5000 --compare baseline.json
+
+In ASGI mode the RSS includes the benchmark client, which runs in the same
+process. Speech uses the stub backend unless ``--tts-backend`` says otherwise.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+DEFAULT_PAGES = [1, 50, 500]
+DEFAULT_MIX = "upload=1,chat=6,read=3"
+
+QUESTIONS = [
+    "What does the author say about {} and {}?",
+    "Why are {} and {} important?",
+    "How do {} and {} relate?",
+]
+
+# Bytes of the WAV header sent before the first synthesized audio
+WAV_HEADER_BYTES = 44
+
+# Server memory is sampled this often, in seconds
+RSS_INTERVAL = 0.05
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def process_rss(pid: int) -> int:
+    """Resident memory of a process and its descendants in bytes (Linux), 0 if unknown."""
+    try:
+        children: Dict[int, List[int]] = defaultdict(list)
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        # The command name may contain spaces; fields after it are fixed
+                        parent = int(f.read().rsplit(")", 1)[1].split()[1])
+                    children[parent].append(int(entry))
+                except (OSError, ValueError, IndexError):
+                    continue
+        total, pending = 0, [pid]
+        while pending:
+            current = pending.pop()
+            pending.extend(children.get(current, []))
+            try:
+                with open(f"/proc/{current}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1]) * 1024
+                            break
+            except OSError:
+                continue
+        return total
+    except OSError:
+        return 0
+
+
+class RssSampler:
+    """Background thread tracking the peak RSS of the server between resets."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def reset(self) -> None:
+        self.peak = process_rss(self.pid)
+
+    def _run(self) -> None:
+        while not self._stop.wait(RSS_INTERVAL):
+            self.peak = max(self.peak, process_rss(self.pid))
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class Recorder:
+    """Latencies and failures by endpoint for one phase."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, started: float, ok: bool = True) -> None:
+        if ok:
+            self.latencies[endpoint].append((time.perf_counter() - started) * 1000)
+        else:
+            self.errors[endpoint] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict]:
+        results = {}
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            ordered = sorted(self.latencies[endpoint])
+            results[endpoint] = {
+                "requests": len(ordered),
+                "errors": self.errors[endpoint],
+                "throughput": round(len(ordered) / elapsed, 3),
+                "p50_ms": round(statistics.median(ordered), 2) if ordered else None,
+                "p95_ms": round(percentile(ordered, 0.95), 2) if ordered else None,
+                "p99_ms": round(percentile(ordered, 0.99), 2) if ordered else None,
+            }
+        return results
+
+
+class Target:
+    """The server under test: an HTTP client plus a way to time the first audio of a stream."""
+
+    client: httpx.AsyncClient
+    pid: int
+
+    async def first_audio(self, path: str) -> None:
+        raise NotImplementedError
+
+
+class AsgiTarget(Target):
+    """``backend:app`` in this process, run with its lifespan."""
+
+    def __init__(self, app):
+        self.app = app
+        self.pid = os.getpid()
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+
+    async def first_audio(self, path: str) -> None:
+        # httpx's ASGI transport buffers whole responses, so the endless audio stream is read directly
+        received = 0
+        first = asyncio.get_running_loop().create_future()
+        disconnected = asyncio.Event()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal received
+            if first.done():
+                return
+            if message["type"] == "http.response.start" and message["status"] != 200:
+                first.set_exception(RuntimeError(f"audio returned {message['status']}"))
+            elif message["type"] == "http.response.body":
+                received += len(message.get("body", b""))
+                if received > WAV_HEADER_BYTES:
+                    first.set_result(None)
+                elif not message.get("more_body", False):
+                    first.set_exception(RuntimeError("audio ended without any speech"))
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80),
+        }
+        task = asyncio.create_task(self.app(scope, receive, send))
+        try:
+            await first
+        finally:
+            disconnected.set()
+            try:
+                await asyncio.wait_for(task, 5)
+            except (asyncio.TimeoutError, Exception):
+                task.cancel()
+
+
+class LiveTarget(Target):
+    """A uvicorn subprocess on a free local port."""
+
+    def __init__(self, port: int, pid: int):
+        self.pid = pid
+        # Below the server's keep-alive timeout, so no request goes out on a connection it just closed
+        limits = httpx.Limits(max_connections=200, keepalive_expiry=2)
+        self.client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits)
+
+    async def first_audio(self, path: str) -> None:
+        received = 0
+        async with self.client.stream("GET", path) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > WAV_HEADER_BYTES:
+                    return
+        raise RuntimeError("audio ended without any speech")
+
+
+class Workload:
+    """
+    The operations of a mix against one target.
+
+    Args:
+        target (Target): Server under test.
+        books (Dict[int, bytes]): Synthetic PDFs by page count.
+        seed (int): Seed of question and page choices.
+    """
+
+    def __init__(self, target: Target, books: Dict[int, bytes], seed: int):
+        from benchmarks.bench_chunking import WORDS
+
+        self.words = WORDS
+        self.target = target
+        self.books = books
+        self.rng = random.Random(seed)
+        # Ready documents by page count, to chat with and read
+        self.library: Dict[int, Dict] = {}
+
+    async def prepare(self) -> None:
+        for pages in self.books:
+            file_id, job = await self._ingest(pages)
+            if job["status"] != "done":
+                raise RuntimeError(f"Ingesting the {pages}-page book failed: {job['error']}")
+            self.library[pages] = {"file_id": file_id, "page_count": job["result"]["page_count"]}
+
+    async def upload(self, recorder: Recorder) -> None:
+        pages = self.rng.choice(list(self.books))
+        started = time.perf_counter()
+        try:
+            _, job = await self._ingest(pages, recorder)
+            recorder.record(f"ingest[{pages}p]", started, job["status"] == "done")
+        except httpx.HTTPError:
+            recorder.record(f"ingest[{pages}p]", started, False)
+
+    async def chat(self, recorder: Recorder) -> None:
+        document = self.library[self.rng.choice(list(self.library))]
+        question = self.rng.choice(QUESTIONS).format(*self.rng.sample(self.words, 2))
+        started = time.perf_counter()
+        response = await self.target.client.post("/api/chat", json={"file_id": document["file_id"], "message": question})
+        recorder.record("chat", started, response.status_code == 200)
+
+    async def read(self, recorder: Recorder) -> None:
+        document = self.library[self.rng.choice(list(self.library))]
+        page = self.rng.randint(1, max(1, document["page_count"]))
+        started = time.perf_counter()
+        response = await self.target.client.post(f"/api/read/start/{document['file_id']}", params={"page": page})
+        recorder.record("read_start", started, response.status_code == 200)
+        if response.status_code != 200:
+            return
+        session = response.json()
+
+        started = time.perf_counter()
+        try:
+            await self.target.first_audio(session["audio_url"])
+            recorder.record("first_audio", started)
+        except Exception:
+            recorder.record("first_audio", started, False)
+
+        started = time.perf_counter()
+        response = await self.target.client.post("/api/read/stop", params={"session_id": session["session_id"]})
+        recorder.record("read_stop", started, response.status_code == 200)
+
+    async def _ingest(self, pages: int, recorder: Optional[Recorder] = None):
+        # Bytes after %%EOF are ignored by PDF readers but change the content hash
+        data = self.books[pages] + f"\n% {uuid.uuid4().hex}\n".encode()
+        started = time.perf_counter()
+        response = await self.target.client.post(
+            "/api/upload", files={"file": (f"book-{pages}.pdf", data, "application/pdf")}
+        )
+        if recorder is not None:
+            recorder.record("upload", started, response.status_code == 200)
+        response.raise_for_status()
+        uploaded = response.json()
+        while True:
+            job = (await self.target.client.get(f"/api/jobs/{uploaded['job_id']}")).json()
+            if job["status"] in ("done", "failed"):
+                return uploaded["file_id"], job
+            await asyncio.sleep(0.1)
+
+
+async def run_phase(
+    workload: Workload,
+    sampler: RssSampler,
+    mix: Dict[str, int],
+    concurrency: int,
+    duration: float,
+) -> Dict:
+    """Runs ``concurrency`` clients picking operations from ``mix`` for ``duration`` seconds."""
+    recorder = Recorder()
+    operations: Dict[str, Callable] = {name: getattr(workload, name) for name in mix}
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    sampler.reset()
+    deadline = time.monotonic() + duration
+
+    async def client(number: int) -> None:
+        rng = random.Random(number)
+        while time.monotonic() < deadline:
+            await operations[rng.choices(names, weights)[0]](recorder)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "peak_rss_mb": round(sampler.peak / 2 ** 20, 1),
+        "endpoints": recorder.summary(elapsed),
+    }
+
+
+async def run_benchmark(target: Target, books: Dict[int, bytes], args) -> Dict:
+    mix = parse_mix(args.mix)
+    workload = Workload(target, books, args.seed)
+    sampler = RssSampler(target.pid)
+    try:
+        await workload.prepare()
+        phases = {}
+        for name in mix:
+            phases[name] = await run_phase(workload, sampler, {name: 1}, args.concurrency, args.duration)
+            print_phase(name, phases[name])
+        if len(mix) > 1:
+            phases["mix"] = await run_phase(workload, sampler, mix, args.concurrency, args.duration)
+            print_phase("mix", phases["mix"])
+        return phases
+    finally:
+        sampler.close()
+        await target.client.aclose()
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("upload", "chat", "read"):
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        if int(weight or 1) > 0:
+            mix[name] = int(weight or 1)
+    return mix
+
+
+def print_phase(name: str, phase: Dict) -> None:
+    print(f"\n[{name}] {phase['elapsed_s']}s, peak RSS {phase['peak_rss_mb']} MB")
+    print(f"{'endpoint':<16} {'requests':>8} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, stats in phase["endpoints"].items():
+        latencies = [f"{stats[key]:>9.1f}" if stats[key] is not None else f"{'-':>9}" for key in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"{endpoint:<16} {stats['requests']:>8} {stats['errors']:>7} {stats['throughput']:>8.2f} {' '.join(latencies)}")
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float) -> int:
+    """Prints changes against a baseline and returns the number of regressions."""
+    print(f"\nCompared with {baseline['meta'].get('commit', 'baseline')[:12]} (tolerance {tolerance:.0%}):")
+    for key in ("mode", "pages", "mix", "concurrency", "cpus"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"  warning: baseline {key} {baseline['meta'].get(key)} differs from {current['meta'].get(key)}")
+    regressions = 0
+    for phase, results in current["phases"].items():
+        before = baseline["phases"].get(phase)
+        if before is None:
+            continue
+        checks = [("peak RSS", before["peak_rss_mb"], results["peak_rss_mb"], True)]
+        for endpoint, stats in results["endpoints"].items():
+            old = before["endpoints"].get(endpoint)
+            if old is None:
+                continue
+            checks.append((f"{endpoint} p95", old["p95_ms"], stats["p95_ms"], True))
+            checks.append((f"{endpoint} req/s", old["throughput"], stats["throughput"], False))
+        for label, old, new, lower_is_better in checks:
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > tolerance if lower_is_better else change < -tolerance
+            regressions += worse
+            print(f"  [{phase}] {label:<24} {old:>10.2f} -> {new:>10.2f} {change:>+7.1%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def server_env(directory: Path, args) -> Dict[str, str]:
+    return {
+        "UPLOAD_DIR": str(directory / "uploads"),
+        "DATABASE_URL": f"sqlite:///{directory / 'app.db'}",
+        "STATE_URL": "memory://",
+        "LIBRARY_INDEX_DIR": str(directory / "library"),
+        "AUDIO_CACHE_DIR": str(directory / "audio"),
+        "AUDIO_PREWARM_MINUTES": "0",
+        "TTS_BACKEND": args.tts_backend,
+        "MAX_FILE_SIZE": str(1024 * 1024 * 1024),
+        "INGEST_QUEUE_SIZE": str(max(16, args.concurrency * 2)),
+    }
+
+
+def load_books(pages: List[int], directory: Path, seed: int) -> Dict[int, bytes]:
+    from benchmarks.bench_chunking import make_pdf
+
+    books = {}
+    directory.mkdir(parents=True, exist_ok=True)
+    for count in pages:
+        path = directory / f"book-{count}-{seed}.pdf"
+        if not path.exists():
+            started = time.perf_counter()
+            make_pdf(path, count, seed)
+            print(f"Generated {count}-page book in {time.perf_counter() - started:.1f}s")
+        books[count] = path.read_bytes()
+    return books
+
+
+async def run_asgi(books: Dict[int, bytes], args) -> Dict:
+    import backend
+
+    async with backend.app.router.lifespan_context(backend.app):
+        return await run_benchmark(AsgiTarget(backend.app), books, args)
+
+
+async def run_live(books: Dict[int, bytes], args, env: Dict[str, str], log) -> Dict:
+    from benchmarks.bench_health_latency import free_port
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "backend.py", "--port", str(port)],
+        env={**os.environ, **env},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    try:
+        target = LiveTarget(port, server.pid)
+        for _ in range(300):
+            if server.poll() is not None:
+                raise RuntimeError("server exited during startup")
+            try:
+                if (await target.client.get("/api/health")).status_code == 200:
+                    break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError("server did not start")
+        return await run_benchmark(target, books, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["asgi", "live"], default="asgi")
+    parser.add_argument("--pages", type=int, nargs="+", default=DEFAULT_PAGES, help="Sizes of the synthetic books")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights, e.g. upload=1,chat=6,read=3")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per phase")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--tts-backend", default="stub", help="Speech backend of the server")
+    parser.add_argument("--books", help="Directory to keep generated books in between runs")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare the results with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative change before a regression")
+    parser.add_argument("--server-log", help="Write the live server's output to this file")
+    args = parser.parse_args()
+
+    if any(count < 1 or count > 5000 for count in args.pages):
+        raise SystemExit("--pages must be between 1 and 5000")
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        env = server_env(directory, args)
+        if args.mode == "asgi":
+            # Settings are read when the app is first imported, which the PDF generator also does
+            os.environ.update(env)
+        books = load_books(args.pages, Path(args.books) if args.books else directory / "books", args.seed)
+        if args.mode == "asgi":
+            phases = asyncio.run(run_asgi(books, args))
+        else:
+            log = open(args.server_log, "wb") if args.server_log else subprocess.DEVNULL
+            try:
+                phases = asyncio.run(run_live(books, args, env, log))
+            finally:
+                if args.server_log:
+                    log.close()
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "mode": args.mode,
+            "pages": args.pages,
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "tts_backend": args.tts_backend,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "phases": phases,
+    }
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+        print(f"\nSaved results to {args.save}")
+    if args.compare:
+        regressions = compare(json.loads(Path(args.compare).read_text()), results, args.tolerance)
+        if regressions:
+            print(f"{regressions} regressions")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
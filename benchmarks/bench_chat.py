@@ -0,0 +1,85 @@
+"""
+Chat latency benchmark
+----------------------
+Builds synthetic documents from 10 to 5,000 pages and times keyword Q&A
+against the per-document inverted index. Latency should stay roughly flat
+as the document grows, since a query only visits the postings of its terms.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_chat
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.api.endpoints import indexed_qa
+from app.services.search_index import InvertedIndex
+
+PAGE_COUNTS = [10, 100, 1000, 5000]
+SENTENCES_PER_PAGE = 25
+WORDS_PER_SENTENCE = 14
+VOCABULARY_SIZE = 20000
+
+QUESTIONS = [
+    "What does the author say about communication?",
+    "How should conflicts be resolved at work?",
+    "Why is listening important in a relationship?",
+    "What is the role of trust and respect?",
+]
+
+
+def make_vocabulary(rng: random.Random) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = {"".join(rng.choices(letters, k=rng.randint(4, 9))) for _ in range(VOCABULARY_SIZE)}
+    # Make sure the question terms exist in the corpus
+    for question in QUESTIONS:
+        words.update(w.strip("?").lower() for w in question.split())
+    return sorted(words)
+
+
+def make_sentences(rng: random.Random, vocabulary: list, pages: int) -> list:
+    # Zipf-like weights so a few words are common and most are rare
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    total = pages * SENTENCES_PER_PAGE
+    return [" ".join(rng.choices(vocabulary, weights=weights, k=WORDS_PER_SENTENCE)) for _ in range(total)]
+
+
+def time_queries(index: InvertedIndex, repeats: int) -> list:
+    samples = []
+    for _ in range(repeats):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            indexed_qa(index, question)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=PAGE_COUNTS)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+
+    print(f"{'pages':>7} {'sentences':>10} {'build s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for pages in args.pages:
+        sentences = make_sentences(rng, vocabulary, pages)
+
+        start = time.perf_counter()
+        index = InvertedIndex.build(sentences)
+        build_seconds = time.perf_counter() - start
+
+        samples = sorted(time_queries(index, args.repeats))
+        p50 = statistics.median(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(f"{pages:>7} {len(sentences):>10} {build_seconds:>9.2f} {p50:>8.3f} {p95:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Chunking benchmark
+------------------
+Generates a synthetic book (headings, two-column pages, abbreviations and
+decimals) or reads a given PDF, then times the two ingestion steps of the
+chunker on one core: layout extraction of every page and building the
+sentence / paragraph / section structure. Reports pages per second.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_chunking --pages 300
+    python -m benchmarks.bench_chunking --pdf path/to/book.pdf
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from app.services.chunking import DocumentStructure, join_blocks
+from app.services.extraction import layout_blocks
+
+WORDS = (
+    "partner listens understands feelings trust respect communication stress cave "
+    "support advice solution problem caring appreciation relationship difference"
+).split()
+
+TRICKY = [
+    "Dr. Gray met Mr. Smith at 3.30 p.m. on the way home.",
+    "Results improved by 12.5 percent, e.g. in cases such as No. 7.",
+    "J. R. R. Tolkien wrote about it, cf. chapter 3.",
+]
+
+
+def make_sentence(rng: random.Random) -> str:
+    if rng.random() < 0.1:
+        return rng.choice(TRICKY)
+    words = rng.choices(WORDS, k=rng.randint(8, 24))
+    return " ".join(words).capitalize() + "."
+
+
+def make_pdf(path: Path, pages: int, seed: int) -> None:
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        width, height = page.rect.width, page.rect.height
+        page.insert_textbox(fitz.Rect(50, 40, width - 50, 80), f"Chapter {number + 1}", fontsize=20, fontname="hebo")
+        paragraphs = [" ".join(make_sentence(rng) for _ in range(rng.randint(3, 6))) for _ in range(6)]
+        if number % 2:
+            # Two columns
+            middle = width / 2
+            page.insert_textbox(fitz.Rect(50, 90, middle - 10, height - 40), "\n\n".join(paragraphs[:3]), fontsize=10)
+            page.insert_textbox(fitz.Rect(middle + 10, 90, width - 50, height - 40), "\n\n".join(paragraphs[3:]), fontsize=10)
+        else:
+            page.insert_textbox(fitz.Rect(50, 90, width - 50, height - 40), "\n\n".join(paragraphs), fontsize=10)
+    doc.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF to chunk instead of a synthetic book")
+    parser.add_argument("--pages", type=int, default=300, help="Pages of the synthetic book")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(args.pdf) if args.pdf else Path(directory) / "book.pdf"
+        if not args.pdf:
+            make_pdf(path, args.pages, args.seed)
+
+        started = time.perf_counter()
+        with fitz.open(path) as doc:
+            blocks = [layout_blocks(page) for page in doc]
+        extracted = time.perf_counter()
+        structure = DocumentStructure.from_blocks(blocks)
+        pages = [join_blocks(page_blocks) for page_blocks in blocks]
+        chunks = structure.chunks(pages)
+        structured = time.perf_counter()
+
+    page_count = len(blocks)
+    sentences = sum(len(page) for page in structure.sentences)
+    print(f"pages: {page_count}  sections: {len(structure.sections)}  paragraphs: {len(structure.paragraphs)}  "
+          f"sentences: {sentences}  chunks: {len(chunks)}")
+    print(f"layout extraction:  {page_count / (extracted - started):8.1f} pages/s")
+    print(f"structure + chunks: {page_count / (structured - extracted):8.1f} pages/s")
+    print(f"total:              {page_count / (structured - started):8.1f} pages/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Health latency under load
+-------------------------
+Starts the API server in a subprocess, then keeps ``--uploads`` large
+uploads and ``--chats`` chats in flight while probing ``/api/health`` every
+few milliseconds. Blocking work on the event loop shows up directly as
+health latency, so p99 should stay under 10 ms however busy the workers are.
+
+The probe runs in its own process on a plain keep-alive connection, so the
+load generator does not delay it. On a machine with fewer cores than load,
+``--nice`` lowers the load generator's priority so that it does not take CPU
+from the server it measures.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_health_latency --uploads 20 --chats 20 --pages 200
+"""
+
+import argparse
+import asyncio
+import http.client
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.bench_chunking import WORDS, make_pdf
+
+QUESTIONS = [
+    "What does the author say about {} and {}?",
+    "Why are {} and {} important?",
+    "How do {} and {} relate?",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def wait_until_up(client: httpx.AsyncClient, server: subprocess.Popen) -> None:
+    for _ in range(300):
+        if server.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if (await client.get("/api/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str) -> dict:
+    while True:
+        job = (await client.get(f"/api/jobs/{job_id}")).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        await asyncio.sleep(0.25)
+
+
+async def upload(client: httpx.AsyncClient, path: Path) -> dict:
+    with open(path, "rb") as f:
+        response = await client.post("/api/upload", files={"file": (path.name, f.read(), "application/pdf")})
+    response.raise_for_status()
+    return response.json()
+
+
+def probe_loop(port: int, interval: float, commands) -> None:
+    """
+    Body of the probe process: between a "start" and a "stop" command it
+    probes health and then sends back the latencies in milliseconds.
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    while commands.recv() == "start":
+        latencies = []
+        while not commands.poll():
+            started = time.perf_counter()
+            connection.request("GET", "/api/health")
+            response = connection.getresponse()
+            response.read()
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status != 200:
+                raise RuntimeError(f"health returned {response.status}")
+            time.sleep(interval)
+        commands.recv()
+        commands.send(latencies)
+    connection.close()
+
+
+class HealthProbe:
+    """Health probe in its own process, started before the load generator lowers its priority."""
+
+    def __init__(self, port: int, interval: float):
+        self.commands, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=probe_loop, args=(port, interval, child), daemon=True)
+        self.process.start()
+
+    def start(self) -> None:
+        self.commands.send("start")
+
+    async def stop(self) -> list:
+        self.commands.send("stop")
+        return await asyncio.get_running_loop().run_in_executor(None, self.commands.recv)
+
+    def close(self) -> None:
+        self.commands.send("exit")
+        self.process.join()
+
+
+async def run(args, directory: Path, port: int, server: subprocess.Popen, probe: HealthProbe) -> None:
+    # Below the server's keep-alive timeout, so no request goes out on a connection it just closed
+    limits = httpx.Limits(max_connections=args.uploads + args.chats + 10, keepalive_expiry=2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=600, limits=limits) as client:
+        await wait_until_up(client, server)
+
+        # A ready document to chat with while the uploads are processed
+        chat_pdf = directory / "chat.pdf"
+        make_pdf(chat_pdf, args.pages, seed=0)
+        uploaded = await upload(client, chat_pdf)
+        await wait_for_job(client, uploaded["job_id"])
+        file_id = uploaded["file_id"]
+
+        paths = []
+        for number in range(args.uploads):
+            path = directory / f"book-{number}.pdf"
+            make_pdf(path, args.pages, seed=number + 1)
+            paths.append(path)
+
+        probe.start()
+        await asyncio.sleep(2)
+        idle = await probe.stop()
+
+        async def ingest(path: Path) -> str:
+            job = await wait_for_job(client, (await upload(client, path))["job_id"])
+            return job["status"]
+
+        async def chat(number: int) -> int:
+            rng = random.Random(number)
+            codes = []
+            deadline = time.monotonic() + args.chat_seconds
+            while time.monotonic() < deadline:
+                response = await client.post("/api/chat", json={
+                    "file_id": file_id,
+                    "message": rng.choice(QUESTIONS).format(*rng.sample(WORDS, 2)),
+                })
+                codes.append(response.status_code)
+            return sum(code == 200 for code in codes)
+
+        probe.start()
+        started = time.perf_counter()
+        statuses, answers = await asyncio.gather(
+            asyncio.gather(*(ingest(path) for path in paths)),
+            asyncio.gather(*(chat(number) for number in range(args.chats))),
+        )
+        elapsed = time.perf_counter() - started
+        loaded = await probe.stop()
+
+    print(f"uploads: {len(statuses)} ({statuses.count('done')} done) x {args.pages} pages, "
+          f"chats answered: {sum(answers)}, {elapsed:.1f}s")
+    print(f"{'health':>8} {'samples':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, samples in (("idle", idle), ("loaded", loaded)):
+        print(f"{name:>8} {len(samples):>8} {statistics.median(samples):>8.2f} {percentile(samples, 0.95):>8.2f} "
+              f"{percentile(samples, 0.99):>8.2f} {max(samples):>8.2f}")
+    p99 = percentile(loaded, 0.99)
+    print(f"loaded p99 {'within' if p99 < args.target else 'OVER'} the {args.target:.0f} ms target")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=20, help="Uploads in flight")
+    parser.add_argument("--chats", type=int, default=20, help="Concurrent chat clients")
+    parser.add_argument("--pages", type=int, default=200, help="Pages per synthetic PDF")
+    parser.add_argument("--chat-seconds", type=float, default=20.0, help="How long each chat client keeps asking")
+    parser.add_argument("--interval", type=float, default=0.005, help="Pause between health probes, in seconds")
+    parser.add_argument("--target", type=float, default=10.0, help="Health p99 target in milliseconds")
+    parser.add_argument("--server-log", help="Write the server's output to this file")
+    parser.add_argument("--nice", type=int, default=0, help="Lower the load generator's priority by this much")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        port = free_port()
+        env = {
+            **os.environ,
+            "UPLOAD_DIR": str(directory / "uploads"),
+            "DATABASE_URL": f"sqlite:///{directory / 'app.db'}",
+            "STATE_URL": "memory://",
+            "LIBRARY_INDEX_DIR": str(directory / "library"),
+            "AUDIO_CACHE_DIR": str(directory / "audio"),
+            "AUDIO_PREWARM_MINUTES": "0",
+            "TTS_BACKEND": "stub",
+            "INGEST_QUEUE_SIZE": str(max(16, args.uploads + 1)),
+        }
+        log = open(args.server_log, "wb") if args.server_log else subprocess.DEVNULL
+        server = subprocess.Popen(
+            [sys.executable, "backend.py", "--port", str(port)],
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        probe = HealthProbe(port, args.interval)
+        if args.nice:
+            os.nice(args.nice)
+        try:
+            asyncio.run(run(args, directory, port, server, probe))
+            probe.close()
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            if args.server_log:
+                log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Page store benchmark
+--------------------
+Extracts the given PDFs (or a synthetic book) the way ingestion does and
+compares how much disk their text takes as raw UTF-8, as stored before
+the page store (page rows in the database, an uncompressed page file and a
+keyword index holding every sentence), and as the page store plus an index
+that references it. Then times random access: one page, a 10-page window
+and one sentence, with a cold and a warm block cache.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_page_store
+    python -m benchmarks.bench_page_store --pdf uploads/*.pdf
+"""
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from app.services.chunking import DocumentStructure, join_blocks
+from app.services.extraction import layout_blocks
+from app.services.page_file import PageFile, zstd_available
+from app.services.search_index import InvertedIndex
+
+from benchmarks.bench_chunking import make_pdf
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def timed(function, repeats: int) -> list:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name: str, timings: list) -> None:
+    print(f"  {name:<22} p50 {statistics.median(timings):7.3f} ms   p95 {percentile(timings, 0.95):7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="*", help="PDFs to store instead of a synthetic book")
+    parser.add_argument("--pages", type=int, default=300, help="Pages of the synthetic book")
+    parser.add_argument("--repeats", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        paths = [Path(path) for path in args.pdf or []]
+        if not paths:
+            paths = [directory / "book.pdf"]
+            make_pdf(paths[0], args.pages, args.seed)
+
+        raw = legacy = stored = 0
+        files = []
+        for number, path in enumerate(paths):
+            with fitz.open(path) as doc:
+                blocks = [layout_blocks(page) for page in doc]
+            structure = DocumentStructure.from_blocks(blocks)
+            pages = [join_blocks(page_blocks) for page_blocks in blocks]
+            index = InvertedIndex.from_pages(pages, structure)
+
+            text_bytes = sum(len(page.encode("utf-8")) for page in pages)
+            # Before: page rows, raw page file with uint64 offsets, and an index holding every sentence
+            legacy_index = len(json.dumps({**index.to_dict(), "version": 1, "sentences": index.sentences}, separators=(",", ":")))
+            store_path = directory / f"{number}.pages.z"
+            PageFile.write(pages, store_path, structure)
+            index_path = directory / f"{number}.index.json"
+            index.save(index_path)
+
+            raw += text_bytes
+            legacy += 2 * text_bytes + 8 * (len(pages) + 1) + legacy_index
+            stored += store_path.stat().st_size + index_path.stat().st_size
+            files.append((store_path, index_path, len(pages)))
+
+        codec = "zstd" if zstd_available() else "zlib"
+        store_only = sum(store_path.stat().st_size for store_path, _, _ in files)
+        print(f"documents: {len(files)}  pages: {sum(count for _, _, count in files)}  codec: {codec}")
+        print(f"raw text:                  {raw / 1e6:9.2f} MB")
+        print(f"page store:                {store_only / 1e6:9.2f} MB  ({raw / max(store_only, 1):.1f}x smaller)")
+        print(f"before, text + index:      {legacy / 1e6:9.2f} MB")
+        print(f"now, page store + index:   {stored / 1e6:9.2f} MB  ({legacy / max(stored, 1):.1f}x smaller)")
+
+        store_path, _, page_count = max(files, key=lambda item: item[2])
+        page_file = PageFile(store_path)
+        print(f"random access on {page_count} pages, {page_file.sentence_count} sentences:")
+
+        def cold(read):
+            def run():
+                # A fresh block cache makes every read decompress its block
+                page_file.blocks.discard_where(lambda key: True)
+                read()
+            return run
+
+        def page():
+            page_file.read(rng.randrange(page_count), 1)
+
+        def window():
+            page_file.read(rng.randrange(page_count), 10)
+
+        def sentence():
+            page_file.sentence(rng.randrange(max(page_file.sentence_count, 1)))
+
+        report("open", timed(lambda: PageFile(store_path), args.repeats))
+        report("page (cold)", timed(cold(page), args.repeats))
+        report("page (warm)", timed(lambda: page_file.read(0, 1), args.repeats))
+        report("10-page window (cold)", timed(cold(window), args.repeats))
+        if page_file.sentence_count:
+            report("sentence (cold)", timed(cold(sentence), args.repeats))
+
+
+if __name__ == "__main__":
+    main()
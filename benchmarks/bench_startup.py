@@ -0,0 +1,197 @@
+"""
+Startup benchmark
+-----------------
+Tracks how long the API takes to come up and what the first requests pay
+for whatever was left to start on first use.
+
+- Import cost: ``python -X importtime -c "import backend"`` in a fresh
+  interpreter, reported as the total and the most expensive modules
+  (cumulative, i.e. including what they import), plus every ``app`` module.
+- Cold start: the server is started as a subprocess with warm-up on and
+  off; per run it reports the seconds until ``/api/health`` answers and
+  until ``/api/ready`` turns 200, then the latency of the first ingestion,
+  first audio and first chat.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup --runs 3 --save startup.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.bench_api import LiveTarget
+from benchmarks.bench_health_latency import free_port
+
+IMPORT_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)$")
+
+
+def server_env(directory: Path, tts_backend: str, warm_up: bool) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "UPLOAD_DIR": str(directory / "uploads"),
+        "DATABASE_URL": f"sqlite:///{directory / 'app.db'}",
+        "STATE_URL": "memory://",
+        "LIBRARY_INDEX_DIR": str(directory / "library"),
+        "AUDIO_CACHE_DIR": str(directory / "audio"),
+        "AUDIO_PREWARM_MINUTES": "0",
+        "TTS_BACKEND": tts_backend,
+        "WARM_UP": "1" if warm_up else "0",
+    }
+
+
+def import_times(env: Dict[str, str]) -> Dict[str, Dict]:
+    """Self and cumulative import time in milliseconds by module, for one fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE_RE.match(line)
+        if match:
+            own, cumulative, name = match.groups()
+            modules[name] = {"self_ms": int(own) / 1000, "cumulative_ms": int(cumulative) / 1000}
+    return modules
+
+
+def measure_imports(env: Dict[str, str], runs: int, top: int) -> Dict:
+    samples: Dict[str, List[Dict]] = defaultdict(list)
+    for _ in range(runs):
+        for name, times in import_times(env).items():
+            samples[name].append(times)
+    medians = {
+        name: {
+            "self_ms": round(statistics.median(sample["self_ms"] for sample in values), 2),
+            "cumulative_ms": round(statistics.median(sample["cumulative_ms"] for sample in values), 2),
+        }
+        for name, values in samples.items()
+    }
+    by_cost = sorted(medians.items(), key=lambda item: item[1]["cumulative_ms"], reverse=True)
+    return {
+        "backend_ms": medians.get("backend", {}).get("cumulative_ms"),
+        "slowest": dict(by_cost[:top]),
+        "app": {name: times for name, times in by_cost if name == "app" or name.startswith("app.")},
+    }
+
+
+async def wait_for(client: httpx.AsyncClient, server: subprocess.Popen, path: str, started: float) -> float:
+    """Seconds from ``started`` until ``path`` answers 200."""
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if (await client.get(path)).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.01)
+
+
+async def cold_start(pdf: bytes, tts_backend: str, warm_up: bool, log) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        port = free_port()
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "backend.py", "--port", str(port)],
+            env=server_env(Path(directory), tts_backend, warm_up),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        target = LiveTarget(port, server.pid)
+        client = target.client
+        try:
+            timings = {"healthy_s": await wait_for(client, server, "/api/health", started)}
+            timings["ready_s"] = await wait_for(client, server, "/api/ready", started)
+
+            request_started = time.perf_counter()
+            response = await client.post("/api/upload", files={"file": ("book.pdf", pdf, "application/pdf")})
+            response.raise_for_status()
+            uploaded = response.json()
+            while (await client.get(f"/api/jobs/{uploaded['job_id']}")).json()["status"] not in ("done", "failed"):
+                await asyncio.sleep(0.02)
+            timings["first_ingest_ms"] = (time.perf_counter() - request_started) * 1000
+
+            request_started = time.perf_counter()
+            session = (await client.post(f"/api/read/start/{uploaded['file_id']}")).json()
+            await target.first_audio(session["audio_url"])
+            timings["first_audio_ms"] = (time.perf_counter() - request_started) * 1000
+            await client.post("/api/read/stop", params={"session_id": session["session_id"]})
+
+            request_started = time.perf_counter()
+            response = await client.post("/api/chat", json={"file_id": uploaded["file_id"], "message": "What is this about?"})
+            response.raise_for_status()
+            timings["first_chat_ms"] = (time.perf_counter() - request_started) * 1000
+            return timings
+        finally:
+            await client.aclose()
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions; medians are reported")
+    parser.add_argument("--top", type=int, default=15, help="Most expensive imports to list")
+    parser.add_argument("--pages", type=int, default=20, help="Pages of the first uploaded book")
+    parser.add_argument("--tts-backend", default="stub", help="Speech backend of the server")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--server-log", help="Write the servers' output to this file")
+    args = parser.parse_args()
+
+    from benchmarks.bench_chunking import make_pdf
+
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_path = Path(directory) / "book.pdf"
+        make_pdf(pdf_path, args.pages, seed=0)
+        pdf = pdf_path.read_bytes()
+        imports = measure_imports(server_env(Path(directory), args.tts_backend, True), args.runs, args.top)
+
+    print(f"import backend: {imports['backend_ms']:.0f} ms (median of {args.runs})")
+    print(f"\n{'module':<48} {'self ms':>9} {'cumul. ms':>10}")
+    for name, times in imports["slowest"].items():
+        print(f"{name:<48} {times['self_ms']:>9.1f} {times['cumulative_ms']:>10.1f}")
+    print(f"\n{'app module':<48} {'self ms':>9} {'cumul. ms':>10}")
+    for name, times in imports["app"].items():
+        print(f"{name:<48} {times['self_ms']:>9.1f} {times['cumulative_ms']:>10.1f}")
+
+    log = open(args.server_log, "wb") if args.server_log else subprocess.DEVNULL
+    starts = {}
+    try:
+        for warm_up in (True, False):
+            runs = [asyncio.run(cold_start(pdf, args.tts_backend, warm_up, log)) for _ in range(args.runs)]
+            starts["warm_up" if warm_up else "lazy"] = {
+                key: round(statistics.median(run[key] for run in runs), 3) for key in runs[0]
+            }
+    finally:
+        if args.server_log:
+            log.close()
+
+    keys = list(next(iter(starts.values())))
+    print(f"\n{'cold start':<10} " + " ".join(f"{key:>16}" for key in keys))
+    for name, timings in starts.items():
+        print(f"{name:<10} " + " ".join(f"{timings[key]:>16.2f}" for key in keys))
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({"imports": imports, "cold_start": starts}, indent=2))
+        print(f"\nSaved results to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import streamlit as st
 import requests
+import json
 import time
 
 # Backend configuration
@@ -38,11 +39,55 @@ if not check_backend():
 
 st.success("✅ Backend server is running!")
 
+def wait_for_job(job_id):
+    """Poll an ingestion job, showing per-page progress, until it finishes"""
+    progress = st.progress(0.0, text="Processing PDF...")
+    while True:
+        job = requests.get(f"{BACKEND}/api/jobs/{job_id}", timeout=10).json()
+        label = f"{job['stage'].capitalize()}: page {job['pages_done']} of {job['total_pages'] or '?'}"
+        progress.progress(min(job["progress"], 1.0), text=label)
+        if job["status"] in ("done", "failed"):
+            progress.empty()
+            return job
+        time.sleep(0.5)
+
+def stream_answer(file_id, question):
+    """Render a streamed chat answer as it arrives; returns the full answer"""
+    response = requests.post(f"{BACKEND}/api/chat/stream", json={
+        "file_id": file_id,
+        "message": question
+    }, stream=True, timeout=60)
+    response.raise_for_status()
+    
+    placeholder = st.empty()
+    answer = ""
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            data = json.loads(line[len("data: "):])
+            if event == "passages" and data["passages"]:
+                with st.expander("📑 Sources"):
+                    for passage in data["passages"]:
+                        st.caption(f"Page {passage['page'] or '?'}: {passage['text'][:300]}")
+            elif event == "token":
+                answer += data["text"]
+                placeholder.markdown(answer + "▌")
+            elif event == "done":
+                answer = data["answer"]
+            elif event == "error":
+                raise RuntimeError(data["detail"])
+    placeholder.markdown(answer)
+    return answer
+
 # Initialize session state
 if "file_id" not in st.session_state:
     st.session_state.file_id = None
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "reading_session" not in st.session_state:
+    st.session_state.reading_session = None
 
 # 1. PDF Upload Section
 st.header("📄 Step 1: Upload PDF")
@@ -57,13 +102,20 @@ if uploaded_file:
                 
                 if response.status_code == 200:
                     result = response.json()
-                    st.session_state.file_id = result["file_id"]
-                    st.success(f"✅ PDF uploaded successfully!")
-                    st.info(f"**File ID:** `{result['file_id']}`")
+                    job = wait_for_job(result["job_id"])
                     
-                    # Show preview
-                    with st.expander("📖 Content Preview"):
-                        st.text(result.get("preview", "No preview available"))
+                    if job["status"] == "done":
+                        st.session_state.file_id = result["file_id"]
+                        st.success(f"✅ PDF uploaded successfully!")
+                        st.info(f"**File ID:** `{result['file_id']}`")
+                        
+                        # Show preview
+                        with st.expander("📖 Content Preview"):
+                            st.text(job["result"].get("preview", "No preview available"))
+                    else:
+                        st.error(f"❌ Processing failed: {job.get('error')}")
+                elif response.status_code == 429:
+                    st.warning("⏳ Server is busy processing other uploads. Please try again shortly.")
                 else:
                     st.error(f"❌ Upload failed: {response.text}")
                     
@@ -76,31 +128,77 @@ if uploaded_file:
 if st.session_state.file_id:
     st.divider()
     
+    # Pages are fetched a window at a time, so long books open instantly
+    with st.expander("📖 Browse pages"):
+        browse_page = st.number_input("Page", min_value=1, value=1, step=1, key="browse_page")
+        try:
+            response = requests.get(
+                f"{BACKEND}/api/documents/{st.session_state.file_id}/pages",
+                params={"start": browse_page, "count": 1}
+            )
+            if response.status_code == 200:
+                window = response.json()
+                st.caption(f"Page {browse_page} of {window['page_count']}")
+                for page in window["pages"]:
+                    st.text(page["text"])
+            else:
+                st.error(f"❌ {response.json().get('detail')}")
+        except Exception as e:
+            st.error(f"❌ Error: {str(e)}")
+    
     # 2. Reading Controls Section
     st.header("🗣️ Step 2: Text-to-Speech Controls")
     
-    col1, col2 = st.columns(2)
+    start_page = st.number_input("Start at page", min_value=1, value=1, step=1)
     
-    with col1:
-        if st.button("▶️ Start Reading Whole PDF", type="primary"):
-            with st.spinner("Starting text-to-speech..."):
-                try:
-                    response = requests.post(f"{BACKEND}/api/read/start/{st.session_state.file_id}")
-                    if response.status_code == 200:
-                        st.success("🗣️ Reading started! Check your audio.")
-                    else:
-                        st.error("❌ Failed to start reading")
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
+    if st.button("▶️ Start Reading", type="primary"):
+        try:
+            response = requests.post(
+                f"{BACKEND}/api/read/start/{st.session_state.file_id}",
+                params={"page": start_page}
+            )
+            if response.status_code == 200:
+                st.session_state.reading_session = response.json()
+            else:
+                st.error(f"❌ Failed to start reading: {response.json().get('detail')}")
+        except Exception as e:
+            st.error(f"❌ Error: {str(e)}")
     
-    with col2:
-        if st.button("⏹️ Stop Reading"):
+    session = st.session_state.reading_session
+    if session and session["file_id"] == st.session_state.file_id:
+        # Audio is synthesized on the server and played here, starting after the first sentence
+        st.audio(f"{BACKEND}{session['audio_url']}", format="audio/wav", autoplay=True)
+        
+        col1, col2, col3 = st.columns(3)
+        action = None
+        with col1:
+            if st.button("⏸️ Pause"):
+                action = "pause"
+        with col2:
+            if st.button("⏯️ Resume"):
+                action = "resume"
+        with col3:
+            if st.button("⏹️ Stop Reading"):
+                action = "stop"
+        
+        seek_col1, seek_col2 = st.columns([3, 1])
+        with seek_col1:
+            seek_page = st.number_input("Jump to page", min_value=1, max_value=session["page_count"] or None, value=1, step=1)
+        with seek_col2:
+            if st.button("⏩ Jump"):
+                action = "seek"
+        
+        if action:
             try:
-                response = requests.post(f"{BACKEND}/api/read/stop")
+                params = {"page": seek_page} if action == "seek" else None
+                response = requests.post(f"{BACKEND}/api/sessions/{session['session_id']}/{action}", params=params)
                 if response.status_code == 200:
-                    st.success("🔇 Reading stopped.")
+                    state = response.json()
+                    st.info(f"Reading {state['state']} at page {state['page']}")
+                    if state["state"] == "stopped":
+                        st.session_state.reading_session = None
                 else:
-                    st.error("❌ Failed to stop reading")
+                    st.error(f"❌ Failed to {action} reading: {response.json().get('detail')}")
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
     
@@ -125,16 +223,9 @@ if st.session_state.file_id:
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
                 try:
-                    response = requests.post(f"{BACKEND}/api/chat", json={
-                        "file_id": st.session_state.file_id,
-                        "message": prompt
-                    })
+                    answer = stream_answer(st.session_state.file_id, prompt)
                     
-                    if response.status_code == 200:
-                        result = response.json()
-                        answer = result["answer"]
-                        st.write(answer)
-                        
+                    if answer:
                         # Add assistant response to chat history
                         st.session_state.messages.append({"role": "assistant", "content": answer})
                         
@@ -143,12 +234,9 @@ if st.session_state.file_id:
                         with col1:
                             if st.button("🔊 Speak Answer", key=f"speak_{len(st.session_state.messages)}"):
                                 try:
-                                    # Stop any current reading first
-                                    requests.post(f"{BACKEND}/api/read/stop")
-                                    time.sleep(0.5)
-                                    # Speak the answer
-                                    requests.post(f"{BACKEND}/api/speak", params={"text": answer})
-                                    st.success("🗣️ Speaking answer...")
+                                    # The answer gets its own session, so it does not interrupt the book
+                                    response = requests.post(f"{BACKEND}/api/speak", params={"text": answer})
+                                    st.audio(f"{BACKEND}{response.json()['audio_url']}", format="audio/wav", autoplay=True)
                                 except Exception as e:
                                     st.error(f"❌ Speech error: {str(e)}")
                     else:
@@ -167,15 +255,15 @@ with st.sidebar:
     st.header("📖 How to Use")
     st.markdown("""
     1. **Upload PDF**: Choose and upload your PDF file
-    2. **Start Reading**: Click to hear the entire PDF read aloud
-    3. **Stop Reading**: Stop the text-to-speech at any time
+    2. **Start Reading**: Click to hear the PDF read aloud from a page
+    3. **Pause, Resume, Jump or Stop**: Control the reading at any time
     4. **Ask Questions**: Type questions about your PDF content
     5. **Speak Answers**: Click 🔊 to hear answers aloud
     
     **Tips:**
     - Make sure your audio is turned on
     - Ask specific questions for better answers
-    - You can stop and start reading at any time
+    - Your reading session keeps its place when you pause
     """)
     
     st.header("🔧 Technical Info")
@@ -0,0 +1,29 @@
+import time
+
+from app.services.answer_cache import AnswerCache, normalize_question
+from app.services.shared_state import InMemoryStateBackend
+
+
+def test_normalize_question_keeps_every_word():
+    assert normalize_question("  Is the Treaty NOT binding?! ") == "is the treaty not binding"
+    assert normalize_question("Is the treaty binding?") != normalize_question("Is the treaty not binding?")
+
+
+def test_question_and_its_negation_miss_each_other():
+    cache = AnswerCache(16, 60, InMemoryStateBackend())
+    cache.put("hash", "keyword", "Is the treaty binding?", "Yes")
+
+    assert cache.get("hash", "keyword", "is the treaty binding") == "Yes"
+    assert cache.get("hash", "keyword", "Is the treaty not binding?") is None
+    cache.local.clear()
+    assert cache.get("hash", "keyword", "Is the treaty not binding?") is None
+    assert cache.get("hash", "keyword", "Is the treaty binding?") == "Yes"
+
+
+def test_expired_answers_are_purged_from_memory():
+    cache = AnswerCache(16, 0.01)
+    cache.put("hash", "keyword", "Is the treaty binding?", "Yes")
+    time.sleep(0.02)
+
+    assert cache._purge_local() == 1
+    assert len(cache.local) == 0
@@ -0,0 +1,75 @@
+import asyncio
+import gc
+
+import pytest
+
+from app.services.execution import EndpointLimit, OverloadedError
+
+
+async def ticks(count: int, pause: float = 0.0):
+    for number in range(count):
+        await asyncio.sleep(pause)
+        yield number
+
+
+def test_stream_holds_slot_until_body_ends():
+    async def main():
+        limit = EndpointLimit("test", 1, 5, 0.01)
+
+        async def prepare():
+            return ticks(3)
+
+        body = await limit.stream(prepare)
+        assert limit.stats["active"] == 1
+        with pytest.raises(OverloadedError):
+            await limit.stream(prepare)
+        assert [item async for item in body] == [0, 1, 2]
+        assert limit.stats["active"] == 0
+
+    asyncio.run(main())
+
+
+def test_stream_ends_with_timeout_item():
+    async def main():
+        limit = EndpointLimit("test", 1, 0.05, 0.01)
+
+        async def prepare():
+            return ticks(100, 0.01)
+
+        body = await limit.stream(prepare, on_timeout=lambda e: "timed out")
+        items = [item async for item in body]
+        assert items[-1] == "timed out"
+        assert len(items) < 100
+        assert limit.stats == {"active": 0, "waiting": 0, "rejected": 0, "timed_out": 1}
+
+    asyncio.run(main())
+
+
+def test_idle_stream_bounds_each_item():
+    async def main():
+        limit = EndpointLimit("test", 1, 0.05, 0.01)
+
+        async def prepare():
+            return ticks(10, 0.02)
+
+        body = await limit.stream(prepare, idle=True)
+        assert [item async for item in body] == list(range(10))
+        assert limit.stats["timed_out"] == 0
+
+    asyncio.run(main())
+
+
+def test_unstarted_stream_gives_slot_back_when_dropped():
+    async def main():
+        limit = EndpointLimit("test", 1, 5, 0.01)
+
+        async def prepare():
+            return ticks(3)
+
+        body = await limit.stream(prepare)
+        del body
+        gc.collect()
+        assert limit.stats["active"] == 0
+        await limit.stream(prepare)
+
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+import pytest
+
+from app.services.library_index import LibraryIndex
+
+FILLER = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor"
+
+
+def digest_in_shard(index: LibraryIndex, shard: int, seed: str) -> str:
+    for number in range(1000):
+        digest = f"{number:08x}{seed}"
+        if index.shard_for(digest) is index.shards[shard]:
+            return digest
+    raise AssertionError("no digest for shard")
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LibraryIndex(str(tmp_path), shards=2)
+    yield index
+    index.shutdown()
+
+
+def test_hits_from_shards_are_merged_on_one_scale(index):
+    rare = digest_in_shard(index, 0, "rare")
+    common = digest_in_shard(index, 1, "common")
+    # Shard 0: the term on one page of ten, once; shard 1: on both pages, three times
+    index.add(rare, [f"apple {FILLER}"] + [f"pear {FILLER}"] * 9)
+    index.add(common, [f"apple apple apple {FILLER}", f"apple apple apple {FILLER}"])
+
+    hits = index.search("apple", 10)
+
+    assert [hit.content_hash for hit in hits] == [common, common, rare]
+    assert all(hit.score > 0 for hit in hits)
+    assert hits[0].score > hits[2].score
+
+
+def test_term_on_every_page_still_scores(index):
+    digest = digest_in_shard(index, 0, "only")
+    index.add(digest, [f"apple {FILLER}", f"apple {FILLER}"])
+
+    hits = index.search("apple", 10)
+
+    assert len(hits) == 2
+    # Rounded like /api/search does
+    assert all(round(hit.score, 4) > 0 for hit in hits)
@@ -0,0 +1,63 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.reading_sessions import FairSynthesisScheduler, ReadingSessionManager
+from app.services.shared_state import InMemoryStateBackend
+
+
+def test_cancelled_segments_give_their_slot_back():
+    async def main():
+        started, cancelled = [], []
+
+        async def synthesize(text: str) -> bytes:
+            started.append(text)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(text)
+                raise
+            return b""
+
+        scheduler = FairSynthesisScheduler(synthesize, slots=1)
+        running = scheduler.submit("gone", "first")
+        queued = scheduler.submit("gone", "second")
+        await asyncio.sleep(0)
+        assert started == ["first"] and scheduler.pending() == 1
+
+        queued.cancel()
+        running.cancel()
+        await asyncio.sleep(0.01)
+        assert cancelled == ["first"]
+        assert scheduler.active == 0 and scheduler.pending() == 0
+
+        async def quick(text: str) -> bytes:
+            return text.encode()
+
+        scheduler.synthesize = quick
+        assert await asyncio.wait_for(scheduler.submit("next", "hello"), 1) == b"hello"
+        assert started == ["first"]
+
+    asyncio.run(main())
+
+
+class SlowStateBackend(InMemoryStateBackend):
+    """Widens the window between reading and writing a session back."""
+
+    def get(self, key):
+        value = super().get(key)
+        time.sleep(0.001)
+        return value
+
+
+def test_concurrent_seeks_are_not_lost():
+    manager = ReadingSessionManager(SlowStateBackend(), None, lambda content_hash, page: None)
+    session_id = manager.create(text="Some text to read.")["session_id"]
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda number: manager.seek(session_id, 0, number), range(50)))
+        list(pool.map(lambda number: manager.pause(session_id), range(10)))
+
+    session = manager.get(session_id)
+    assert session["generation"] == 50
+    assert session["state"] == "paused"
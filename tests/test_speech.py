@@ -0,0 +1,36 @@
+import shutil
+import subprocess
+
+import pytest
+
+from app.services import speech
+from app.services.speech import EspeakBackend, VoiceSettings
+
+
+def test_espeak_reads_text_starting_with_dash_from_stdin(monkeypatch, tmp_path):
+    calls = []
+
+    def run(args, **kwargs):
+        calls.append((args, kwargs))
+        return subprocess.CompletedProcess(args, 0, stdout=b"RIFF", stderr=b"")
+
+    monkeypatch.setattr(speech.shutil, "which", lambda name: "/usr/bin/espeak-ng")
+    monkeypatch.setattr(speech.subprocess, "run", run)
+    text = f"-w {tmp_path / 'written.wav'}"
+
+    assert EspeakBackend(VoiceSettings("espeak")).synthesize(text) == b"RIFF"
+
+    args, kwargs = calls[0]
+    assert text not in args
+    assert "--stdin" in args
+    assert kwargs["input"] == text.encode("utf-8")
+
+
+@pytest.mark.skipif(not (shutil.which("espeak-ng") or shutil.which("espeak")), reason="espeak is not installed")
+def test_espeak_speaks_text_starting_with_dash(tmp_path):
+    target = tmp_path / "written.wav"
+
+    data = EspeakBackend(VoiceSettings("espeak")).synthesize(f"-w {target}")
+
+    assert data.startswith(b"RIFF")
+    assert not target.exists()